@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'automarket.settings')
+# Serve the async variants of the hot read endpoints.
+os.environ.setdefault('ROOT_URLCONF', 'automarket.asgi_urls')
 
 application = get_asgi_application()
@@ -0,0 +1,48 @@
+"""
+URL configuration served under ASGI (see automarket.asgi).
+
+The same routes as automarket.urls, with the hot read endpoints served by
+their async views.
+"""
+from django.contrib import admin
+from django.urls import include, path
+
+from carlisting import urls as carlisting_urls
+from carlisting.views import AsyncCarListingDetailView, AsyncCarListingListView
+from core.views import MetricsView
+from users import urls as users_urls
+from users.views import AsyncFavoriteListView
+
+
+def with_views(patterns, views):
+    """Copy ``patterns``, routing the URL names in ``views`` to those views."""
+    return [
+        path(str(pattern.pattern), views[pattern.name].as_view(), name=pattern.name)
+        if pattern.name in views else pattern
+        for pattern in patterns
+    ]
+
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    path('', AsyncCarListingListView.as_view(), name='main'),
+    path(
+        'users/',
+        include((
+            with_views(users_urls.urlpatterns, {
+                'favorites': AsyncFavoriteListView,
+            }),
+            'users'
+        ), namespace='users')
+    ),
+    path(
+        'carlisting/',
+        include((
+            with_views(carlisting_urls.urlpatterns, {
+                'carlisting_detail': AsyncCarListingDetailView,
+            }),
+            'carlisting'
+        ), namespace='carlisting')
+    ),
+]
@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import timedelta
+from celery.schedules import crontab
 
 load_dotenv()
 
@@ -28,6 +29,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'core',
     'users',
@@ -39,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,7 +51,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'automarket.urls'
+# automarket.asgi defaults this to automarket.asgi_urls.
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', 'automarket.urls')
 
 TEMPLATES = [
     {
@@ -71,6 +75,43 @@ WSGI_APPLICATION = 'automarket.wsgi.application'
 REDIS_HOST = os.getenv('REDIS_HOST')
 REDIS_PORT = os.getenv('REDIS_PORT')
 
+# Cache
+# Database 0 belongs to Celery; the application cache lives in database 1.
+
+if REDIS_HOST:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': f'redis://{REDIS_HOST}:{REDIS_PORT}/1',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+FEED_CACHE_TIMEOUT = int(os.getenv('FEED_CACHE_TIMEOUT', 60))
+
+# Each process adds its request and task metrics (core.metrics) to the
+# shared totals this often. With METRICS_TOKEN set, /metrics requires it as
+# a bearer token.
+METRICS_FLUSH_INTERVAL = int(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Statements slower than this many milliseconds are logged and kept for
+# the admin (core.inspector), the latest SLOW_QUERY_LOG_SIZE of them; 0
+# turns the inspector off. This share of the slow plain SELECTs is
+# explained; with SLOW_QUERY_EXPLAIN_ANALYZE they are run a second time,
+# under EXPLAIN (ANALYZE, BUFFERS), for actual row counts and timings.
+SLOW_QUERY_THRESHOLD = float(os.getenv('SLOW_QUERY_THRESHOLD', 0))
+SLOW_QUERY_EXPLAIN_RATE = float(os.getenv('SLOW_QUERY_EXPLAIN_RATE', 0.1))
+SLOW_QUERY_EXPLAIN_ANALYZE = (
+    os.getenv('SLOW_QUERY_EXPLAIN_ANALYZE', 'False').lower() == 'true'
+)
+SLOW_QUERY_LOG_SIZE = int(os.getenv('SLOW_QUERY_LOG_SIZE', 500))
+
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
@@ -132,7 +173,7 @@ AUTH_USER_MODEL = 'users.User'
 # Rest Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 2,
@@ -162,8 +203,26 @@ SIMPLE_JWT = {
     ),
     'TOKEN_TYPE_CLAIM': os.getenv('TOKEN_TYPE_CLAIM', 'token_type'),
     'JTI_CLAIM': os.getenv('JTI_CLAIM', 'jti'),
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.RotatingTokenRefreshSerializer',
 }
 
+# Expired outstanding and blacklisted tokens are deleted this many rows at
+# a time (users.tokens.purge_expired_tokens).
+TOKEN_PURGE_CHUNK_SIZE = int(os.getenv('TOKEN_PURGE_CHUNK_SIZE', 5000))
+
+# Accounts that never confirmed their email are deleted this many days
+# after registration (users.cleanup), in chunks of this many rows.
+UNVERIFIED_USER_RETENTION = int(os.getenv('UNVERIFIED_USER_RETENTION', 7))
+REGISTRATION_CLEANUP_CHUNK_SIZE = int(
+    os.getenv('REGISTRATION_CLEANUP_CHUNK_SIZE', 1000)
+)
+
+# Users resolved from access tokens are cached for this many seconds in
+# each process and in the shared cache (users.authentication).
+AUTH_USER_CACHE_LOCAL_TTL = int(os.getenv('AUTH_USER_CACHE_LOCAL_TTL', 5))
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', 300))
+AUTH_USER_CACHE_SIZE = int(os.getenv('AUTH_USER_CACHE_SIZE', 10000))
+
 # Sending emails
 if DEBUG:
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -177,6 +236,16 @@ else:
     SERVER_EMAIL = os.getenv('SERVER_EMAIL')
     DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
 
+# Queued emails (core.mail) are sent in batches over one connection.
+EMAIL_DISPATCH_BATCH_SIZE = int(os.getenv('EMAIL_DISPATCH_BATCH_SIZE', 100))
+EMAIL_DISPATCH_INTERVAL = int(os.getenv('EMAIL_DISPATCH_INTERVAL', 30))
+# Messages per second across all workers; 0 disables the limit.
+EMAIL_RATE_LIMIT = int(os.getenv('EMAIL_RATE_LIMIT', 0))
+EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', 5))
+# Seconds before the first retry; doubled after every further failure.
+EMAIL_RETRY_DELAY = int(os.getenv('EMAIL_RETRY_DELAY', 60))
+EMAIL_RETRY_MAX_DELAY = int(os.getenv('EMAIL_RETRY_MAX_DELAY', 3600))
+
 # Celery
 
 CELERY_BROKER_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}'
@@ -187,3 +256,37 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Europe/Kiev'
+
+PRICE_STATISTICS_INTERVAL = int(os.getenv('PRICE_STATISTICS_INTERVAL', 300))
+SAVED_SEARCH_DIGEST_INTERVAL = int(
+    os.getenv('SAVED_SEARCH_DIGEST_INTERVAL', 900)
+)
+
+CELERY_BEAT_SCHEDULE = {
+    'refresh-price-statistics': {
+        'task': 'carlisting.tasks.refresh_price_statistics_task',
+        'schedule': PRICE_STATISTICS_INTERVAL,
+    },
+    # Catches buckets emptied by deleted or re-bucketed listings.
+    'recompute-price-statistics': {
+        'task': 'carlisting.tasks.recompute_price_statistics_task',
+        'schedule': crontab(hour=4, minute=0),
+    },
+    # Retries and anything not already sent by the task that queued it.
+    'dispatch-emails': {
+        'task': 'core.tasks.dispatch_emails_task',
+        'schedule': EMAIL_DISPATCH_INTERVAL,
+    },
+    'send-saved-search-notifications': {
+        'task': 'carlisting.tasks.send_saved_search_notifications_task',
+        'schedule': SAVED_SEARCH_DIGEST_INTERVAL,
+    },
+    'purge-abandoned-registrations': {
+        'task': 'users.tasks.purge_abandoned_registrations_task',
+        'schedule': crontab(minute=15),
+    },
+    'purge-expired-tokens': {
+        'task': 'users.tasks.purge_expired_tokens_task',
+        'schedule': crontab(hour=3, minute=30),
+    },
+}
@@ -17,9 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from carlisting.views import CarListingListView
+from core.views import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', MetricsView.as_view(), name='metrics'),
     path('', CarListingListView.as_view(), name='main'),
     path('users/', include(('users.urls', 'users'), namespace='users')),
     path(
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import CarListing, Brand, Location, InsuranceInfo, CarImage
+from .models import (
+    CarListing, Brand, Location, InsuranceInfo, CarImage, PriceStatistic,
+    SavedSearch
+)
 
 
 @admin.register(CarListing)
@@ -39,7 +42,7 @@ class BrandAdmin(admin.ModelAdmin):
 
 @admin.register(Location)
 class LocationAdmin(admin.ModelAdmin):
-    list_display = ('city', 'region', 'country')
+    list_display = ('city', 'region', 'country', 'latitude', 'longitude')
     search_fields = ('city', 'region', 'country')
     list_filter = ('country',)
     ordering = ('city',)
@@ -64,3 +67,29 @@ class CarImageAdmin(admin.ModelAdmin):
     list_display = ('car_listing', 'created_at')
     search_fields = ('car_listing__title',)
     ordering = ('car_listing', 'created_at')
+
+
+@admin.register(PriceStatistic)
+class PriceStatisticAdmin(admin.ModelAdmin):
+    list_display = (
+        'brand',
+        'model',
+        'year',
+        'mileage_band',
+        'count',
+        'median',
+        'computed_at'
+    )
+    search_fields = ('brand__name', 'model')
+    list_filter = ('brand',)
+    ordering = ('brand', 'model', 'year', 'mileage_band')
+
+
+@admin.register(SavedSearch)
+class SavedSearchAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'user', 'name', 'brand', 'location', 'is_active', 'created_at'
+    )
+    search_fields = ('name', 'user__username')
+    list_filter = ('is_active',)
+    raw_id_fields = ('user',)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CarlistingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'carlisting'
+
+    def ready(self):
+        from . import signals  # noqa: F401
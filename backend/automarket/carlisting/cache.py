@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core import async_cache
+
+GENERATION_KEY = 'carlisting:feed:generation'
+HITS_KEY = 'carlisting:feed:hits'
+MISSES_KEY = 'carlisting:feed:misses'
+
+# How long a rebuild may hold the lock, and how long others wait for it.
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2
+LOCK_POLL_INTERVAL = 0.05
+
+
+def get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # A fresh, time-based generation can never collide with pages cached
+        # under a generation that was evicted from Redis.
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def invalidate_feed():
+    """
+    Make every cached feed page stale once the current transaction commits.
+
+    Bumping the generation retires all old keys at once; they are never
+    scanned or deleted and simply expire. Bumping after commit prevents a
+    concurrent request from caching pre-commit data under the new
+    generation.
+    """
+    transaction.on_commit(_bump_generation)
+
+
+def _bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+async def aget_generation():
+    generation = await async_cache.aget(GENERATION_KEY)
+    if generation is None:
+        await async_cache.aadd(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = await async_cache.aget(GENERATION_KEY)
+    return generation
+
+
+def feed_cache_key(request):
+    return _page_key(get_generation(), request)
+
+
+async def afeed_cache_key(request):
+    return _page_key(await aget_generation(), request)
+
+
+def _page_key(generation, request):
+    params = sorted(request.query_params.lists())
+    digest = hashlib.sha1(
+        repr((request.get_host(), params)).encode()
+    ).hexdigest()
+    return f'carlisting:feed:page:{generation}:{digest}'
+
+
+def get_or_build(key, build):
+    """
+    Return ``(value, hit)`` for ``key``, calling ``build`` on a miss.
+
+    Only the worker that wins the lock rebuilds an expired page; the others
+    poll for its result for up to ``LOCK_WAIT`` seconds before giving up
+    and building it themselves.
+    """
+    value = cache.get(key)
+    if value is not None:
+        _count(HITS_KEY)
+        return value, True
+
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                _count(HITS_KEY)
+                return value, True
+        _count(MISSES_KEY)
+        return build(), False
+
+    try:
+        value = build()
+        cache.set(key, value, timeout=settings.FEED_CACHE_TIMEOUT)
+    finally:
+        cache.delete(lock_key)
+    _count(MISSES_KEY)
+    return value, False
+
+
+async def aget_or_build(key, build):
+    """``get_or_build()`` for async views; ``build`` is a coroutine function."""
+    value = await async_cache.aget(key)
+    if value is not None:
+        await _acount(HITS_KEY)
+        return value, True
+
+    lock_key = f'{key}:lock'
+    if not await async_cache.aadd(lock_key, 1, timeout=LOCK_TIMEOUT):
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            value = await async_cache.aget(key)
+            if value is not None:
+                await _acount(HITS_KEY)
+                return value, True
+        await _acount(MISSES_KEY)
+        return await build(), False
+
+    try:
+        value = await build()
+        await async_cache.aset(key, value, timeout=settings.FEED_CACHE_TIMEOUT)
+    finally:
+        await async_cache.adelete(lock_key)
+    await _acount(MISSES_KEY)
+    return value, False
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+async def _acount(key):
+    try:
+        await async_cache.aincr(key)
+    except ValueError:
+        await async_cache.aadd(key, 0, timeout=None)
+        await async_cache.aincr(key)
+
+
+def feed_cache_stats():
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {
+        'hits': counters.get(HITS_KEY, 0),
+        'misses': counters.get(MISSES_KEY, 0),
+        'generation': get_generation(),
+    }
@@ -0,0 +1,60 @@
+import hashlib
+import json
+
+from django.db.models import Count, F, Max
+from django.utils.http import quote_etag
+
+from .models import CarListing
+
+
+def listing_validators(pk):
+    """
+    Return ``(etag, last_modified)`` for a listing, or None if it is missing.
+
+    Computed from the ``updated_at`` stamps of the listing, its insurance
+    record and its images (plus the image count) in one aggregate query,
+    without loading any of those rows. Deleting images touches the listing,
+    so Last-Modified moves too.
+    """
+    return _validators(pk, next(iter(_listing_states(pk)), None))
+
+
+async def alisting_validators(pk):
+    """``listing_validators()`` through the async ORM."""
+    async for state in _listing_states(pk):
+        return _validators(pk, state)
+    return None
+
+
+def _listing_states(pk):
+    return CarListing.objects.filter(pk=pk).values('updated_at').annotate(
+        insurance_updated_at=F('insurance_info__updated_at'),
+        images_updated_at=Max('images__updated_at'),
+        image_count=Count('images'),
+    )
+
+
+def _validators(pk, state):
+    if state is None:
+        return None
+
+    last_modified = max(
+        stamp for stamp in (
+            state['updated_at'],
+            state['insurance_updated_at'],
+            state['images_updated_at'],
+        )
+        if stamp is not None
+    )
+    # str() keeps the microseconds that DjangoJSONEncoder would drop.
+    fingerprint = json.dumps([pk, *state.values()], default=str)
+    return etag_for(fingerprint), last_modified
+
+
+def content_etag(data):
+    """A strong ETag for serialized response data."""
+    return etag_for(json.dumps(data, default=str, sort_keys=True))
+
+
+def etag_for(text):
+    return quote_etag(hashlib.md5(text.encode()).hexdigest())
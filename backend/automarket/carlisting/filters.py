@@ -0,0 +1,220 @@
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+from django.db.models import F
+from rest_framework import serializers
+
+from .geo import (
+    bounding_box,
+    covering_geohashes,
+    distance_expression,
+    geohash_filter,
+)
+from .lookups import brand_lookup, location_lookup
+from .models import Location
+
+# Largest search radius accepted, in km.
+MAX_RADIUS_KM = 500
+
+# Facet name -> lookup path on CarListing.
+FACET_FIELDS = {
+    'brand': 'brand__name',
+    'body_type': 'body_type',
+    'transmission': 'transmission',
+    'engine_type': 'engine_type',
+    'color': 'color',
+    'city': 'location__city',
+}
+
+
+class CarListingFilterSerializer(serializers.Serializer):
+    brand = serializers.ListField(child=serializers.CharField(), required=False)
+    body_type = serializers.ListField(
+        child=serializers.CharField(), required=False
+    )
+    transmission = serializers.ListField(
+        child=serializers.CharField(), required=False
+    )
+    engine_type = serializers.ListField(
+        child=serializers.CharField(), required=False
+    )
+    color = serializers.ListField(child=serializers.CharField(), required=False)
+    city = serializers.ListField(child=serializers.CharField(), required=False)
+    price_min = serializers.DecimalField(
+        max_digits=10, decimal_places=2, required=False
+    )
+    price_max = serializers.DecimalField(
+        max_digits=10, decimal_places=2, required=False
+    )
+    year_min = serializers.IntegerField(required=False)
+    year_max = serializers.IntegerField(required=False)
+    mileage_max = serializers.IntegerField(required=False)
+    lat = serializers.FloatField(min_value=-90, max_value=90, required=False)
+    lng = serializers.FloatField(min_value=-180, max_value=180, required=False)
+    radius = serializers.FloatField(
+        min_value=0, max_value=MAX_RADIUS_KM, required=False
+    )
+    min_lat = serializers.FloatField(min_value=-90, max_value=90, required=False)
+    max_lat = serializers.FloatField(min_value=-90, max_value=90, required=False)
+    min_lng = serializers.FloatField(
+        min_value=-180, max_value=180, required=False
+    )
+    max_lng = serializers.FloatField(
+        min_value=-180, max_value=180, required=False
+    )
+
+    def validate(self, attrs):
+        for low, high in (
+            ('price_min', 'price_max'),
+            ('year_min', 'year_max'),
+            ('min_lat', 'max_lat'),
+            ('min_lng', 'max_lng'),
+        ):
+            if low in attrs and high in attrs and attrs[low] > attrs[high]:
+                raise serializers.ValidationError(
+                    f"'{low}' must not be greater than '{high}'."
+                )
+
+        box = {'min_lat', 'max_lat', 'min_lng', 'max_lng'} & attrs.keys()
+        if box and len(box) != 4:
+            raise serializers.ValidationError(
+                "'min_lat', 'max_lat', 'min_lng' and 'max_lng' "
+                "must be given together."
+            )
+        if ('lat' in attrs) != ('lng' in attrs):
+            raise serializers.ValidationError(
+                "'lat' and 'lng' must be given together."
+            )
+        if 'radius' in attrs and 'lat' not in attrs:
+            raise serializers.ValidationError("'radius' requires 'lat' and 'lng'.")
+        # Sorting every listing by distance would scan the whole table.
+        if 'lat' in attrs and 'radius' not in attrs and not box:
+            raise serializers.ValidationError(
+                "'lat' and 'lng' require 'radius' or a bounding box."
+            )
+        return attrs
+
+
+# Facets filtered by primary key after resolving names through a lookup.
+REFERENCE_FILTERS = {
+    'brand': ('brand_id', brand_lookup),
+    'city': ('location_id', location_lookup),
+}
+
+
+def filter_car_listings(queryset, params):
+    """Apply validated ``CarListingFilterSerializer`` data to ``queryset``."""
+    filters = {}
+    for name, path in FACET_FIELDS.items():
+        if not params.get(name):
+            continue
+        if name in REFERENCE_FILTERS:
+            path, lookup = REFERENCE_FILTERS[name]
+            filters[f'{path}__in'] = list(lookup.get_ids(params[name]).values())
+        else:
+            filters[f'{path}__in'] = params[name]
+    if 'price_min' in params:
+        filters['price__gte'] = params['price_min']
+    if 'price_max' in params:
+        filters['price__lte'] = params['price_max']
+    if 'year_min' in params:
+        filters['year__gte'] = params['year_min']
+    if 'year_max' in params:
+        filters['year__lte'] = params['year_max']
+    if 'mileage_max' in params:
+        filters['mileage__lte'] = params['mileage_max']
+    queryset = queryset.filter(**filters)
+
+    locations = nearby_locations(params)
+    if locations is not None:
+        queryset = queryset.filter(location__in=locations.values('id'))
+    if 'lat' in params:
+        queryset = queryset.annotate(distance=distance_expression(
+            params['lat'], params['lng'],
+            'location__latitude', 'location__longitude',
+        ))
+    return queryset
+
+
+def nearby_locations(params):
+    """
+    Locations inside the requested radius and/or bounding box, or ``None``.
+
+    Candidates are narrowed with geohash prefix range scans before the exact
+    coordinate and distance conditions are checked, so only locations near
+    the search area are ever read.
+    """
+    boxes = []
+    if 'radius' in params:
+        boxes.append(bounding_box(params['lat'], params['lng'], params['radius']))
+    if 'min_lat' in params:
+        boxes.append((
+            params['min_lat'], params['max_lat'],
+            params['min_lng'], params['max_lng'],
+        ))
+    if not boxes:
+        return None
+
+    # Intersect the boxes; the smaller area gives the tighter prefixes.
+    min_lat = max(box[0] for box in boxes)
+    max_lat = min(box[1] for box in boxes)
+    min_lng = max(box[2] for box in boxes)
+    max_lng = min(box[3] for box in boxes)
+    if min_lat > max_lat or min_lng > max_lng:
+        return Location.objects.none()
+    locations = Location.objects.filter(
+        geohash_filter(covering_geohashes(min_lat, max_lat, min_lng, max_lng))
+    )
+    if 'min_lat' in params:
+        locations = locations.filter(
+            latitude__range=(params['min_lat'], params['max_lat']),
+            longitude__range=(params['min_lng'], params['max_lng']),
+        )
+    if 'lat' in params:
+        locations = locations.annotate(
+            distance=distance_expression(params['lat'], params['lng'])
+        )
+    if 'radius' in params:
+        locations = locations.filter(distance__lte=params['radius'])
+    return locations
+
+
+def facet_counts(queryset):
+    """
+    Count listings per value of every facet in a single query.
+
+    All facets are grouped at once with ``GROUPING SETS`` over the filtered
+    queryset, so the cost is one scan no matter how many facets there are.
+    """
+    names = list(FACET_FIELDS)
+    aliases = [f'facet_{name}' for name in names]
+    filtered = queryset.order_by().values(**{
+        alias: F(FACET_FIELDS[name]) for name, alias in zip(names, aliases)
+    })
+    try:
+        inner_sql, params = filtered.query.sql_with_params()
+    except EmptyResultSet:
+        return {name: {} for name in names}
+
+    columns = ', '.join(aliases)
+    grouping_sets = ', '.join(f'({alias})' for alias in aliases)
+    sql = (
+        f'SELECT {columns}, GROUPING({columns}), COUNT(*) '
+        f'FROM ({inner_sql}) AS filtered '
+        f'GROUP BY GROUPING SETS ({grouping_sets})'
+    )
+
+    facets = {name: {} for name in names}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for row in cursor.fetchall():
+            *values, mask, count = row
+            for index, name in enumerate(names):
+                # GROUPING() sets a bit for every column *not* grouped on.
+                if not mask & (1 << (len(names) - 1 - index)):
+                    if values[index] is not None:
+                        facets[name][values[index]] = count
+                    break
+    return {
+        name: dict(sorted(counts.items(), key=lambda item: -item[1]))
+        for name, counts in facets.items()
+    }
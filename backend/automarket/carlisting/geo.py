@@ -0,0 +1,124 @@
+import math
+
+from django.db.models import ExpressionWrapper, F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Stored geohashes are ~5 m cells; searches use shorter prefixes of them.
+GEOHASH_PRECISION = 9
+
+# A search area is covered by at most this many geohash prefixes.
+MAX_COVERING_CELLS = 32
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = bit_count = 0
+    use_longitude = True
+    while len(chars) < precision:
+        bounds, value = (
+            (lng_range, longitude) if use_longitude else (lat_range, latitude)
+        )
+        middle = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        use_longitude = not use_longitude
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = bit_count = 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """Return ``(height, width)`` in degrees of a geohash cell."""
+    bits = 5 * precision
+    return 180 / 2 ** (bits // 2), 360 / 2 ** ((bits + 1) // 2)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Return ``(min_lat, max_lat, min_lng, max_lng)`` enclosing a circle.
+
+    Longitudes may fall outside -180..180 when the circle crosses the
+    antimeridian; ``covering_geohashes`` wraps them.
+    """
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(latitude - lat_delta, -90.0)
+    max_lat = min(latitude + lat_delta, 90.0)
+    # A degree of longitude is shortest at the latitude furthest from the
+    # equator, so that latitude decides how wide the box must be.
+    widest = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if widest < 1e-9:
+        return min_lat, max_lat, -180.0, 180.0
+    lng_delta = math.degrees(radius_km / (EARTH_RADIUS_KM * widest))
+    if lng_delta >= 180:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, longitude - lng_delta, longitude + lng_delta
+
+
+def covering_geohashes(min_lat, max_lat, min_lng, max_lng):
+    """
+    Return the geohash prefixes of the cells overlapping a bounding box.
+
+    The longest prefix length whose cells cover the box in at most
+    ``MAX_COVERING_CELLS`` cells is used, so the prefixes select a small
+    superset of the box through a btree range scan each.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = geohash_cell_size(precision)
+        rows = range(
+            math.floor((min_lat + 90) / height),
+            min(math.floor((max_lat + 90) / height), round(180 / height) - 1) + 1,
+        )
+        columns = range(
+            math.floor((min_lng + 180) / width),
+            math.floor((max_lng + 180) / width) + 1,
+        )
+        if len(rows) * len(columns) <= MAX_COVERING_CELLS:
+            break
+
+    column_count = round(360 / width)
+    cells = set()
+    for row in rows:
+        for column in columns:
+            cells.add(encode_geohash(
+                -90 + (row + 0.5) * height,
+                -180 + (column % column_count + 0.5) * width,
+                precision,
+            ))
+    return sorted(cells)
+
+
+def geohash_filter(cells, field='geohash'):
+    condition = Q()
+    for cell in cells:
+        condition |= Q(**{f'{field}__startswith': cell})
+    return condition
+
+
+def distance_expression(latitude, longitude, lat_field='latitude',
+                        lng_field='longitude'):
+    """Haversine distance in km from a point to the given coordinate fields."""
+    lat = math.radians(latitude)
+    lat_delta = Radians(F(lat_field)) - Value(lat)
+    lng_delta = Radians(F(lng_field)) - Value(math.radians(longitude))
+    haversine = (
+        Power(Sin(lat_delta / 2), 2)
+        + Value(math.cos(lat)) * Cos(Radians(F(lat_field)))
+        * Power(Sin(lng_delta / 2), 2)
+    )
+    # Rounding can push the square root a hair above 1.
+    return ExpressionWrapper(
+        Value(2 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(haversine), Value(1.0))),
+        output_field=FloatField(),
+    )
@@ -0,0 +1,194 @@
+import csv
+import json
+
+from django.db import DatabaseError, transaction
+from rest_framework import serializers
+
+from .cache import invalidate_feed
+from .lookups import brand_lookup, location_lookup
+from .matching import queue_listing_matches
+from .models import CarImage, CarListing, InsuranceInfo
+from .search import update_search_vectors
+from .serializers import CarListingSerializer
+
+FORMATS = ('csv', 'ndjson')
+
+INSURANCE_COLUMNS = (
+    'insurance_start_date',
+    'insurance_end_date',
+    'owner_count',
+    'accident_count',
+    'accident_details',
+)
+
+# CSV rows list their images in one column separated by this character.
+IMAGE_URL_SEPARATOR = '|'
+
+
+def guess_format(filename):
+    if filename and filename.lower().endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return 'csv'
+
+
+def read_rows(stream, file_format):
+    """
+    Yield ``(row_number, data, error)`` for every record of a text stream.
+
+    CSV rows are reshaped into the nested structure ``CarListingSerializer``
+    expects; NDJSON lines are expected to have it already. Records are read
+    one at a time, so memory use does not grow with the file.
+    """
+    if file_format == 'ndjson':
+        for row_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield row_number, json.loads(line), None
+            except json.JSONDecodeError as exc:
+                yield row_number, None, {'non_field_errors': [str(exc)]}
+    else:
+        reader = csv.DictReader(stream)
+        for row_number, row in enumerate(reader, start=1):
+            yield row_number, _reshape_csv_row(row), None
+
+
+def _reshape_csv_row(row):
+    data = {
+        key: value for key, value in row.items()
+        if key not in INSURANCE_COLUMNS and key != 'image_urls'
+    }
+    data['insurance_information'] = {
+        key: row.get(key) for key in INSURANCE_COLUMNS
+    }
+    data['images'] = [
+        {'image_url': url.strip()}
+        for url in (row.get('image_urls') or '').split(IMAGE_URL_SEPARATOR)
+        if url.strip()
+    ]
+    return data
+
+
+class ListingImporter:
+    """
+    Validate and insert listings in batches.
+
+    Every batch is validated row by row, its brand and location names are
+    resolved through the reference lookups, and its listings, insurance records and
+    images are written with one bulk INSERT per table inside a single
+    transaction. Invalid rows are reported through ``on_error`` and
+    skipped; they never abort the rest of the file.
+    """
+
+    def __init__(self, user, batch_size=500, on_error=None):
+        self.user = user
+        self.batch_size = batch_size
+        self.on_error = on_error
+        self.created = 0
+        self.failed = 0
+        # Building a ModelSerializer's fields costs more than validating a
+        # row, so one instance validates every row.
+        self.validator = CarListingSerializer()
+
+    def run(self, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._import_batch(batch)
+                batch = []
+        if batch:
+            self._import_batch(batch)
+        if self.created:
+            invalidate_feed()
+        return self.created, self.failed
+
+    def _import_batch(self, batch):
+        self.batch_errors = []
+        valid = []
+        for row_number, data, error in batch:
+            if error is not None:
+                self._fail(row_number, error)
+                continue
+            try:
+                validated = self.validator.run_validation(data)
+            except serializers.ValidationError as exc:
+                self._fail(row_number, exc.detail)
+                continue
+            valid.append((row_number, dict(validated)))
+
+        valid = self._resolve_references(valid)
+        if valid:
+            self._write_batch(valid)
+
+        self.failed += len(self.batch_errors)
+        if self.on_error is not None:
+            for row_number, errors in sorted(
+                self.batch_errors, key=lambda error: error[0]
+            ):
+                self.on_error(row_number, errors)
+
+    def _fail(self, row_number, errors):
+        self.batch_errors.append((row_number, errors))
+
+    def _write_batch(self, rows):
+        try:
+            with transaction.atomic():
+                self._write(rows)
+            self.created += len(rows)
+        except DatabaseError:
+            # Something only the database could reject; isolate the culprit.
+            for row in rows:
+                try:
+                    with transaction.atomic():
+                        self._write([row])
+                    self.created += 1
+                except DatabaseError as exc:
+                    self._fail(row[0], {'non_field_errors': [str(exc)]})
+
+    def _resolve_references(self, rows):
+        brand_names = {data['brand_name'] for _, data in rows}
+        cities = {data['location_name'] for _, data in rows}
+        brands = brand_lookup.get_ids(brand_names)
+        locations = location_lookup.get_ids(cities)
+
+        resolved = []
+        for row_number, data in rows:
+            brand_name = data.pop('brand_name')
+            location_name = data.pop('location_name')
+            if brand_name not in brands:
+                self._fail(row_number, {'brand_name': [
+                    f"Brand with name '{brand_name}' does not exist."
+                ]})
+            elif location_name not in locations:
+                self._fail(row_number, {'location_name': [
+                    f"Location with city '{location_name}' does not exist."
+                ]})
+            else:
+                data['brand_id'] = brands[brand_name]
+                data['location_id'] = locations[location_name]
+                resolved.append((row_number, data))
+        return resolved
+
+    def _write(self, rows):
+        listings = []
+        for _, data in rows:
+            fields = {
+                key: value for key, value in data.items()
+                if key not in ('insurance_info', 'images')
+            }
+            listings.append(CarListing(user=self.user, **fields))
+        CarListing.objects.bulk_create(listings)
+
+        InsuranceInfo.objects.bulk_create([
+            InsuranceInfo(car_listing=listing, **data['insurance_info'])
+            for listing, (_, data) in zip(listings, rows)
+        ])
+        CarImage.objects.bulk_create([
+            CarImage(car_listing=listing, **image)
+            for listing, (_, data) in zip(listings, rows)
+            for image in data['images']
+        ])
+        listing_ids = [listing.pk for listing in listings]
+        update_search_vectors(listing_ids)
+        queue_listing_matches(listing_ids)
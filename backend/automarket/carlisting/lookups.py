@@ -0,0 +1,107 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from core.cache import LocalCache
+from .models import Brand, Location
+
+# Seconds a worker may keep serving entries before it re-reads the shared
+# version; bounds how stale another worker's cache can be after a change.
+VERSION_CHECK_INTERVAL = 5
+MAX_ENTRIES = 4096
+
+_MISSING = object()
+
+
+class ReferenceLookup:
+    """
+    Cached name -> id resolution for a rarely changing reference table.
+
+    Ids (and misses) are kept in a bounded process-local LRU. A version
+    number in the shared cache is bumped whenever a row is saved or deleted;
+    workers compare it at most every ``VERSION_CHECK_INTERVAL`` seconds and
+    drop their local entries when it moved.
+    """
+
+    def __init__(self, model, field, normalize=None, expression=None):
+        self.model = model
+        self.field = field
+        self.normalize = normalize or (lambda name: name)
+        self.expression = expression
+        self.version_key = f'carlisting:reference:{model._meta.model_name}'
+        self.local = LocalCache(max_size=MAX_ENTRIES)
+        self.version = None
+        self.checked_at = 0
+
+    def get_id(self, name):
+        return self.get_ids([name]).get(name)
+
+    def get_ids(self, names):
+        """Map each of ``names`` to its row id, omitting unknown names."""
+        self._check_version()
+        keys = {name: self.normalize(name) for name in names}
+
+        found, missing = {}, set()
+        for key in keys.values():
+            value = self.local.get(key, _MISSING)
+            if value is _MISSING:
+                missing.add(key)
+            else:
+                found[key] = value
+
+        if missing:
+            loaded = self._load(missing)
+            for key in missing:
+                found[key] = loaded.get(key)
+                self.local.set(key, found[key])
+
+        return {
+            name: found[key] for name, key in keys.items()
+            if found[key] is not None
+        }
+
+    def _load(self, keys):
+        queryset = self.model.objects.order_by('-id')
+        lookup = self.field
+        if self.expression is not None:
+            queryset = queryset.annotate(lookup_key=self.expression)
+            lookup = 'lookup_key'
+        # Ordered by descending id so the oldest row wins duplicates.
+        return dict(
+            queryset.filter(**{f'{lookup}__in': keys}).values_list(lookup, 'id')
+        )
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self.checked_at < VERSION_CHECK_INTERVAL:
+            return
+        version = cache.get(self.version_key)
+        if version != self.version:
+            self.local.clear()
+            self.version = version
+        self.checked_at = now
+
+    def invalidate(self):
+        """Drop this worker's entries now and every worker's after commit."""
+        self.local.clear()
+        transaction.on_commit(self._bump_version)
+
+    def _bump_version(self):
+        self.local.clear()
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, time.time_ns(), timeout=None)
+
+
+brand_lookup = ReferenceLookup(Brand, 'name')
+
+# Cities are matched case-insensitively through an index on LOWER(city).
+location_lookup = ReferenceLookup(
+    Location,
+    'city',
+    normalize=lambda city: city.strip().lower(),
+    expression=Lower('city'),
+)
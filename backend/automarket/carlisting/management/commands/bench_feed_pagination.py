@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from carlisting.models import CarListing
+from core.bench import (
+    bench_client,
+    format_summary,
+    measure,
+    seed_bench_listings,
+    summarize,
+)
+from core.pagination import KeysetPagination
+
+
+class Command(BaseCommand):
+    """Compare first-page and deep-page latency of the main feed."""
+
+    help = 'Benchmark page-number vs keyset pagination of the main feed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Insert this many synthetic listings before measuring.'
+        )
+        parser.add_argument('--page', type=int, default=1000)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            seed_bench_listings(options['seed'], stdout=self.stdout, vacuum=True)
+
+        page, page_size = options['page'], options['page_size']
+        visible = CarListing.objects.filter(is_hidden=False).order_by(
+            '-created_at', '-id'
+        )
+        offset = (page - 1) * page_size
+        boundary = visible.values_list('created_at', 'id')[offset - 1:offset]
+        if page < 2 or not boundary:
+            raise CommandError(
+                f'Need more than {offset} visible listings for page {page}; '
+                f'use --seed.'
+            )
+        deep_cursor = KeysetPagination.encode_cursor(list(boundary[0]))
+
+        client = bench_client()
+        url = reverse('main')
+        cases = [
+            ('page-number page=1', {'page': 1}),
+            (f'page-number page={page}', {'page': page}),
+            ('keyset page=1', {'cursor': ''}),
+            (f'keyset page={page}', {'cursor': deep_cursor}),
+        ]
+        results = {}
+        for name, params in cases:
+            params['page_size'] = page_size
+            samples = measure(
+                lambda: client.get(url, params), options['repeat']
+            )
+            results[name] = summarize(samples)
+            self.stdout.write(format_summary(name, samples))
+
+        for mode in ('page-number', 'keyset'):
+            first = results[f'{mode} page=1']['p50_ms']
+            deep = results[f'{mode} page={page}']['p50_ms']
+            self.stdout.write(
+                f'{mode}: page {page} p50 is {deep / first:.2f}x page 1'
+            )
@@ -0,0 +1,97 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from carlisting.models import CarListing
+from core import seeding
+from core.bench import (
+    bench_client,
+    format_summary,
+    measure,
+    seed_bench_listings,
+)
+
+
+class Command(BaseCommand):
+    """Report latency of radius and bounding-box searches on the filter feed."""
+
+    help = 'Benchmark location radius search.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--locations', type=int, default=2000,
+            help='Catalog locations, with coordinates, to search over.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Insert this many listings spread over those locations first.'
+        )
+        parser.add_argument('--radius', type=float, nargs='+', default=[10, 50, 200])
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        locations = seeding.get_locations(options['locations'])
+        if options['seed']:
+            seed_bench_listings(
+                options['seed'], stdout=self.stdout, vacuum=True,
+                locations=options['locations'],
+            )
+        self.stdout.write(
+            f'{len(locations)} locations, '
+            f'{CarListing.objects.filter(location__in=locations).count()} '
+            f'listings on them'
+        )
+
+        client = bench_client()
+        url = reverse('carlisting:carlisting_filter')
+        rng = random.Random(0)
+        centers = rng.sample(locations, min(10, len(locations)))
+
+        for radius in options['radius']:
+            queries = [
+                {
+                    'lat': center.latitude, 'lng': center.longitude,
+                    'radius': radius, 'page_size': options['page_size'],
+                }
+                for center in centers
+            ]
+            self.run_case(f'radius {radius:g} km, first page', client, url, queries,
+                          options['repeat'])
+
+            deep = []
+            for params in queries:
+                response = client.get(url, params)
+                for _ in range(4):
+                    if not response.data['next']:
+                        break
+                    response = client.get(response.data['next'])
+                if response.data['next']:
+                    deep.append(response.data['next'])
+            if deep:
+                self.run_case(f'radius {radius:g} km, page 6', client, None, deep,
+                              options['repeat'])
+
+        boxes = [
+            {
+                'min_lat': center.latitude - 0.5, 'max_lat': center.latitude + 0.5,
+                'min_lng': center.longitude - 0.75,
+                'max_lng': center.longitude + 0.75,
+                'page_size': options['page_size'],
+            }
+            for center in centers
+        ]
+        self.run_case('bounding box ~110x110 km', client, url, boxes,
+                      options['repeat'])
+
+    def run_case(self, name, client, url, queries, repeat):
+        position = iter(range(10 ** 9))
+
+        def request():
+            query = queries[next(position) % len(queries)]
+            if url is None:
+                return client.get(query)
+            return client.get(url, query)
+
+        self.stdout.write(format_summary(name, measure(request, repeat)))
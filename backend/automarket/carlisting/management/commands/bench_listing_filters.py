@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from core import seeding
+from core.bench import (
+    bench_client,
+    format_summary,
+    measure,
+    seed_bench_listings,
+)
+
+
+class Command(BaseCommand):
+    """Report p50/p99 latency of the filter endpoint for typical mixes."""
+
+    help = 'Benchmark the faceted listing filter endpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Insert this many synthetic listings before measuring.'
+        )
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=100)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            seed_bench_listings(options['seed'], stdout=self.stdout, vacuum=True)
+
+        brand, other_brand = (brand.name for brand in seeding.get_brands(2))
+        city = seeding.get_locations(1)[0].city
+        mixes = [
+            ('brand', {'brand': brand}),
+            ('brand + price range', {
+                'brand': brand, 'price_min': 10000, 'price_max': 30000,
+            }),
+            ('two brands + year range', {
+                'brand': [brand, other_brand],
+                'year_min': 2010, 'year_max': 2020,
+            }),
+            ('body type + mileage ceiling', {
+                'body_type': 'SUV', 'mileage_max': 100000,
+            }),
+            ('city + transmission', {
+                'city': city, 'transmission': 'Automatic',
+            }),
+            ('everything', {
+                'brand': brand, 'body_type': 'Sedan', 'color': 'Black',
+                'engine_type': 'Gasoline', 'price_min': 5000,
+                'price_max': 60000, 'year_min': 2000, 'mileage_max': 200000,
+            }),
+        ]
+
+        client = bench_client()
+        url = reverse('carlisting:carlisting_filter')
+        for name, params in mixes:
+            params['page_size'] = options['page_size']
+            samples = measure(
+                lambda: client.get(url, params), options['repeat']
+            )
+            self.stdout.write(format_summary(name, samples))
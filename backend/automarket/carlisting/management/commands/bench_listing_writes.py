@@ -0,0 +1,99 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from carlisting.models import CarListing
+from carlisting.serializers import CarListingSerializer
+from core import seeding
+from core.bench import (
+    format_summary,
+    get_bench_user,
+    measure,
+)
+
+
+class Command(BaseCommand):
+    """Measure round-trips and latency of CarListingSerializer writes."""
+
+    help = 'Benchmark listing create/update through CarListingSerializer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--images', type=int, nargs='+', default=[1, 10, 30]
+        )
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        self.user = get_bench_user()
+        self.brand_name = seeding.get_brands(1)[0].name
+        self.city = seeding.get_locations(1)[0].city
+        self.created = []
+
+        try:
+            for count in options['images']:
+                self.run_case(count, options['repeat'])
+        finally:
+            CarListing.objects.filter(id__in=self.created).delete()
+
+    def run_case(self, image_count, repeat):
+        def create():
+            self.created.append(self.save(self.payload(image_count)).id)
+
+        def update():
+            # Keep half of the images, replace the rest.
+            payload = {'images': self.images(image_count, offset=image_count // 2)}
+            self.save(payload, CarListing.objects.get(id=self.created[-1]))
+
+        create_queries = self.count_queries(create)
+        self.stdout.write(format_summary(
+            f'create, {image_count} images, {create_queries} round-trips',
+            measure(create, repeat)
+        ))
+        update_queries = self.count_queries(update)
+        self.stdout.write(format_summary(
+            f'update, {image_count} images, {update_queries} round-trips',
+            measure(update, repeat)
+        ))
+
+    @staticmethod
+    def count_queries(func):
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        return len(queries)
+
+    def save(self, data, instance=None):
+        serializer = CarListingSerializer(
+            instance, data=data, partial=instance is not None
+        )
+        serializer.is_valid(raise_exception=True)
+        return serializer.save(user=self.user)
+
+    @staticmethod
+    def images(count, offset=0):
+        return [
+            {'image_url': f'https://example.com/bench/{offset + i}.jpg'}
+            for i in range(count)
+        ]
+
+    def payload(self, image_count):
+        return {
+            'title': 'Benchmark write',
+            'description': 'Listing written by bench_listing_writes.',
+            'price': '12345.00',
+            'year': 2015,
+            'mileage': 100000,
+            'engine_type': 'Diesel',
+            'transmission': 'Manual',
+            'body_type': 'Wagon',
+            'color': 'Grey',
+            'brand_name': self.brand_name,
+            'location_name': self.city,
+            'insurance_information': {
+                'insurance_start_date': '2024-01-01T00:00:00Z',
+                'insurance_end_date': '2025-01-01T00:00:00Z',
+                'owner_count': 1,
+                'accident_count': 0,
+                'accident_details': 'None',
+            },
+            'images': self.images(image_count),
+        }
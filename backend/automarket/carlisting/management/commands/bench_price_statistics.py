@@ -0,0 +1,118 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models.functions import Lower
+from django.urls import reverse
+from django.utils import timezone
+
+from carlisting.models import CarListing, PriceStatistic
+from carlisting.statistics import (
+    MILEAGE_BAND_WIDTH,
+    refresh_price_statistics,
+)
+from core.bench import (
+    bench_client,
+    format_summary,
+    measure,
+    percentile,
+    seed_bench_listings,
+)
+
+
+class Command(BaseCommand):
+    """
+    Compare the precomputed price estimate with computing it live, and time
+    full and incremental refreshes of the statistics table.
+    """
+
+    help = 'Benchmark market price statistics.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Insert this many synthetic listings before measuring.'
+        )
+        parser.add_argument(
+            '--touch', type=int, nargs='+', default=[10, 100, 1000],
+            help='Listings to modify before each incremental refresh.'
+        )
+        parser.add_argument('--repeat', type=int, default=100)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            seed_bench_listings(options['seed'], stdout=self.stdout, vacuum=True)
+
+        self.stdout.write(format_summary(
+            'full recompute', measure(refresh_price_statistics, 3, warmup=0)
+        ))
+        self.bench_incremental(options['touch'])
+        self.bench_estimate(options['repeat'])
+
+    def bench_incremental(self, touch_counts):
+        ids = list(CarListing.objects.values_list('id', flat=True)[:100000])
+        rng = random.Random(0)
+        for count in touch_counts:
+            samples = []
+            for _ in range(10):
+                since = timezone.now()
+                CarListing.objects.filter(
+                    id__in=rng.sample(ids, min(count, len(ids)))
+                ).update(updated_at=timezone.now())
+                started = time.perf_counter()
+                refresh_price_statistics(since=since)
+                samples.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(format_summary(
+                f'incremental refresh, {count} listings touched', samples
+            ))
+
+    def bench_estimate(self, repeat):
+        statistic = (
+            PriceStatistic.objects.select_related('brand').exclude(model='')
+            .order_by('-count').first()
+        )
+        if statistic is None:
+            self.stdout.write('No statistics to query.')
+            return
+
+        client = bench_client()
+        url = reverse('carlisting:price_estimate')
+        params = {
+            'brand': statistic.brand.name,
+            'model': statistic.model,
+            'year': statistic.year,
+            'mileage': statistic.mileage_band * MILEAGE_BAND_WIDTH,
+        }
+        self.stdout.write(format_summary(
+            f'price-estimate endpoint ({statistic.count} listings)',
+            measure(lambda: client.get(url, params), repeat)
+        ))
+
+        bucket = {
+            'brand_id': statistic.brand_id,
+            'model': statistic.model,
+            'year': statistic.year,
+            'mileage_band': statistic.mileage_band,
+        }
+        self.stdout.write(format_summary(
+            'precomputed bucket lookup',
+            measure(lambda: PriceStatistic.objects.get(**bucket), repeat)
+        ))
+
+        live = CarListing.objects.annotate(model_lower=Lower('model')).filter(
+            brand=statistic.brand,
+            model_lower=statistic.model,
+            year=statistic.year,
+            mileage__gte=params['mileage'],
+            mileage__lt=params['mileage'] + MILEAGE_BAND_WIDTH,
+            is_sold=False,
+        )
+
+        def compute_live():
+            prices = sorted(live.values_list('price', flat=True))
+            return [percentile(prices, pct) for pct in (10, 50, 90)]
+
+        self.stdout.write(format_summary(
+            'live percentiles over the same listings',
+            measure(compute_live, repeat)
+        ))
@@ -0,0 +1,141 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from carlisting.matching import (
+    LISTING_FIELDS,
+    SavedSearchIndex,
+    load_saved_searches,
+    match_listings,
+)
+from carlisting.models import CarListing, SavedSearch
+from core import seeding
+from core.bench import (
+    format_summary,
+    get_bench_user,
+    measure,
+    seed_bench_listings,
+)
+
+
+class Command(BaseCommand):
+    """
+    Match recent listings against many synthetic saved searches, comparing
+    the inverted index with checking every search, and time the matching
+    task end to end. The synthetic searches and their matches are removed
+    afterwards.
+    """
+
+    help = 'Benchmark saved search matching.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Insert this many synthetic listings before measuring.'
+        )
+        parser.add_argument('--searches', type=int, default=100000)
+        parser.add_argument('--listings', type=int, default=2000)
+        parser.add_argument(
+            '--scan-listings', type=int, default=200,
+            help='Listings matched by the full scan baseline.'
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            seed_bench_listings(options['seed'], stdout=self.stdout, vacuum=True)
+
+        buyer = get_bench_user('bench-buyer')
+        SavedSearch.objects.filter(user=buyer).delete()
+        self.create_searches(buyer, options['searches'])
+        try:
+            self.bench(options)
+        finally:
+            SavedSearch.objects.filter(user=buyer).delete()
+
+    def create_searches(self, user, count, batch_size=5000):
+        rng = random.Random(0)
+        brands = seeding.get_brands(seeding.DEFAULTS['brands'])
+        locations = seeding.get_locations(seeding.DEFAULTS['locations'])
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            searches = []
+            for _ in range(size):
+                # Buyers mostly pin a brand and a price bracket.
+                low = rng.randrange(1000, 90000)
+                searches.append(SavedSearch(
+                    user=user,
+                    brand=rng.choice(brands) if rng.random() < 0.9 else None,
+                    location=(
+                        rng.choice(locations) if rng.random() < 0.3 else None
+                    ),
+                    body_type=(
+                        rng.choice(['Sedan', 'SUV', 'Hatchback', 'Coupe'])
+                        if rng.random() < 0.5 else ''
+                    ),
+                    price_min=Decimal(low) if rng.random() < 0.9 else None,
+                    price_max=Decimal(low + rng.randrange(2000, 15000)),
+                    year_min=(
+                        rng.randrange(1990, 2024) if rng.random() < 0.6 else None
+                    ),
+                    mileage_max=(
+                        rng.randrange(10000, 300000)
+                        if rng.random() < 0.5 else None
+                    ),
+                ))
+            SavedSearch.objects.bulk_create(searches)
+            created += size
+        self.stdout.write(f'Created {count} saved searches')
+
+    def bench(self, options):
+        samples = measure(
+            lambda: SavedSearchIndex(load_saved_searches()), 3, warmup=0
+        )
+        self.stdout.write(format_summary('index build', samples))
+        index = SavedSearchIndex(load_saved_searches())
+        searches = index.searches
+
+        listings = list(
+            CarListing.objects.order_by('-id')
+            .values(*LISTING_FIELDS)[:options['listings']]
+        )
+        if not listings:
+            self.stdout.write('No listings to match.')
+            return
+
+        started = time.perf_counter()
+        matched = sum(len(index.match(listing)) for listing in listings)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{"inverted index":<40} {len(listings) / elapsed:10.0f} '
+            f'listings/s ({matched / len(listings):.1f} matches per listing)'
+        )
+
+        sample = listings[:options['scan_listings']]
+        started = time.perf_counter()
+        for listing in sample:
+            [
+                search['id'] for search in searches
+                if SavedSearchIndex.accepts(search, listing)
+            ]
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{"full scan":<40} {len(sample) / elapsed:10.0f} listings/s'
+        )
+
+        ids = [listing['id'] for listing in listings]
+        batches = [ids[i:i + 500] for i in range(0, len(ids), 500)]
+        samples = []
+        started = time.perf_counter()
+        for batch in batches:
+            batch_started = time.perf_counter()
+            match_listings(batch, index=index)
+            samples.append((time.perf_counter() - batch_started) * 1000)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(format_summary('match task, 500 listings', samples))
+        self.stdout.write(
+            f'{"match task end to end":<40} {len(ids) / elapsed:10.0f} '
+            f'listings/s'
+        )
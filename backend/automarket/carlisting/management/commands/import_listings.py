@@ -0,0 +1,51 @@
+import json
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from carlisting.importers import FORMATS, ListingImporter, guess_format, read_rows
+
+
+class Command(BaseCommand):
+    """Stream a CSV or NDJSON file of listings into the database."""
+
+    help = 'Bulk-import car listings for a user from CSV or NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin.")
+        parser.add_argument('--user', required=True, help='Owner username.')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+
+        path = options['path']
+        file_format = options['format'] or guess_format(path)
+        importer = ListingImporter(
+            user,
+            batch_size=options['batch_size'],
+            on_error=self.report_error
+        )
+
+        started = time.monotonic()
+        if path == '-':
+            created, failed = importer.run(read_rows(sys.stdin, file_format))
+        else:
+            with open(path, encoding='utf-8-sig', newline='') as stream:
+                created, failed = importer.run(read_rows(stream, file_format))
+        elapsed = time.monotonic() - started
+
+        rate = created / elapsed * 60 if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {created} listings, {failed} rows failed '
+            f'({elapsed:.1f}s, {rate:.0f} rows/min).'
+        ))
+
+    def report_error(self, row_number, errors):
+        self.stderr.write(f'Row {row_number}: {json.dumps(errors)}')
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from carlisting.statistics import refresh_price_statistics
+
+
+class Command(BaseCommand):
+    """Rebuild every price statistics bucket from the listings table."""
+
+    help = 'Recompute market price statistics from scratch.'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = refresh_price_statistics()
+        if result is None:
+            raise CommandError('Another price statistics refresh is running.')
+        updated, removed = result
+        self.stdout.write(self.style.SUCCESS(
+            f'{updated} buckets computed, {removed} removed '
+            f'in {time.perf_counter() - started:.2f}s.'
+        ))
@@ -0,0 +1,345 @@
+import bisect
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from core.mail import queue_messages
+from core.outbox import enqueue_task
+from .models import CarListing, SavedSearch, SavedSearchMatch
+
+# Listing attributes a saved search either pins to one value or leaves open.
+DISCRETE_CRITERIA = (
+    'brand_id', 'body_type', 'transmission', 'engine_type', 'location_id'
+)
+
+# Listing attribute -> (lower bound field, upper bound field) on SavedSearch.
+RANGE_CRITERIA = {
+    'price': ('price_min', 'price_max'),
+    'year': ('year_min', 'year_max'),
+    'mileage': (None, 'mileage_max'),
+}
+
+LISTING_FIELDS = ('id', 'user_id', *DISCRETE_CRITERIA, *RANGE_CRITERIA)
+
+VERSION_KEY = 'carlisting:saved-searches:version'
+
+# A worker rebuilds its index at most this often, so a burst of edits to
+# saved searches costs one rebuild; new searches apply within this delay.
+REBUILD_INTERVAL = 60
+
+# Pending matches mailed per notification run.
+NOTIFICATION_BATCH_SIZE = 10000
+
+
+# Range bounds are summarised by this many precomputed bitmaps per side.
+RANGE_CHECKPOINTS = 64
+
+
+def _bitmap(positions):
+    # Set bits in a bytearray; OR-ing into a growing int is quadratic.
+    positions = list(positions)
+    if not positions:
+        return 0
+    data = bytearray((max(positions) >> 3) + 1)
+    for position in positions:
+        data[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(data, 'little')
+
+
+class RangeIndex:
+    """
+    Saved searches bounding one numeric listing attribute.
+
+    Each side keeps its bounds sorted, plus a bitmap of the searches with
+    the lowest (or highest) bounds at ``RANGE_CHECKPOINTS`` evenly spaced
+    cut points. A lookup bisects the bounds and returns the bitmap of the
+    nearest cut point that covers every search admitting the value; the
+    few extra searches it lets through are rejected by
+    ``SavedSearchIndex.accepts``.
+    """
+
+    def __init__(self, lower, upper):
+        # ``lower``/``upper``: {position: bound or None}.
+        self.lower = self._side(lower)
+        self.upper = self._side(upper, reverse=True)
+
+    @staticmethod
+    def _side(bounds, reverse=False):
+        open_bitmap = _bitmap(
+            position for position, bound in bounds.items() if bound is None
+        )
+        ordered = sorted(
+            ((bound, position) for position, bound in bounds.items()
+             if bound is not None),
+            reverse=reverse,
+        )
+        keys = [-bound if reverse else bound for bound, _ in ordered]
+        step = max(-(-len(ordered) // RANGE_CHECKPOINTS), 1)
+        checkpoints = [open_bitmap]
+        bitmap = open_bitmap
+        for start in range(0, len(ordered), step):
+            bitmap |= _bitmap(position for _, position in ordered[start:start + step])
+            checkpoints.append(bitmap)
+        return keys, step, checkpoints
+
+    @staticmethod
+    def _admitted(side, key):
+        keys, step, checkpoints = side
+        admitted = bisect.bisect_right(keys, key)
+        return checkpoints[-(-admitted // step)]
+
+    def candidates(self, value):
+        """Bitmap of a superset of the searches whose bounds admit ``value``."""
+        return (
+            self._admitted(self.lower, value)
+            & self._admitted(self.upper, -value)
+        )
+
+
+class SavedSearchIndex:
+    """
+    In-memory inverted index over active saved searches.
+
+    Every search gets a bit position. Each discrete criterion maps a value
+    to the bitmap of searches pinned to it, next to the bitmap of searches
+    that leave it open; each numeric attribute has a ``RangeIndex``.
+    Matching a listing ANDs one bitmap per criterion, so only the searches
+    that pass every criterion's index are looked at individually; the cost
+    follows the number of matches rather than the number of searches.
+    """
+
+    def __init__(self, searches):
+        # ``searches``: dicts with 'id', 'user_id' and every criteria field.
+        self.searches = []
+        pinned = {name: defaultdict(list) for name in DISCRETE_CRITERIA}
+        open_positions = {name: [] for name in DISCRETE_CRITERIA}
+        bounds = {attribute: ({}, {}) for attribute in RANGE_CRITERIA}
+        for position, search in enumerate(searches):
+            self.searches.append(search)
+            for name in DISCRETE_CRITERIA:
+                value = search[name]
+                if value in (None, ''):
+                    open_positions[name].append(position)
+                else:
+                    pinned[name][value].append(position)
+            for attribute, fields in RANGE_CRITERIA.items():
+                for side, field in zip(bounds[attribute], fields):
+                    side[position] = search[field] if field else None
+        self.discrete = {
+            name: {value: _bitmap(positions) for value, positions in values.items()}
+            for name, values in pinned.items()
+        }
+        self.open = {
+            name: _bitmap(positions) for name, positions in open_positions.items()
+        }
+        self.ranges = {
+            attribute: RangeIndex(lower, upper)
+            for attribute, (lower, upper) in bounds.items()
+        }
+        self.everything = (1 << len(self.searches)) - 1
+
+    def __len__(self):
+        return len(self.searches)
+
+    def match(self, listing):
+        """Return the ids of saved searches matching a listing dict."""
+        candidates = self.everything
+        for name in DISCRETE_CRITERIA:
+            candidates &= (
+                self.discrete[name].get(listing[name], 0) | self.open[name]
+            )
+            if not candidates:
+                return []
+        for attribute, index in self.ranges.items():
+            candidates &= index.candidates(listing[attribute])
+            if not candidates:
+                return []
+
+        matches = []
+        # Walking the binary representation finds set bits in C.
+        bits = bin(candidates)[:1:-1]
+        position = bits.find('1')
+        while position != -1:
+            search = self.searches[position]
+            if self.accepts(search, listing):
+                matches.append(search['id'])
+            position = bits.find('1', position + 1)
+        return matches
+
+    @staticmethod
+    def accepts(search, listing):
+        if search['user_id'] == listing['user_id']:
+            return False
+        for name in DISCRETE_CRITERIA:
+            if search[name] not in (None, '') and search[name] != listing[name]:
+                return False
+        for attribute, (lower, upper) in RANGE_CRITERIA.items():
+            value = listing[attribute]
+            if lower and search[lower] is not None and value < search[lower]:
+                return False
+            if upper and search[upper] is not None and value > search[upper]:
+                return False
+        return True
+
+
+def load_saved_searches():
+    fields = ['id', 'user_id', *DISCRETE_CRITERIA]
+    for lower, upper in RANGE_CRITERIA.values():
+        fields.extend(field for field in (lower, upper) if field)
+    return SavedSearch.objects.filter(is_active=True).values(*fields).iterator(
+        chunk_size=10000
+    )
+
+
+class _IndexHolder:
+    def __init__(self):
+        self.index = None
+        self.version = None
+        self.checked_at = 0
+        self.lock = threading.Lock()
+
+    def get(self):
+        with self.lock:
+            now = time.monotonic()
+            if self.index is not None and now - self.checked_at < REBUILD_INTERVAL:
+                return self.index
+            version = cache.get(VERSION_KEY)
+            if self.index is None or version != self.version:
+                self.index = SavedSearchIndex(load_saved_searches())
+                self.version = version
+            self.checked_at = now
+            return self.index
+
+    def invalidate(self):
+        """Drop this worker's index now and every worker's after commit."""
+        self.index = None
+        transaction.on_commit(self._bump_version)
+
+    def _bump_version(self):
+        self.index = None
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+_holder = _IndexHolder()
+
+
+def get_saved_search_index():
+    """This worker's index, rebuilt when saved searches have changed."""
+    return _holder.get()
+
+
+def invalidate_saved_search_index():
+    _holder.invalidate()
+
+
+def _array_literal(ids):
+    # Much cheaper for the driver to send than a list adapted to ARRAY[...].
+    return '{%s}' % ','.join(map(str, ids))
+
+
+def match_listings(listing_ids, index=None):
+    """
+    Match new listings against saved searches and record the matches.
+
+    Returns the number of new ``SavedSearchMatch`` rows.
+    """
+    index = index or get_saved_search_index()
+    listings = CarListing.objects.filter(
+        id__in=listing_ids, is_hidden=False, is_sold=False
+    ).values(*LISTING_FIELDS)
+    search_ids, matched_listing_ids = [], []
+    for listing in listings:
+        for search_id in index.match(listing):
+            search_ids.append(search_id)
+            matched_listing_ids.append(listing['id'])
+    if not search_ids:
+        return 0
+    # The index may be up to REBUILD_INTERVAL old, so searches deleted or
+    # paused since it was built are dropped here. bulk_create() cannot
+    # report how many rows were actually new.
+    sql = f'''
+        INSERT INTO {SavedSearchMatch._meta.db_table}
+            (saved_search_id, car_listing_id, created_at)
+        SELECT matched.search_id, matched.listing_id, now()
+        FROM unnest(%s::bigint[], %s::bigint[])
+            AS matched (search_id, listing_id)
+        JOIN {SavedSearch._meta.db_table} AS search
+            ON search.id = matched.search_id AND search.is_active
+        ON CONFLICT (saved_search_id, car_listing_id) DO NOTHING
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql, [_array_literal(search_ids), _array_literal(matched_listing_ids)]
+        )
+        return cursor.rowcount
+
+
+def queue_listing_matches(listing_ids):
+    """Match newly created listings once the current transaction commits."""
+    from .tasks import match_saved_searches_task
+
+    listing_ids = list(listing_ids)
+    if listing_ids:
+        enqueue_task(match_saved_searches_task, listing_ids)
+
+
+def _digest_message(user, matches):
+    lines = [f'New listings match your saved searches, {user.username}:', '']
+    for match in matches:
+        listing = match.car_listing
+        link = reverse('carlisting:carlisting_detail', args=[listing.pk])
+        search = match.saved_search.name or f'search #{match.saved_search_id}'
+        lines.append(
+            f'[{search}] {listing.title}, {listing.year}, {listing.price}: '
+            f'{settings.DOMAIN_NAME}{link}'
+        )
+    return EmailMessage(
+        subject=f'{len(matches)} new listings for your saved searches',
+        body='\n'.join(lines),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[user.email],
+    )
+
+
+def send_match_notifications(limit=NOTIFICATION_BATCH_SIZE):
+    """
+    Queue one email per user digesting their pending matches.
+
+    Up to ``limit`` pending matches are queued with a single INSERT, for
+    ``core.mail`` to send in batches, and marked notified in the same
+    transaction. Matches whose listing has since been hidden or sold are
+    marked without being mailed. Returns ``(emails, matches)``.
+    """
+    pending = list(
+        SavedSearchMatch.objects.filter(notified_at__isnull=True)
+        .select_related('saved_search__user', 'car_listing')
+        .order_by('id')[:limit]
+    )
+    if not pending:
+        return 0, 0
+
+    by_user = defaultdict(list)
+    for match in pending:
+        listing = match.car_listing
+        if not (listing.is_hidden or listing.is_sold):
+            by_user[match.saved_search.user].append(match)
+    messages = [
+        _digest_message(user, matches)
+        for user, matches in by_user.items() if user.email
+    ]
+    with transaction.atomic():
+        queue_messages(messages)
+        SavedSearchMatch.objects.filter(
+            id__in=[match.id for match in pending]
+        ).update(notified_at=timezone.now())
+    return len(messages), len(pending)
@@ -0,0 +1,19 @@
+# Generated by Django 5.0 on 2026-10-18 19:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carlisting', '0006_rename_uploaded_at_carimage_created_at_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carlisting',
+            index=models.Index(condition=models.Q(('is_hidden', False)), fields=['-created_at', '-id'], name='carlisting_visible_feed_idx'),
+        ),
+    ]
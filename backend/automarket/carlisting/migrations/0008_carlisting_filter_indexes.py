@@ -0,0 +1,35 @@
+# Generated by Django 5.0 on 2026-10-18 19:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carlisting', '0007_carlisting_visible_feed_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carlisting',
+            index=models.Index(condition=models.Q(('is_hidden', False)), fields=['brand', '-created_at', '-id'], name='carlisting_brand_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carlisting',
+            index=models.Index(condition=models.Q(('is_hidden', False)), fields=['body_type', '-created_at', '-id'], name='carlisting_body_type_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carlisting',
+            index=models.Index(condition=models.Q(('is_hidden', False)), fields=['location', '-created_at', '-id'], name='carlisting_location_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carlisting',
+            index=models.Index(condition=models.Q(('is_hidden', False)), fields=['brand', 'price'], name='carlisting_brand_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carlisting',
+            index=models.Index(condition=models.Q(('is_hidden', False)), fields=['brand', 'model', 'year'], name='carlisting_brand_model_idx'),
+        ),
+    ]
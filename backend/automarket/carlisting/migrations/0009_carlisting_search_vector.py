@@ -0,0 +1,45 @@
+# Generated by Django 5.0 on 2026-10-18 19:46
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def backfill_search_vector(apps, schema_editor):
+    # Walk the table in id ranges so no single UPDATE locks every row.
+    CarListing = apps.get_model('carlisting', 'CarListing')
+    vector = (
+        SearchVector('title', weight='A', config='simple')
+        + SearchVector('description', weight='B', config='simple')
+    )
+    last_id = CarListing.objects.order_by('-id').values_list('id', flat=True).first()
+    for start in range(0, (last_id or 0) + 1, BACKFILL_BATCH_SIZE):
+        CarListing.objects.filter(
+            id__gte=start, id__lt=start + BACKFILL_BATCH_SIZE
+        ).update(search_vector=vector)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('carlisting', '0008_carlisting_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carlisting',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='carlisting',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='carlisting_search_idx'),
+        ),
+    ]
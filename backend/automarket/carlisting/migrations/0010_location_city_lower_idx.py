@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 19:55
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carlisting', '0009_carlisting_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(django.db.models.functions.text.Lower('city'), name='location_city_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.0 on 2026-10-18 20:13
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carlisting', '0010_location_city_lower_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=255)),
+                ('year', models.IntegerField()),
+                ('mileage_band', models.IntegerField()),
+                ('count', models.IntegerField()),
+                ('p10', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('median', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('p90', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('computed_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='carlisting',
+            index=models.Index(fields=['updated_at'], name='carlisting_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carlisting',
+            index=models.Index(models.F('brand'), django.db.models.functions.text.Lower('model'), models.F('year'), models.F('mileage'), models.F('price'), condition=models.Q(('is_sold', False)), name='carlisting_price_bucket_idx'),
+        ),
+        migrations.AddField(
+            model_name='pricestatistic',
+            name='brand',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='carlisting.brand'),
+        ),
+        migrations.AddConstraint(
+            model_name='pricestatistic',
+            constraint=models.UniqueConstraint(fields=('brand', 'model', 'year', 'mileage_band'), name='pricestatistic_bucket_unique'),
+        ),
+    ]
@@ -1,5 +1,10 @@
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import Lower, RowNumber
+from django.utils import timezone
 from core.models import BaseModel
 
 
@@ -23,11 +28,48 @@ class Location(BaseModel):
     postal_code = models.CharField(max_length=20)
     time_zone = models.CharField(max_length=50)
     description = models.TextField()
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Derived from the coordinates on save; see carlisting.geo.
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(Lower('city'), name='location_city_lower_idx'),
+            models.Index(
+                fields=['geohash'],
+                name='location_geohash_idx',
+                opclasses=['varchar_pattern_ops'],
+            ),
+        ]
 
     def __str__(self):
         return f'{self.city}, {self.region}, {self.country}'
 
 
+def cover_image_prefetch(lookup='images'):
+    """
+    Prefetch the first image of every listing into ``cover_images``.
+
+    A ``ROW_NUMBER()`` window picks one image per listing, so a page of any
+    size costs a single extra query instead of one per row. ``lookup`` is
+    the path to the images relation, e.g. ``'car_listing__images'``.
+    """
+    first_images = CarImage.objects.annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=F('car_listing'),
+            order_by=F('id').asc(),
+        )
+    ).filter(position=1)
+    return Prefetch(lookup, queryset=first_images, to_attr='cover_images')
+
+
+class CarListingQuerySet(models.QuerySet):
+    def with_cover_image(self):
+        return self.prefetch_related(cover_image_prefetch())
+
+
 class CarListing(BaseModel):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
@@ -45,6 +87,50 @@ class CarListing(BaseModel):
     is_sold = models.BooleanField(default=False)
     paid = models.BooleanField(default=False)
     is_hidden = models.BooleanField(default=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = CarListingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='carlisting_search_idx'),
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(is_hidden=False),
+                name='carlisting_visible_feed_idx',
+            ),
+            models.Index(
+                fields=['brand', '-created_at', '-id'],
+                condition=models.Q(is_hidden=False),
+                name='carlisting_brand_feed_idx',
+            ),
+            models.Index(
+                fields=['body_type', '-created_at', '-id'],
+                condition=models.Q(is_hidden=False),
+                name='carlisting_body_type_feed_idx',
+            ),
+            models.Index(
+                fields=['location', '-created_at', '-id'],
+                condition=models.Q(is_hidden=False),
+                name='carlisting_location_feed_idx',
+            ),
+            models.Index(
+                fields=['brand', 'price'],
+                condition=models.Q(is_hidden=False),
+                name='carlisting_brand_price_idx',
+            ),
+            models.Index(
+                fields=['brand', 'model', 'year'],
+                condition=models.Q(is_hidden=False),
+                name='carlisting_brand_model_idx',
+            ),
+            models.Index(fields=['updated_at'], name='carlisting_updated_at_idx'),
+            models.Index(
+                F('brand'), Lower('model'), F('year'), F('mileage'), F('price'),
+                condition=models.Q(is_sold=False),
+                name='carlisting_price_bucket_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.title} - {self.user.username}'
@@ -66,6 +152,20 @@ class InsuranceInfo(BaseModel):
         return f'Insurance Info for {self.car_listing.title}'
 
 
+def touch_listings(listing_ids):
+    CarListing.objects.filter(pk__in=listing_ids).update(updated_at=timezone.now())
+
+
+class CarImageQuerySet(models.QuerySet):
+    def delete(self):
+        # A deleted image leaves no timestamp behind, so the listing's
+        # updated_at moves instead; Last-Modified is derived from it.
+        listing_ids = set(self.values_list('car_listing_id', flat=True))
+        deleted = super().delete()
+        touch_listings(listing_ids)
+        return deleted
+
+
 class CarImage(BaseModel):
     car_listing = models.ForeignKey(
         CarListing,
@@ -74,5 +174,100 @@ class CarImage(BaseModel):
     )
     image_url = models.URLField()
 
+    objects = CarImageQuerySet.as_manager()
+
     def __str__(self):
         return f'Image for {self.car_listing.title} uploaded at {self.created_at}'
+
+    def delete(self, *args, **kwargs):
+        deleted = super().delete(*args, **kwargs)
+        touch_listings([self.car_listing_id])
+        return deleted
+
+
+class PriceStatistic(models.Model):
+    """
+    Price distribution of unsold listings sharing a brand, model, year and
+    mileage band. Maintained by ``carlisting.statistics``.
+    """
+
+    brand = models.ForeignKey(Brand, on_delete=models.CASCADE)
+    # Stored lowercased so 'Corolla' and 'corolla' share a bucket.
+    model = models.CharField(max_length=255)
+    year = models.IntegerField()
+    mileage_band = models.IntegerField()
+    count = models.IntegerField()
+    p10 = models.DecimalField(max_digits=10, decimal_places=2)
+    median = models.DecimalField(max_digits=10, decimal_places=2)
+    p90 = models.DecimalField(max_digits=10, decimal_places=2)
+    computed_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['brand', 'model', 'year', 'mileage_band'],
+                name='pricestatistic_bucket_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.brand_id} {self.model} {self.year} band {self.mileage_band}'
+
+
+class SavedSearch(BaseModel):
+    """A buyer's listing criteria; new listings that match are notified."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='saved_searches'
+    )
+    name = models.CharField(max_length=255, blank=True)
+    brand = models.ForeignKey(Brand, on_delete=models.CASCADE, null=True, blank=True)
+    body_type = models.CharField(max_length=100, blank=True)
+    transmission = models.CharField(max_length=100, blank=True)
+    engine_type = models.CharField(max_length=100, blank=True)
+    location = models.ForeignKey(
+        Location, on_delete=models.CASCADE, null=True, blank=True
+    )
+    price_min = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True
+    )
+    price_max = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True
+    )
+    year_min = models.IntegerField(null=True, blank=True)
+    year_max = models.IntegerField(null=True, blank=True)
+    mileage_max = models.IntegerField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f'Saved search {self.name or self.pk} of {self.user_id}'
+
+
+class SavedSearchMatch(models.Model):
+    # savedsearchmatch_unique leads with saved_search and serves its lookups.
+    saved_search = models.ForeignKey(
+        SavedSearch,
+        on_delete=models.CASCADE,
+        related_name='matches',
+        db_index=False
+    )
+    car_listing = models.ForeignKey(CarListing, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    notified_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['saved_search', 'car_listing'],
+                name='savedsearchmatch_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['id'],
+                condition=models.Q(notified_at__isnull=True),
+                name='savedsearchmatch_pending_idx',
+            ),
+        ]
@@ -0,0 +1,103 @@
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+
+from core.pagination import KeysetPagination
+
+
+class CarListingPageNumberPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset()`` through the async ORM."""
+        self.request = request
+        paginator = self.django_paginator_class(
+            queryset, self.get_page_size(request)
+        )
+        # Counted up front; the paginator would count synchronously.
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+
+        self.page.object_list = [row async for row in self.page.object_list]
+        return self.page.object_list
+
+
+class CarListingFeedPagination(BasePagination):
+    """
+    Page-number pagination for the main feed, with an opt-in keyset mode.
+
+    Sending ``?cursor=`` (empty for the first page) switches the response to
+    keyset pagination on ``(created_at, id)``; ``?page=N`` keeps working for
+    existing clients.
+    """
+
+    def __init__(self):
+        self.page_number = CarListingPageNumberPagination()
+        self.keyset = KeysetPagination()
+        self.active = self.page_number
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.keyset.cursor_query_param in request.query_params:
+            self.active = self.keyset
+        return self.active.paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        if self.keyset.cursor_query_param in request.query_params:
+            self.active = self.keyset
+        return await self.active.apaginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.active.get_paginated_response(data)
+
+
+class DistanceKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination on ``(distance, id)`` for location searches.
+
+    Every listing of a location shares the location's distance, so a page
+    can only hold listings from the nearest locations not yet paged past.
+    Instead of sorting every listing in the search area, each page is read
+    from the nearest few locations, and the set is widened only when those
+    hold too few listings. The view provides ``get_nearby_locations()``,
+    returning ``(location_id, distance)`` pairs ordered by distance.
+    """
+    ordering = ('distance', 'id')
+    initial_locations = 4
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        locations = view.get_nearby_locations()
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.get_seek_filter(position))
+            locations = [item for item in locations if item[1] >= position[0]]
+
+        count = self.initial_locations
+        while True:
+            # Locations tied with the last one taken must come along.
+            while count < len(locations) and (
+                locations[count][1] == locations[count - 1][1]
+            ):
+                count += 1
+            rows = list(queryset.filter(
+                location_id__in=[location_id for location_id, _ in locations[:count]]
+            )[:page_size + 1])
+            if len(rows) > page_size or count >= len(locations):
+                break
+            count *= 4
+
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
@@ -0,0 +1,48 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast
+
+from .models import CarListing
+
+# Listings are written in several languages, so no stemming dictionary.
+SEARCH_CONFIG = 'simple'
+
+
+def listing_search_vector():
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def search_vector_for(title, description):
+    """
+    The same tsvector built from values instead of columns.
+
+    Assigned to ``CarListing.search_vector`` before ``save()``, it is
+    computed inside the INSERT or UPDATE itself, saving a round-trip.
+    """
+    return (
+        SearchVector(Value(title), weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Value(description), weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(listing_ids):
+    """Recompute the stored tsvector of the given listings in one UPDATE."""
+    CarListing.objects.filter(pk__in=listing_ids).update(
+        search_vector=listing_search_vector()
+    )
+
+
+def search_car_listings(queryset, text):
+    """
+    Filter ``queryset`` to listings matching ``text`` and annotate ``rank``.
+
+    ``ts_rank`` returns a ``real``; it is cast to double precision so the
+    value survives the round trip through a keyset cursor exactly.
+    """
+    query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+    return queryset.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+    )
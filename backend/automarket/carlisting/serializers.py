@@ -1,5 +1,19 @@
+from decimal import Decimal
+
+from django.db import DataError, transaction
+from django.db.models import F
+from django.db.models.functions import Round
+from django.utils import timezone
 from rest_framework import serializers
-from .models import CarListing, Brand, Location, CarImage, InsuranceInfo
+from .models import (
+    CarListing, Brand, Location, CarImage, InsuranceInfo, PriceStatistic,
+    SavedSearch
+)
+from .cache import invalidate_feed
+from .lookups import brand_lookup, location_lookup
+from .matching import queue_listing_matches
+from .search import search_vector_for
+from .statistics import mileage_band_range
 
 
 class CarListingBriefSerializer(serializers.ModelSerializer):
@@ -10,12 +24,22 @@ class CarListingBriefSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'price', 'year', 'mileage', 'first_image_url']
 
     def get_first_image_url(self, obj):
-        first_image = obj.images.first()
+        if hasattr(obj, 'cover_images'):
+            first_image = obj.cover_images[0] if obj.cover_images else None
+        else:
+            first_image = obj.images.first()
         if first_image:
             return first_image.image_url
         return None
 
 
+class CarListingDistanceSerializer(CarListingBriefSerializer):
+    distance = serializers.FloatField(read_only=True)
+
+    class Meta(CarListingBriefSerializer.Meta):
+        fields = CarListingBriefSerializer.Meta.fields + ['distance']
+
+
 class CarImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = CarImage
@@ -57,7 +81,9 @@ class LocationSerializer(serializers.ModelSerializer):
             'country',
             'postal_code',
             'time_zone',
-            'description'
+            'description',
+            'latitude',
+            'longitude'
         ]
 
 
@@ -75,71 +101,286 @@ class CarListingSerializer(serializers.ModelSerializer):
             'brand_name', 'location_name', 'insurance_information', 'images'
         ]
 
+    @transaction.atomic
     def create(self, validated_data):
-        brand_name = validated_data.pop('brand_name')
-        location_name = validated_data.pop('location_name')
-
-        try:
-            brand = Brand.objects.get(name=brand_name)
-        except Brand.DoesNotExist:
-            raise serializers.ValidationError(
-                f"Brand with name '{brand_name}' does not exist."
-            )
-
-        try:
-            location = Location.objects.get(city=location_name)
-        except Location.DoesNotExist:
-            raise serializers.ValidationError(
-                f"Location with city '{location_name}' does not exist."
-            )
-
+        brand_id = self.get_brand_id(validated_data.pop('brand_name'))
+        location_id = self.get_location_id(validated_data.pop('location_name'))
         insurance_data = validated_data.pop('insurance_info')
         images_data = validated_data.pop('images')
 
         car_listing = CarListing.objects.create(
-            brand=brand, location=location, **validated_data
+            brand_id=brand_id,
+            location_id=location_id,
+            search_vector=search_vector_for(
+                validated_data['title'], validated_data['description']
+            ),
+            **validated_data
         )
-
-        InsuranceInfo.objects.create(
-            car_listing=car_listing, **insurance_data
-        )
-
-        for image_data in images_data:
-            CarImage.objects.create(car_listing=car_listing, **image_data)
+        InsuranceInfo.objects.create(car_listing=car_listing, **insurance_data)
+        CarImage.objects.bulk_create([
+            CarImage(car_listing=car_listing, **image_data)
+            for image_data in images_data
+        ])
+        invalidate_feed()
+        queue_listing_matches([car_listing.pk])
 
         return car_listing
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         if 'brand_name' in validated_data:
-            brand_name = validated_data.pop('brand_name')
-            try:
-                brand = Brand.objects.get(name=brand_name)
-            except Brand.DoesNotExist:
-                raise serializers.ValidationError(
-                    f"Brand with name '{brand_name}' does not exist."
-                )
-            instance.brand = brand
+            instance.brand_id = self.get_brand_id(
+                validated_data.pop('brand_name')
+            )
 
         if 'location_name' in validated_data:
-            location_name = validated_data.pop('location_name')
-            try:
-                location = Location.objects.get(city=location_name)
-            except Location.DoesNotExist:
-                raise serializers.ValidationError(
-                    f"Location with city '{location_name}' does not exist."
-                )
-            instance.location = location
+            instance.location_id = self.get_location_id(
+                validated_data.pop('location_name')
+            )
 
         if 'insurance_info' in validated_data:
             insurance_data = validated_data.pop('insurance_info')
-            insurance_info = instance.insurance_info
-            for attr, value in insurance_data.items():
-                setattr(insurance_info, attr, value)
-            insurance_info.save()
+            updated = InsuranceInfo.objects.filter(car_listing=instance).update(
+                updated_at=timezone.now(), **insurance_data
+            )
+            if not updated:
+                InsuranceInfo.objects.create(
+                    car_listing=instance, **insurance_data
+                )
+
+        if 'images' in validated_data:
+            self.replace_images(instance, validated_data.pop('images'))
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
+        if 'title' in validated_data or 'description' in validated_data:
+            instance.search_vector = search_vector_for(
+                instance.title, instance.description
+            )
         instance.save()
+        invalidate_feed()
 
         return instance
+
+    def get_brand_id(self, name):
+        brand_id = brand_lookup.get_id(name)
+        if brand_id is None:
+            raise serializers.ValidationError(
+                f"Brand with name '{name}' does not exist."
+            )
+        return brand_id
+
+    def get_location_id(self, city):
+        location_id = location_lookup.get_id(city)
+        if location_id is None:
+            raise serializers.ValidationError(
+                f"Location with city '{city}' does not exist."
+            )
+        return location_id
+
+    def replace_images(self, instance, images_data):
+        """
+        Make the listing's images match ``images_data`` by URL.
+
+        Images that are kept retain their rows (and ids, so the cover image
+        stays put); only removed URLs are deleted and only new ones inserted.
+        """
+        existing = {}
+        removed = []
+        # Of rows that share a URL only the oldest is kept.
+        for url, image_id in (
+            CarImage.objects.filter(car_listing=instance)
+            .order_by('id').values_list('image_url', 'id')
+        ):
+            if url in existing:
+                removed.append(image_id)
+            else:
+                existing[url] = image_id
+        wanted = list(dict.fromkeys(image['image_url'] for image in images_data))
+
+        removed += [
+            image_id for url, image_id in existing.items() if url not in wanted
+        ]
+        if removed:
+            CarImage.objects.filter(id__in=removed).delete()
+
+        added = [url for url in wanted if url not in existing]
+        if added:
+            CarImage.objects.bulk_create([
+                CarImage(car_listing=instance, image_url=url) for url in added
+            ])
+
+
+# Upper bound on the listing ids accepted by one bulk seller request.
+BULK_ACTION_LIMIT = 10000
+
+
+class CarListingBulkActionSerializer(serializers.Serializer):
+    """
+    Apply one seller action to many of the caller's listings.
+
+    Either ``car_listing_ids`` or ``all`` selects the listings. ``set_price``
+    needs ``price``; ``adjust_price`` needs ``percent`` (e.g. ``-10`` for a
+    10% discount).
+    """
+
+    ACTIONS = ('hide', 'show', 'mark_sold', 'set_price', 'adjust_price')
+
+    action = serializers.ChoiceField(choices=ACTIONS)
+    car_listing_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_ACTION_LIMIT,
+        required=False,
+    )
+    all = serializers.BooleanField(default=False)
+    price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=Decimal(0), required=False
+    )
+    percent = serializers.DecimalField(
+        max_digits=5, decimal_places=2,
+        min_value=Decimal(-99), max_value=Decimal(100),
+        required=False,
+    )
+
+    def validate(self, attrs):
+        if attrs['all'] == ('car_listing_ids' in attrs):
+            raise serializers.ValidationError(
+                "Provide either 'car_listing_ids' or 'all'."
+            )
+        for action, field in (('set_price', 'price'), ('adjust_price', 'percent')):
+            if attrs['action'] == action and field not in attrs:
+                raise serializers.ValidationError(
+                    {field: ['This field is required.']}
+                )
+        return attrs
+
+    def get_changes(self):
+        data = self.validated_data
+        action = data['action']
+        if action in ('hide', 'show'):
+            return {'is_hidden': action == 'hide'}
+        if action == 'mark_sold':
+            return {'is_sold': True}
+        if action == 'set_price':
+            return {'price': data['price']}
+        factor = 1 + data['percent'] / Decimal(100)
+        return {'price': Round(F('price') * factor, 2)}
+
+    def save(self, user):
+        """Run a single UPDATE scoped to ``user``; return the row count."""
+        queryset = CarListing.objects.filter(user=user)
+        if not self.validated_data['all']:
+            queryset = queryset.filter(id__in=self.validated_data['car_listing_ids'])
+        try:
+            with transaction.atomic():
+                updated = queryset.update(
+                    updated_at=timezone.now(), **self.get_changes()
+                )
+        except DataError:
+            raise serializers.ValidationError(
+                {'percent': ['The adjusted price is out of range.']}
+            )
+        if updated:
+            invalidate_feed()
+        return updated
+
+
+class PriceEstimateQuerySerializer(serializers.Serializer):
+    brand = serializers.CharField()
+    model = serializers.CharField()
+    year = serializers.IntegerField()
+    mileage = serializers.IntegerField(min_value=0)
+
+
+class PriceStatisticSerializer(serializers.ModelSerializer):
+    brand = serializers.ReadOnlyField(source='brand.name')
+    mileage_min = serializers.SerializerMethodField()
+    mileage_max = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PriceStatistic
+        fields = [
+            'brand', 'model', 'year', 'mileage_min', 'mileage_max',
+            'count', 'p10', 'median', 'p90', 'computed_at'
+        ]
+
+    def get_mileage_min(self, obj):
+        return mileage_band_range(obj.mileage_band)[0]
+
+    def get_mileage_max(self, obj):
+        return mileage_band_range(obj.mileage_band)[1]
+
+
+# Saved searches a single user may keep.
+SAVED_SEARCH_LIMIT = 50
+
+SAVED_SEARCH_CRITERIA = (
+    'brand_id', 'location_id', 'body_type', 'transmission', 'engine_type',
+    'price_min', 'price_max', 'year_min', 'year_max', 'mileage_max'
+)
+
+
+class SavedSearchSerializer(serializers.ModelSerializer):
+    brand_name = serializers.CharField(
+        source='brand.name', required=False, allow_null=True
+    )
+    location_name = serializers.CharField(
+        source='location.city', required=False, allow_null=True
+    )
+
+    class Meta:
+        model = SavedSearch
+        fields = [
+            'id', 'name', 'brand_name', 'location_name', 'body_type',
+            'transmission', 'engine_type', 'price_min', 'price_max',
+            'year_min', 'year_max', 'mileage_max', 'is_active', 'created_at'
+        ]
+        read_only_fields = ['id', 'created_at']
+
+    def validate(self, attrs):
+        if 'brand' in attrs:
+            name = (attrs.pop('brand') or {}).get('name')
+            attrs['brand_id'] = self.resolve(
+                brand_lookup, name, f"Brand with name '{name}' does not exist."
+            )
+        if 'location' in attrs:
+            city = (attrs.pop('location') or {}).get('city')
+            attrs['location_id'] = self.resolve(
+                location_lookup, city,
+                f"Location with city '{city}' does not exist."
+            )
+
+        def current(field):
+            if field in attrs or self.instance is None:
+                return attrs.get(field)
+            return getattr(self.instance, field)
+
+        for lower, upper in (('price_min', 'price_max'), ('year_min', 'year_max')):
+            low, high = current(lower), current(upper)
+            if low is not None and high is not None and low > high:
+                raise serializers.ValidationError(
+                    {lower: f'Must not exceed {upper}.'}
+                )
+        if all(current(field) in (None, '') for field in SAVED_SEARCH_CRITERIA):
+            raise serializers.ValidationError(
+                'A saved search needs at least one criterion.'
+            )
+        if self.instance is None:
+            user = self.context['request'].user
+            if user.saved_searches.count() >= SAVED_SEARCH_LIMIT:
+                raise serializers.ValidationError(
+                    f'No more than {SAVED_SEARCH_LIMIT} saved searches '
+                    f'are allowed.'
+                )
+        return attrs
+
+    @staticmethod
+    def resolve(lookup, name, message):
+        if name is None:
+            return None
+        resolved = lookup.get_id(name)
+        if resolved is None:
+            raise serializers.ValidationError(message)
+        return resolved
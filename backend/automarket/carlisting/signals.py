@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .geo import encode_geohash
+from .lookups import brand_lookup, location_lookup
+from .matching import invalidate_saved_search_index
+from .models import Brand, Location, SavedSearch
+
+
+@receiver([post_save, post_delete], sender=Brand)
+def invalidate_brand_lookup(sender, **kwargs):
+    brand_lookup.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Location)
+def invalidate_location_lookup(sender, **kwargs):
+    location_lookup.invalidate()
+
+
+@receiver([post_save, post_delete], sender=SavedSearch)
+def invalidate_saved_searches(sender, **kwargs):
+    invalidate_saved_search_index()
+
+
+@receiver(pre_save, sender=Location)
+def set_location_geohash(sender, instance, **kwargs):
+    # pre_save also runs for fixtures, which bypass Model.save().
+    if instance.latitude is None or instance.longitude is None:
+        instance.geohash = ''
+    else:
+        instance.geohash = encode_geohash(instance.latitude, instance.longitude)
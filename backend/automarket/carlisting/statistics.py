@@ -0,0 +1,146 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import CarListing, PriceStatistic
+
+# Listings are compared within mileage bands of this many kilometres.
+MILEAGE_BAND_WIDTH = 25000
+
+# Incremental runs re-read listings changed this long before the previous
+# run, so rows committed late by a concurrent transaction are not missed.
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+# Serializes refreshes; pg_try_advisory_xact_lock takes a bigint.
+REFRESH_LOCK_ID = 0x70726963
+
+
+def mileage_band(mileage):
+    return mileage // MILEAGE_BAND_WIDTH
+
+
+def mileage_band_range(band):
+    return band * MILEAGE_BAND_WIDTH, (band + 1) * MILEAGE_BAND_WIDTH - 1
+
+
+_TOUCHED_SQL = '''
+    touched AS (
+        SELECT DISTINCT brand_id, lower(model) AS model, year,
+            mileage / %(band_width)s AS mileage_band
+        FROM {listing}
+        WHERE updated_at >= %(since)s AND brand_id IS NOT NULL
+    ),
+'''
+
+_TOUCHED_JOIN = '''
+    JOIN touched
+        ON touched.brand_id = listing.brand_id
+        AND touched.model = lower(listing.model)
+        AND touched.year = listing.year
+        AND listing.mileage >= touched.mileage_band * %(band_width)s
+        AND listing.mileage < (touched.mileage_band + 1) * %(band_width)s
+'''
+
+_REFRESH_SQL = '''
+    WITH {touched}
+    computed AS (
+        SELECT
+            listing.brand_id,
+            lower(listing.model) AS model,
+            listing.year,
+            listing.mileage / %(band_width)s AS mileage_band,
+            count(*) AS count,
+            percentile_cont(0.1) WITHIN GROUP (ORDER BY listing.price) AS p10,
+            percentile_cont(0.5) WITHIN GROUP (ORDER BY listing.price) AS median,
+            percentile_cont(0.9) WITHIN GROUP (ORDER BY listing.price) AS p90
+        FROM {listing} AS listing
+        {touched_join}
+        WHERE NOT listing.is_sold AND listing.brand_id IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+    ), upserted AS (
+        INSERT INTO {stats} (
+            brand_id, model, year, mileage_band,
+            count, p10, median, p90, computed_at
+        )
+        SELECT
+            brand_id, model, year, mileage_band, count,
+            p10::numeric(10, 2), median::numeric(10, 2), p90::numeric(10, 2),
+            %(computed_at)s
+        FROM computed
+        ON CONFLICT (brand_id, model, year, mileage_band) DO UPDATE SET
+            count = EXCLUDED.count,
+            p10 = EXCLUDED.p10,
+            median = EXCLUDED.median,
+            p90 = EXCLUDED.p90,
+            computed_at = EXCLUDED.computed_at
+        RETURNING brand_id, model, year, mileage_band
+    ), removed AS (
+        DELETE FROM {stats} AS stat
+        USING (
+            SELECT brand_id, model, year, mileage_band FROM {stale_source}
+            EXCEPT
+            SELECT brand_id, model, year, mileage_band FROM computed
+        ) AS emptied
+        WHERE emptied.brand_id = stat.brand_id
+        AND emptied.model = stat.model
+        AND emptied.year = stat.year
+        AND emptied.mileage_band = stat.mileage_band
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM upserted), (SELECT count(*) FROM removed)
+'''
+
+
+def refresh_price_statistics(since=None):
+    """
+    Recompute the price statistics of every bucket touched since ``since``.
+
+    Each run is a single statement: the buckets holding a listing whose
+    ``updated_at`` is at least ``since`` are collected, their percentiles
+    are computed with one grouped ``percentile_cont`` scan and upserted, and
+    buckets left without unsold listings are deleted. Without ``since``
+    every bucket is recomputed and rows for buckets that no longer exist
+    are dropped.
+
+    Returns ``(updated, removed)``, or ``None`` when another refresh holds
+    the lock.
+    """
+    incremental = since is not None
+    listing_table = CarListing._meta.db_table
+    sql = _REFRESH_SQL.format(
+        touched=_TOUCHED_SQL.format(listing=listing_table) if incremental else '',
+        touched_join=_TOUCHED_JOIN if incremental else '',
+        # Buckets that may have lost all their listings.
+        stale_source='touched' if incremental else PriceStatistic._meta.db_table,
+        listing=listing_table,
+        stats=PriceStatistic._meta.db_table,
+    )
+    params = {
+        'band_width': MILEAGE_BAND_WIDTH,
+        'since': since,
+        'computed_at': timezone.now(),
+    }
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_xact_lock(%s)', [REFRESH_LOCK_ID])
+        if not cursor.fetchone()[0]:
+            return None
+        cursor.execute(sql, params)
+        return cursor.fetchone()
+
+
+def refresh_touched_price_statistics():
+    """
+    Refresh the buckets touched since the previous run.
+
+    The watermark is the newest ``computed_at``; with no statistics yet,
+    everything is computed from scratch. Listings that are deleted or moved
+    to another bucket leave their old bucket stale until it is touched
+    again or the periodic full recompute runs.
+    """
+    last_run = PriceStatistic.objects.aggregate(last=Max('computed_at'))['last']
+    if last_run is None:
+        return refresh_price_statistics()
+    return refresh_price_statistics(since=last_run - WATERMARK_OVERLAP)
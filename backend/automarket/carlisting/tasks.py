@@ -0,0 +1,36 @@
+from celery import shared_task
+
+from core.mail import dispatch_pending_emails
+from .matching import match_listings, send_match_notifications
+from .statistics import refresh_price_statistics, refresh_touched_price_statistics
+
+
+@shared_task
+def refresh_price_statistics_task():
+    result = refresh_touched_price_statistics()
+    if result is None:
+        return None
+    updated, removed = result
+    return {'updated': updated, 'removed': removed}
+
+
+@shared_task
+def recompute_price_statistics_task():
+    result = refresh_price_statistics()
+    if result is None:
+        return None
+    updated, removed = result
+    return {'updated': updated, 'removed': removed}
+
+
+@shared_task
+def match_saved_searches_task(listing_ids):
+    return match_listings(listing_ids)
+
+
+@shared_task
+def send_saved_search_notifications_task():
+    emails, matches = send_match_notifications()
+    if emails:
+        dispatch_pending_emails()
+    return {'emails': emails, 'matches': matches}
@@ -1,9 +1,55 @@
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync
 from django.core import mail
-from django.urls import reverse
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import resolve, reverse
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.test import APITestCase
 from users.models import User, EmailVerification
-from carlisting.models import CarListing, Brand, Location
+from carlisting.cache import aget_or_build, get_or_build
+from carlisting.geo import (
+    MAX_COVERING_CELLS,
+    bounding_box,
+    covering_geohashes,
+    encode_geohash,
+)
+from carlisting.importers import ListingImporter, read_rows
+from carlisting.lookups import brand_lookup, location_lookup
+from carlisting.matching import (
+    SavedSearchIndex,
+    get_saved_search_index,
+    match_listings,
+    send_match_notifications,
+)
+from carlisting.models import (
+    CarListing, Brand, Location, CarImage, InsuranceInfo, PriceStatistic,
+    SavedSearch, SavedSearchMatch
+)
+from carlisting.pagination import DistanceKeysetPagination
+from carlisting.search import update_search_vectors
+from carlisting.statistics import (
+    refresh_price_statistics,
+    refresh_touched_price_statistics,
+)
+from carlisting.tasks import (
+    recompute_price_statistics_task,
+    refresh_price_statistics_task,
+)
+from carlisting.serializers import SAVED_SEARCH_LIMIT, CarListingSerializer
+from carlisting.views import AsyncCarListingDetailView
+from core.mail import dispatch_pending_emails
+from core.models import OutgoingEmail
+from core.outbox import relay_outbox
 from celery import current_app
 from django.test import override_settings
 
@@ -33,6 +79,9 @@ class CarListingTests(APITestCase):
         mail.outbox = []
 
         self.client.post(reverse('users:register'), self.user_data, format='json')
+        # The verification task is published through the outbox.
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(relay_outbox(), 1)
 
         self.assertEqual(len(mail.outbox), 1)
         self.assertIn(self.user_data['email'], mail.outbox[0].to)
@@ -167,3 +216,1382 @@ class CarListingTests(APITestCase):
         response = self.client.post(show_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertFalse(CarListing.objects.get(id=car_listing_id).is_hidden)
+
+
+class CarListingFixtureMixin:
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='seller', password='TestPassword123', is_verified=True
+        )
+        self.brand = Brand.objects.create(
+            name="Toyota",
+            origin_country="Japan",
+            established_year=1937,
+            logo_url="https://example.com/toyota-logo.png",
+            description="Japanese automotive manufacturer.",
+            website="https://www.toyota.com",
+            headquarters="Toyota City, Aichi Prefecture, Japan"
+        )
+        self.location = Location.objects.create(
+            city="Kyiv",
+            region="Kyiv Oblast",
+            country="Ukraine",
+            postal_code="01001",
+            time_zone="Europe/Kyiv",
+            description="The capital city of Ukraine."
+        )
+        self.listings = [self.create_listing(i) for i in range(5)]
+
+    def create_listing(self, number, **kwargs):
+        fields = {
+            'user': self.user,
+            'title': f'Car {number}',
+            'description': 'Test Description',
+            'price': 10000 + number,
+            'year': 2020,
+            'mileage': 10000,
+            'engine_type': 'Gasoline',
+            'transmission': 'Manual',
+            'body_type': 'Sedan',
+            'color': 'Black',
+            'brand': self.brand,
+            'location': self.location,
+        }
+        fields.update(kwargs)
+        return CarListing.objects.create(**fields)
+
+
+class CarListingFeedPaginationTests(CarListingFixtureMixin, APITestCase):
+
+    def test_cursor_walks_feed_newest_first(self):
+        seen = []
+        response = self.client.get(reverse('main'), {'cursor': ''})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(item['id'] for item in response.data['results'])
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+
+        expected = [listing.id for listing in reversed(self.listings)]
+        self.assertEqual(seen, expected)
+
+    def test_cursor_is_stable_under_concurrent_inserts(self):
+        response = self.client.get(reverse('main'), {'cursor': ''})
+        first_page = [item['id'] for item in response.data['results']]
+
+        self.create_listing(99)
+
+        response = self.client.get(response.data['next'])
+        second_page = [item['id'] for item in response.data['results']]
+        self.assertFalse(set(first_page) & set(second_page))
+        self.assertEqual(
+            first_page + second_page,
+            [listing.id for listing in reversed(self.listings)][:4]
+        )
+
+    def test_cursor_skips_hidden_listings(self):
+        CarListing.objects.filter(id=self.listings[-1].id).update(is_hidden=True)
+        response = self.client.get(
+            reverse('main'), {'cursor': '', 'page_size': 10}
+        )
+        ids = [item['id'] for item in response.data['results']]
+        self.assertNotIn(self.listings[-1].id, ids)
+        self.assertEqual(len(ids), 4)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('main'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_number_mode_is_default(self):
+        response = self.client.get(reverse('main'), {'page': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [self.listings[2].id, self.listings[1].id]
+        )
+
+
+class CarListingFilterTests(CarListingFixtureMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.other_brand = Brand.objects.create(
+            name="BMW",
+            origin_country="Germany",
+            established_year=1916,
+            logo_url="https://example.com/bmw-logo.png",
+            description="German automotive manufacturer.",
+            website="https://www.bmw.com",
+            headquarters="Munich, Germany"
+        )
+        self.suv = self.create_listing(
+            10, brand=self.other_brand, body_type='SUV', year=2015
+        )
+        self.create_listing(11, brand=self.other_brand, is_hidden=True)
+
+    def test_filter_by_brand_and_price(self):
+        response = self.client.get(
+            reverse('carlisting:carlisting_filter'),
+            {'brand': 'Toyota', 'price_min': 10001, 'price_max': 10003,
+             'page_size': 10}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [listing.id for listing in reversed(self.listings[1:4])]
+        )
+
+    def test_filter_by_multiple_values(self):
+        response = self.client.get(
+            reverse('carlisting:carlisting_filter'),
+            {'body_type': ['SUV', 'Coupe'], 'year_max': 2016}
+        )
+        self.assertEqual(
+            [item['id'] for item in response.data['results']], [self.suv.id]
+        )
+
+    def test_facet_counts(self):
+        response = self.client.get(reverse('carlisting:carlisting_filter'))
+        facets = response.data['facets']
+        self.assertEqual(facets['brand'], {'Toyota': 5, 'BMW': 1})
+        self.assertEqual(facets['body_type'], {'Sedan': 5, 'SUV': 1})
+        self.assertEqual(facets['city'], {'Kyiv': 6})
+
+    def test_facet_counts_follow_filters(self):
+        response = self.client.get(
+            reverse('carlisting:carlisting_filter'), {'brand': 'BMW'}
+        )
+        self.assertEqual(response.data['facets']['body_type'], {'SUV': 1})
+
+    def test_unknown_reference_names_match_nothing(self):
+        response = self.client.get(
+            reverse('carlisting:carlisting_filter'), {'brand': 'Zaporozhets'}
+        )
+        self.assertEqual(response.data['results'], [])
+        self.assertEqual(response.data['facets']['brand'], {})
+
+    def test_city_filter_ignores_case(self):
+        response = self.client.get(
+            reverse('carlisting:carlisting_filter'),
+            {'city': 'KYIV', 'page_size': 10}
+        )
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_facets_only_on_first_page(self):
+        response = self.client.get(
+            reverse('carlisting:carlisting_filter'), {'page_size': 2}
+        )
+        response = self.client.get(response.data['next'])
+        self.assertNotIn('facets', response.data)
+
+    def test_invalid_range(self):
+        response = self.client.get(
+            reverse('carlisting:carlisting_filter'),
+            {'year_min': 2020, 'year_max': 2010}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CarListingSearchTests(CarListingFixtureMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.title_match = self.create_listing(
+            20, title='Toyota Camry hybrid', description='Family sedan'
+        )
+        self.description_match = self.create_listing(
+            21, title='Toyota Prius', description='Hybrid with low mileage'
+        )
+        update_search_vectors(
+            CarListing.objects.values_list('id', flat=True)
+        )
+
+    def search(self, **params):
+        return self.client.get(reverse('carlisting:carlisting_search'), params)
+
+    def test_results_are_ranked(self):
+        response = self.search(q='hybrid')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [self.title_match.id, self.description_match.id]
+        )
+
+    def test_keyset_pages_do_not_overlap(self):
+        seen = []
+        response = self.search(q='car', page_size=2)
+        while True:
+            seen.extend(item['id'] for item in response.data['results'])
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(
+            sorted(seen), sorted(listing.id for listing in self.listings)
+        )
+
+    def test_hidden_listings_are_excluded(self):
+        CarListing.objects.filter(id=self.title_match.id).update(is_hidden=True)
+        response = self.search(q='hybrid')
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [self.description_match.id]
+        )
+
+    def test_query_is_required(self):
+        response = self.search(q=' ')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_serializer_maintains_search_vector(self):
+        serializer = CarListingSerializer(
+            self.listings[0], data={'title': 'Lada Niva'}, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        response = self.search(q='niva')
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [self.listings[0].id]
+        )
+
+
+class CarListingCoverImageTests(CarListingFixtureMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        for listing in self.listings:
+            for number in range(3):
+                CarImage.objects.create(
+                    car_listing=listing,
+                    image_url=f'http://example.com/{listing.id}/{number}.jpg'
+                )
+
+    def test_cover_image_is_first_image(self):
+        response = self.client.get(reverse('main'), {'cursor': ''})
+        for item in response.data['results']:
+            self.assertEqual(
+                item['first_image_url'],
+                f'http://example.com/{item["id"]}/0.jpg'
+            )
+
+    def test_listing_without_images(self):
+        CarImage.objects.filter(car_listing=self.listings[-1]).delete()
+        response = self.client.get(reverse('main'), {'cursor': ''})
+        self.assertIsNone(response.data['results'][0]['first_image_url'])
+
+    def test_feed_query_count_is_constant(self):
+        # Listing page + cover images.
+        with self.assertNumQueries(2):
+            self.client.get(reverse('main'), {'cursor': '', 'page_size': 2})
+        with self.assertNumQueries(2):
+            self.client.get(reverse('main'), {'cursor': '', 'page_size': 5})
+        # COUNT(*) + listing page + cover images.
+        with self.assertNumQueries(3):
+            self.client.get(reverse('main'), {'page_size': 5})
+
+    def test_filter_and_search_query_count_is_constant(self):
+        update_search_vectors(
+            CarListing.objects.values_list('id', flat=True)
+        )
+        with self.assertNumQueries(2):
+            self.client.get(
+                reverse('carlisting:carlisting_search'),
+                {'q': 'car', 'page_size': 5}
+            )
+        # Listing page + cover images + facets.
+        with self.assertNumQueries(3):
+            self.client.get(
+                reverse('carlisting:carlisting_filter'), {'page_size': 5}
+            )
+
+
+class FeedCacheTests(CarListingFixtureMixin, APITestCase):
+
+    def test_repeated_page_is_served_from_cache(self):
+        response = self.client.get(reverse('main'), {'cursor': ''})
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(reverse('main'), {'cursor': ''})
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.data, response.data)
+
+    def test_pages_are_keyed_by_query_params(self):
+        self.client.get(reverse('main'), {'page': 1})
+        response = self.client.get(reverse('main'), {'page': 2})
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_hide_and_show_invalidate_feed(self):
+        self.client.force_authenticate(self.user)
+        self.client.get(reverse('main'), {'cursor': ''})
+        hidden = self.listings[-1]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('carlisting:hide_car_listing', args=[hidden.id])
+            )
+        response = self.client.get(reverse('main'), {'cursor': ''})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertNotIn(
+            hidden.id, [item['id'] for item in response.data['results']]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('carlisting:show_car_listing', args=[hidden.id])
+            )
+        response = self.client.get(reverse('main'), {'cursor': ''})
+        self.assertEqual(response.data['results'][0]['id'], hidden.id)
+
+    def test_update_invalidates_feed(self):
+        self.client.force_authenticate(self.user)
+        self.client.get(reverse('main'), {'cursor': ''})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse('carlisting:carlisting_detail',
+                        args=[self.listings[-1].id]),
+                {'title': 'Renamed'},
+                format='json'
+            )
+        response = self.client.get(reverse('main'), {'cursor': ''})
+        self.assertEqual(response.data['results'][0]['title'], 'Renamed')
+
+    def test_waiters_reuse_concurrent_rebuild(self):
+        key = 'carlisting:feed:test'
+        cache.add(f'{key}:lock', 1)
+        build = mock.Mock(return_value='rebuilt')
+
+        # Another worker finishes the rebuild while this one polls.
+        with mock.patch(
+            'carlisting.cache.time.sleep',
+            side_effect=lambda _: cache.set(key, 'built by other worker')
+        ):
+            value, hit = get_or_build(key, build)
+
+        self.assertEqual((value, hit), ('built by other worker', True))
+        build.assert_not_called()
+
+    def test_stats_require_admin(self):
+        self.client.get(reverse('main'))
+        self.client.get(reverse('main'))
+        stats_url = reverse('carlisting:feed_cache_stats')
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get(stats_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(stats_url)
+        self.assertEqual(response.data['hits'], 1)
+        self.assertEqual(response.data['misses'], 1)
+
+
+class CarListingImportTests(CarListingFixtureMixin, APITestCase):
+    csv_header = (
+        'title,description,price,year,mileage,engine_type,transmission,'
+        'body_type,color,brand_name,location_name,insurance_start_date,'
+        'insurance_end_date,owner_count,accident_count,accident_details,'
+        'image_urls\n'
+    )
+
+    def csv_row(self, title, brand='Toyota', price='9500.00'):
+        return (
+            f'{title},Imported,{price},2019,42000,Diesel,Automatic,SUV,White,'
+            f'{brand},Kyiv,2024-01-01,2025-01-01,1,0,None,'
+            f'http://example.com/{title}/1.jpg|http://example.com/{title}/2.jpg'
+            '\n'
+        )
+
+    def upload(self, content, name='listings.csv'):
+        self.client.force_authenticate(self.user)
+        return self.client.post(
+            reverse('carlisting:carlisting_import'),
+            {'file': SimpleUploadedFile(name, content.encode())},
+            format='multipart'
+        )
+
+    def test_csv_import_reports_row_errors(self):
+        content = (
+            self.csv_header
+            + self.csv_row('first')
+            + self.csv_row('unknown-brand', brand='Zaporozhets')
+            + self.csv_row('bad-price', price='cheap')
+            + self.csv_row('second')
+        )
+        response = self.upload(content)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertEqual(
+            [(error['row'], list(error['errors']))
+             for error in response.data['errors']],
+            [(2, ['brand_name']), (3, ['price'])]
+        )
+
+        imported = CarListing.objects.filter(title__in=['first', 'second'])
+        self.assertEqual(imported.count(), 2)
+        self.assertEqual(
+            CarImage.objects.filter(car_listing__in=imported).count(), 4
+        )
+        self.assertEqual(
+            InsuranceInfo.objects.filter(car_listing__in=imported).count(), 2
+        )
+        self.assertTrue(all(
+            listing.user == self.user and listing.search_vector
+            for listing in imported
+        ))
+
+    def test_ndjson_import(self):
+        row = {
+            'title': 'From JSON', 'description': 'Imported', 'price': '100.00',
+            'year': 2001, 'mileage': 1, 'engine_type': 'Gasoline',
+            'transmission': 'Manual', 'body_type': 'Coupe', 'color': 'Red',
+            'brand_name': 'Toyota', 'location_name': 'Kyiv',
+            'insurance_information': {
+                'insurance_start_date': '2024-01-01',
+                'insurance_end_date': '2025-01-01',
+                'owner_count': 2, 'accident_count': 1,
+                'accident_details': 'Scratch',
+            },
+            'images': [{'image_url': 'http://example.com/json.jpg'}],
+        }
+        content = json.dumps(row) + '\n\n{broken\n'
+        response = self.upload(content, name='listings.ndjson')
+
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'][0]['row'], 3)
+        listing = CarListing.objects.get(title='From JSON')
+        self.assertEqual(listing.insurance_info.owner_count, 2)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def import_rows(count):
+            content = self.csv_header + ''.join(
+                self.csv_row(f'car-{count}-{i}') for i in range(count)
+            )
+            importer = ListingImporter(self.user, batch_size=100)
+            with CaptureQueriesContext(connection) as queries:
+                importer.run(read_rows(io.StringIO(content), 'csv'))
+            self.assertEqual(importer.created, count)
+            return len(queries)
+
+        import_rows(1)  # Warm the reference lookups.
+        self.assertEqual(import_rows(2), import_rows(20))
+
+    def test_import_requires_authentication(self):
+        response = self.client.post(reverse('carlisting:carlisting_import'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class CarListingWriteTests(CarListingFixtureMixin, APITestCase):
+
+    def listing_data(self, image_count):
+        return {
+            'title': 'Written Car',
+            'description': 'Written through the serializer',
+            'price': '15000.00',
+            'year': 2018,
+            'mileage': 50000,
+            'engine_type': 'Hybrid',
+            'transmission': 'Automatic',
+            'body_type': 'Sedan',
+            'color': 'Blue',
+            'brand_name': 'Toyota',
+            'location_name': 'Kyiv',
+            'insurance_information': {
+                'insurance_start_date': '2024-01-01T00:00:00Z',
+                'insurance_end_date': '2025-01-01T00:00:00Z',
+                'owner_count': 1,
+                'accident_count': 0,
+                'accident_details': 'None',
+            },
+            'images': [
+                {'image_url': f'http://example.com/{i}.jpg'}
+                for i in range(image_count)
+            ],
+        }
+
+    def save(self, data, instance=None):
+        serializer = CarListingSerializer(
+            instance, data=data, partial=instance is not None
+        )
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as queries:
+            listing = serializer.save(user=self.user)
+        # The test case's transaction turns atomic() into savepoints.
+        statements = [
+            query for query in queries
+            if 'SAVEPOINT' not in query['sql']
+        ]
+        return listing, len(statements)
+
+    def test_create_round_trips_do_not_depend_on_images(self):
+        self.save(self.listing_data(1))  # Warm the reference lookups.
+        listing, one_image = self.save(self.listing_data(1))
+        _, thirty_images = self.save(self.listing_data(30))
+        self.assertEqual(one_image, thirty_images)
+        self.assertEqual(listing.insurance_info.owner_count, 1)
+        self.assertEqual(listing.images.count(), 1)
+
+    def test_create_is_atomic(self):
+        data = self.listing_data(2)
+        data['location_name'] = 'Atlantis'
+        serializer = CarListingSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError):
+            serializer.save(user=self.user)
+        self.assertFalse(
+            CarListing.objects.filter(title='Written Car').exists()
+        )
+
+    def test_update_replaces_images_by_difference(self):
+        listing, _ = self.save(self.listing_data(3))
+        kept = CarImage.objects.get(
+            car_listing=listing, image_url='http://example.com/1.jpg'
+        )
+
+        listing, _ = self.save({'images': [
+            {'image_url': 'http://example.com/1.jpg'},
+            {'image_url': 'http://example.com/new.jpg'},
+        ]}, instance=listing)
+
+        images = dict(
+            CarImage.objects.filter(car_listing=listing)
+            .values_list('image_url', 'id')
+        )
+        self.assertEqual(
+            set(images),
+            {'http://example.com/1.jpg', 'http://example.com/new.jpg'}
+        )
+        self.assertEqual(images['http://example.com/1.jpg'], kept.id)
+
+    def test_update_drops_duplicate_image_rows(self):
+        listing, _ = self.save(self.listing_data(2))
+        kept = CarImage.objects.get(
+            car_listing=listing, image_url='http://example.com/1.jpg'
+        )
+        CarImage.objects.bulk_create([
+            CarImage(car_listing=listing, image_url='http://example.com/1.jpg')
+            for _ in range(2)
+        ])
+
+        self.save({'images': [
+            {'image_url': 'http://example.com/1.jpg'},
+        ]}, instance=listing)
+
+        self.assertEqual(
+            list(
+                CarImage.objects.filter(car_listing=listing)
+                .values_list('id', flat=True)
+            ),
+            [kept.id]
+        )
+
+    def test_update_insurance_in_one_statement(self):
+        listing, _ = self.save(self.listing_data(1))
+        listing, queries = self.save(
+            {'insurance_information': {
+                'insurance_start_date': '2024-01-01T00:00:00Z',
+                'insurance_end_date': '2026-01-01T00:00:00Z',
+                'owner_count': 3,
+                'accident_count': 1,
+                'accident_details': 'Minor',
+            }},
+            instance=listing
+        )
+        # UPDATE insurance + UPDATE listing.
+        self.assertEqual(queries, 2)
+        listing.refresh_from_db()
+        self.assertEqual(listing.insurance_info.owner_count, 3)
+
+
+class ReferenceLookupTests(CarListingFixtureMixin, APITestCase):
+
+    def test_ids_are_cached(self):
+        self.assertEqual(brand_lookup.get_id('Toyota'), self.brand.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(brand_lookup.get_id('Toyota'), self.brand.id)
+
+    def test_misses_are_cached(self):
+        self.assertIsNone(brand_lookup.get_id('Tesla'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(brand_lookup.get_id('Tesla'))
+
+    def test_save_invalidates(self):
+        self.assertIsNone(brand_lookup.get_id('Tesla'))
+        tesla = Brand.objects.create(
+            name='Tesla',
+            origin_country='United States',
+            established_year=2003,
+            logo_url='https://example.com/tesla.png',
+            description='Electric cars.',
+            website='https://www.tesla.com',
+            headquarters='Austin, Texas'
+        )
+        self.assertEqual(brand_lookup.get_id('Tesla'), tesla.id)
+
+        tesla.delete()
+        self.assertIsNone(brand_lookup.get_id('Tesla'))
+
+    def test_shared_version_change_clears_other_workers(self):
+        self.assertEqual(brand_lookup.get_id('Toyota'), self.brand.id)
+        # Another worker renamed the brand and bumped the shared version.
+        Brand.objects.filter(id=self.brand.id).update(name='Toyota Motor')
+        brand_lookup._bump_version()
+        brand_lookup.local.set('Toyota', self.brand.id)
+        brand_lookup.checked_at = 0
+
+        self.assertIsNone(brand_lookup.get_id('Toyota'))
+
+    def test_location_lookup_is_case_insensitive(self):
+        self.assertEqual(location_lookup.get_id(' kyiv'), self.location.id)
+        self.assertEqual(
+            location_lookup.get_ids(['KYIV', 'Lviv']), {'KYIV': self.location.id}
+        )
+
+
+class ConditionalGetTests(CarListingFixtureMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.listing = self.listings[0]
+        InsuranceInfo.objects.create(
+            car_listing=self.listing,
+            insurance_start_date='2024-01-01T00:00:00Z',
+            insurance_end_date='2025-01-01T00:00:00Z',
+            owner_count=1,
+            accident_count=0,
+            accident_details='None'
+        )
+        self.image = CarImage.objects.create(
+            car_listing=self.listing, image_url='http://example.com/1.jpg'
+        )
+        self.detail_url = reverse(
+            'carlisting:carlisting_detail', args=[self.listing.id]
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_detail_if_none_match(self):
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        # Only the validator query runs for a 304.
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_detail_if_modified_since(self):
+        response = self.client.get(self.detail_url)
+        response = self.client.get(
+            self.detail_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_last_modified_tracks_deleted_images(self):
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        InsuranceInfo.objects.update(updated_at=an_hour_ago)
+        CarImage.objects.bulk_create([
+            CarImage(car_listing=self.listing, image_url='http://example.com/2.jpg')
+        ])
+        CarImage.objects.update(updated_at=an_hour_ago)
+
+        for delete in (
+            self.image.delete,
+            CarImage.objects.filter(car_listing=self.listing).delete,
+        ):
+            CarListing.objects.filter(pk=self.listing.pk).update(
+                updated_at=an_hour_ago
+            )
+            last_modified = self.client.get(self.detail_url)['Last-Modified']
+            delete()
+            response = self.client.get(
+                self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_etag_tracks_related_rows(self):
+        etags = {self.client.get(self.detail_url)['ETag']}
+
+        InsuranceInfo.objects.filter(car_listing=self.listing).update(
+            owner_count=2, updated_at=timezone.now()
+        )
+        etags.add(self.client.get(self.detail_url)['ETag'])
+
+        self.image.delete()
+        etags.add(self.client.get(self.detail_url)['ETag'])
+
+        self.client.patch(self.detail_url, {'mileage': 1}, format='json')
+        etags.add(self.client.get(self.detail_url)['ETag'])
+
+        self.assertEqual(len(etags), 4)
+
+    def test_missing_listing(self):
+        response = self.client.get(
+            reverse('carlisting:carlisting_detail', args=[0])
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_feed_if_none_match(self):
+        response = self.client.get(reverse('main'))
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('main'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('carlisting:hide_car_listing', args=[self.listings[-1].id])
+            )
+        response = self.client.get(reverse('main'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class CarListingBulkActionTests(CarListingFixtureMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.other_user = User.objects.create_user(
+            username='other', password='TestPassword123', is_verified=True
+        )
+        self.foreign = self.create_listing(99, user=self.other_user)
+
+    def bulk(self, **data):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('carlisting:carlisting_bulk'), data, format='json'
+            )
+        self.updates = [
+            query['sql'] for query in queries if query['sql'].startswith('UPDATE')
+        ]
+        return response
+
+    def test_hide_only_touches_own_listings(self):
+        ids = [self.listings[0].id, self.listings[1].id, self.foreign.id]
+        before = CarListing.objects.get(id=self.listings[0].id).updated_at
+        response = self.bulk(action='hide', car_listing_ids=ids)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'updated': 2})
+        self.assertEqual(len(self.updates), 1)
+        self.assertEqual(
+            set(CarListing.objects.filter(is_hidden=True).values_list('id', flat=True)),
+            {self.listings[0].id, self.listings[1].id},
+        )
+        self.assertGreater(
+            CarListing.objects.get(id=self.listings[0].id).updated_at, before
+        )
+
+    def test_all_hides_and_shows_inventory(self):
+        self.assertEqual(self.bulk(action='hide', all=True).data['updated'], 5)
+        self.assertFalse(
+            CarListing.objects.filter(user=self.user, is_hidden=False).exists()
+        )
+        self.assertFalse(CarListing.objects.get(id=self.foreign.id).is_hidden)
+        self.assertEqual(self.bulk(action='show', all=True).data['updated'], 5)
+        self.assertFalse(CarListing.objects.filter(is_hidden=True).exists())
+
+    def test_mark_sold(self):
+        self.bulk(action='mark_sold', car_listing_ids=[self.listings[2].id])
+        self.assertTrue(CarListing.objects.get(id=self.listings[2].id).is_sold)
+        self.assertEqual(CarListing.objects.filter(is_sold=True).count(), 1)
+
+    def test_set_and_adjust_price(self):
+        ids = [self.listings[0].id, self.listings[1].id]
+        self.bulk(action='set_price', car_listing_ids=ids, price='20000.00')
+        self.bulk(action='adjust_price', car_listing_ids=ids, percent='-12.5')
+        self.assertEqual(len(self.updates), 1)
+        prices = CarListing.objects.filter(id__in=ids).values_list('price', flat=True)
+        self.assertEqual(set(prices), {Decimal('17500.00')})
+        self.assertEqual(
+            CarListing.objects.get(id=self.listings[2].id).price, Decimal('10002.00')
+        )
+
+    def test_invalid_requests(self):
+        for data in (
+            {'action': 'hide'},
+            {'action': 'hide', 'all': True, 'car_listing_ids': [1]},
+            {'action': 'explode', 'all': True},
+            {'action': 'set_price', 'all': True},
+            {'action': 'adjust_price', 'all': True, 'percent': '-100'},
+        ):
+            response = self.bulk(**data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+        self.assertEqual(self.updates, [])
+
+    def test_out_of_range_adjustment_is_rejected(self):
+        self.bulk(action='set_price', all=True, price='99999999.00')
+        response = self.bulk(action='adjust_price', all=True, percent='50')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(
+            CarListing.objects.exclude(price=Decimal('99999999.00'))
+            .filter(user=self.user).exists()
+        )
+
+    def test_single_hide_is_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('carlisting:hide_car_listing', args=[self.listings[0].id])
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('UPDATE'))
+        response = self.client.post(
+            reverse('carlisting:show_car_listing', args=[self.foreign.id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PriceStatisticsTests(CarListingFixtureMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.corollas = [
+            self.create_listing(i, model='Corolla', year=2018, mileage=60000,
+                                price=10000 + 1000 * i)
+            for i in range(10)
+        ]
+        self.create_listing(10, model='corolla', year=2018, mileage=70000,
+                            price=99000, is_sold=True)
+        self.url = reverse('carlisting:price_estimate')
+        self.params = {
+            'brand': 'Toyota', 'model': 'COROLLA', 'year': 2018, 'mileage': 55000,
+        }
+
+    def backdate(self):
+        # Make the previous refresh old news, and every listing older still.
+        now = timezone.now()
+        CarListing.objects.update(updated_at=now - timedelta(minutes=30))
+        PriceStatistic.objects.update(computed_at=now - timedelta(minutes=10))
+
+    def test_estimate_reports_percentiles_of_unsold_listings(self):
+        refresh_price_statistics()
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 10)
+        self.assertEqual(Decimal(response.data['p10']), Decimal('10900.00'))
+        self.assertEqual(Decimal(response.data['median']), Decimal('14500.00'))
+        self.assertEqual(Decimal(response.data['p90']), Decimal('18100.00'))
+        self.assertEqual(
+            (response.data['mileage_min'], response.data['mileage_max']),
+            (50000, 74999),
+        )
+
+    def test_estimate_without_comparables(self):
+        refresh_price_statistics()
+        response = self.client.get(self.url, dict(self.params, year=1990))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(self.url, {'brand': 'Toyota'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_incremental_refresh_only_touches_changed_buckets(self):
+        refresh_touched_price_statistics()
+        self.backdate()
+        untouched = PriceStatistic.objects.get(model='')
+        CarListing.objects.filter(id=self.corollas[0].id).update(
+            price=19000, updated_at=timezone.now()
+        )
+
+        self.assertEqual(refresh_touched_price_statistics(), (1, 0))
+        corolla = PriceStatistic.objects.get(model='corolla')
+        self.assertEqual(corolla.median, Decimal('15500.00'))
+        self.assertLess(
+            PriceStatistic.objects.get(id=untouched.id).computed_at,
+            corolla.computed_at,
+        )
+
+    def test_emptied_buckets_are_removed(self):
+        refresh_price_statistics()
+        self.backdate()
+        CarListing.objects.filter(model='Corolla').update(
+            is_sold=True, updated_at=timezone.now()
+        )
+        self.assertEqual(refresh_touched_price_statistics(), (0, 1))
+        self.assertFalse(PriceStatistic.objects.filter(model='corolla').exists())
+
+        CarListing.objects.filter(model='').delete()
+        self.assertEqual(recompute_price_statistics_task(), {
+            'updated': 0, 'removed': 1,
+        })
+        self.assertFalse(PriceStatistic.objects.exists())
+
+    def test_periodic_task(self):
+        self.assertEqual(refresh_price_statistics_task(), {
+            'updated': 2, 'removed': 0,
+        })
+
+
+class CarListingGeoTests(CarListingFixtureMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.location.latitude, self.location.longitude = 50.4501, 30.5234
+        self.location.save()
+        self.brovary = self.create_listing(
+            10, location=self.create_location('Brovary', 50.5113, 30.7909)
+        )
+        self.bila_tserkva = self.create_listing(
+            11, location=self.create_location('Bila Tserkva', 49.7968, 30.1311)
+        )
+        self.lviv = self.create_listing(
+            12, location=self.create_location('Lviv', 49.8397, 24.0297)
+        )
+        self.nowhere = self.create_listing(
+            13, location=self.create_location('Nowhere', None, None)
+        )
+        self.url = reverse('carlisting:carlisting_filter')
+        self.kyiv = {'lat': 50.4501, 'lng': 30.5234}
+
+    def create_location(self, city, latitude, longitude):
+        return Location.objects.create(
+            city=city, region='Region', country='Ukraine', postal_code='00000',
+            time_zone='Europe/Kyiv', description=city,
+            latitude=latitude, longitude=longitude,
+        )
+
+    def walk(self, params):
+        seen, distances = [], []
+        response = self.client.get(self.url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            for item in response.data['results']:
+                seen.append(item['id'])
+                distances.append(item.get('distance'))
+            if response.data['next'] is None:
+                return seen, distances
+            response = self.client.get(response.data['next'])
+
+    def test_geohash_follows_coordinates(self):
+        location = Location.objects.get(city='Lviv')
+        self.assertEqual(location.geohash, encode_geohash(49.8397, 24.0297))
+        self.assertEqual(Location.objects.get(city='Nowhere').geohash, '')
+        location.latitude = location.longitude = None
+        location.save()
+        self.assertEqual(location.geohash, '')
+
+    def test_radius_sorts_by_distance(self):
+        seen, distances = self.walk(dict(self.kyiv, radius=100, page_size=2))
+        kyiv_ids = sorted(listing.id for listing in self.listings)
+        self.assertEqual(
+            seen, kyiv_ids + [self.brovary.id, self.bila_tserkva.id]
+        )
+        self.assertLess(distances[0], 0.01)
+        self.assertAlmostEqual(distances[5], 20.6, delta=1)
+        self.assertAlmostEqual(distances[6], 77.8, delta=1)
+
+    def test_pages_widen_past_sparse_locations(self):
+        expected, _ = self.walk(dict(self.kyiv, radius=500, page_size=100))
+        # Start every page from one location so pages must pull in more.
+        with mock.patch.object(DistanceKeysetPagination, 'initial_locations', 1):
+            for page_size in (1, 3, 6):
+                seen, _ = self.walk(dict(self.kyiv, radius=500, page_size=page_size))
+                self.assertEqual(seen, expected)
+
+    def test_radius_excludes_far_locations(self):
+        seen, _ = self.walk(dict(self.kyiv, radius=50))
+        self.assertNotIn(self.bila_tserkva.id, seen)
+        self.assertIn(self.brovary.id, seen)
+
+        seen, _ = self.walk(dict(self.kyiv, radius=500))
+        self.assertEqual(seen[-1], self.lviv.id)
+        self.assertNotIn(self.nowhere.id, seen)
+
+    def test_bounding_box(self):
+        box = {'min_lat': 49, 'max_lat': 50.6, 'min_lng': 30, 'max_lng': 31}
+        seen, distances = self.walk(box)
+        self.assertEqual(set(seen), {
+            *(listing.id for listing in self.listings),
+            self.brovary.id, self.bila_tserkva.id,
+        })
+        self.assertEqual(set(distances), {None})
+
+        seen, distances = self.walk(dict(box, **self.kyiv))
+        self.assertEqual(seen[-1], self.bila_tserkva.id)
+        self.assertNotIn(None, distances)
+
+    def test_invalid_geo_params(self):
+        for params in (
+            {'lat': 50},
+            self.kyiv,
+            {'radius': 10},
+            dict(self.kyiv, radius=5000),
+            {'min_lat': 49, 'max_lat': 50},
+            {'min_lat': 51, 'max_lat': 50, 'min_lng': 30, 'max_lng': 31},
+        ):
+            response = self.client.get(self.url, params)
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST, params
+            )
+
+    def test_covering_geohashes(self):
+        box = bounding_box(50.4501, 30.5234, 50)
+        cells = covering_geohashes(*box)
+        self.assertLessEqual(len(cells), MAX_COVERING_CELLS)
+        for latitude, longitude in ((50.4501, 30.5234), (50.5113, 30.7909)):
+            geohash = encode_geohash(latitude, longitude)
+            self.assertTrue(any(geohash.startswith(cell) for cell in cells))
+        # Circles crossing the antimeridian cover both sides of it.
+        cells = covering_geohashes(*bounding_box(0, 179.9, 100))
+        self.assertTrue(any(cell.startswith('8') for cell in cells))
+        self.assertTrue(any(cell.startswith('x') for cell in cells))
+
+
+class SavedSearchTests(CarListingFixtureMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.buyer = User.objects.create_user(
+            username='buyer', email='buyer@example.com',
+            password='TestPassword123', is_verified=True
+        )
+        self.other_buyer = User.objects.create_user(
+            username='other-buyer', email='other@example.com',
+            password='TestPassword123', is_verified=True
+        )
+        self.lviv = Location.objects.create(
+            city='Lviv', region='Lviv Oblast', country='Ukraine',
+            postal_code='79000', time_zone='Europe/Kyiv', description='Lviv'
+        )
+        self.url = reverse('carlisting:saved_search_list')
+
+    def save_search(self, user=None, **criteria):
+        return SavedSearch.objects.create(user=user or self.buyer, **criteria)
+
+    def matched(self, listing):
+        return set(
+            SavedSearchMatch.objects.filter(car_listing=listing)
+            .values_list('saved_search_id', flat=True)
+        )
+
+    def test_create_and_list_own_searches(self):
+        self.save_search(user=self.other_buyer, brand=self.brand)
+        self.client.force_authenticate(self.buyer)
+        response = self.client.post(self.url, {
+            'name': 'Cheap Toyota', 'brand_name': 'Toyota',
+            'location_name': 'kyiv', 'price_max': '12000.00',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        search = SavedSearch.objects.get(pk=response.data['id'])
+        self.assertEqual(
+            (search.user, search.brand, search.location),
+            (self.buyer, self.brand, self.location)
+        )
+        self.assertEqual(response.data['location_name'], 'Kyiv')
+
+        response = self.client.get(self.url)
+        self.assertEqual(
+            [item['id'] for item in response.data['results']], [search.id]
+        )
+
+        detail = reverse('carlisting:saved_search_detail', args=[search.id])
+        response = self.client.patch(
+            detail, {'brand_name': None, 'year_min': 2015}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        search.refresh_from_db()
+        self.assertEqual((search.brand, search.year_min), (None, 2015))
+
+        self.client.force_authenticate(self.other_buyer)
+        self.assertEqual(
+            self.client.get(detail).status_code, status.HTTP_404_NOT_FOUND
+        )
+
+    def test_invalid_searches(self):
+        self.client.force_authenticate(self.buyer)
+        for data in (
+            {},
+            {'name': 'Anything'},
+            {'brand_name': 'Zaporozhets'},
+            {'location_name': 'Atlantis'},
+            {'price_min': '5000.00', 'price_max': '1000.00'},
+            {'year_min': 2020, 'year_max': 2010},
+        ):
+            response = self.client.post(self.url, data, format='json')
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST, data
+            )
+
+        for _ in range(SAVED_SEARCH_LIMIT):
+            self.save_search(year_min=2000)
+        response = self.client.post(self.url, {'year_min': 2000}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_agrees_with_full_scan(self):
+        brands = [self.brand.id, None]
+        locations = [self.location.id, self.lviv.id, None]
+        searches = []
+        for number in range(200):
+            searches.append({
+                'id': number,
+                'user_id': self.buyer.id if number % 7 else self.user.id,
+                'brand_id': brands[number % 2],
+                'location_id': locations[number % 3],
+                'body_type': ('Sedan', 'SUV', '')[number % 3],
+                'transmission': ('', 'Manual')[number % 5 == 0],
+                'engine_type': '',
+                'price_min': Decimal(number * 50) if number % 4 else None,
+                'price_max': Decimal(8000 + number * 40) if number % 3 else None,
+                'year_min': 2010 + number % 12 if number % 2 else None,
+                'year_max': None,
+                'mileage_max': 5000 * (number % 10) or None,
+            })
+        index = SavedSearchIndex(searches)
+
+        for number in range(100):
+            listing = {
+                'id': number,
+                'user_id': self.user.id if number % 5 else self.buyer.id,
+                'brand_id': brands[number % 2],
+                'location_id': locations[number % 2],
+                'body_type': ('Sedan', 'SUV')[number % 2],
+                'transmission': ('Manual', 'Automatic')[number % 3 == 0],
+                'engine_type': 'Diesel',
+                'price': Decimal(6000 + number * 70),
+                'year': 2008 + number % 16,
+                'mileage': 1000 * number,
+            }
+            expected = sorted(
+                search['id'] for search in searches
+                if SavedSearchIndex.accepts(search, listing)
+            )
+            self.assertEqual(sorted(index.match(listing)), expected)
+
+    def test_new_listing_is_matched(self):
+        wanted = self.save_search(brand=self.brand, price_max=20000)
+        other = self.save_search(user=self.other_buyer, body_type='Sedan')
+        self.save_search(location=self.lviv)
+        self.save_search(brand=self.brand, year_min=2021)
+        own = self.save_search(user=self.user, brand=self.brand)
+
+        self.client.force_authenticate(self.user)
+        data = CarListingWriteTests.listing_data(self, image_count=1)
+        response = self.client.post(
+            reverse('carlisting:carlisting_create'), data, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(relay_outbox(), 1)
+        listing = CarListing.objects.get(pk=response.data['id'])
+        self.assertEqual(self.matched(listing), {wanted.id, other.id})
+        self.assertNotIn(own.id, self.matched(listing))
+
+        # Matching the same listing again records nothing new.
+        self.assertEqual(match_listings([listing.id]), 0)
+
+    def test_imported_listings_are_matched(self):
+        search = self.save_search(body_type='SUV')
+        content = (
+            CarListingImportTests.csv_header
+            + CarListingImportTests.csv_row(self, 'first')
+            + CarListingImportTests.csv_row(self, 'second')
+        )
+        response = CarListingImportTests.upload(self, content)
+        self.assertEqual(response.data['created'], 2)
+        relay_outbox()
+        self.assertEqual(
+            SavedSearchMatch.objects.filter(saved_search=search).count(), 2
+        )
+
+    def test_index_follows_search_changes(self):
+        search = self.save_search(brand=self.brand)
+        listing = self.create_listing(10)
+        self.assertEqual(match_listings([listing.id]), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            search.is_active = False
+            search.save()
+        self.assertEqual(len(get_saved_search_index()), 0)
+        self.assertEqual(match_listings([self.create_listing(11).id]), 0)
+
+        # A worker still holding an older index skips the paused search.
+        stale = SavedSearchIndex([{
+            'id': search.id, 'user_id': self.buyer.id, 'brand_id': None,
+            'location_id': None, 'body_type': '', 'transmission': '',
+            'engine_type': '', 'price_min': None, 'price_max': None,
+            'year_min': None, 'year_max': None, 'mileage_max': None,
+        }])
+        listing = self.create_listing(12)
+        self.assertEqual(match_listings([listing.id], index=stale), 0)
+
+    def test_digest_per_user(self):
+        first = self.save_search(brand=self.brand)
+        second = self.save_search(body_type='Sedan')
+        other = self.save_search(user=self.other_buyer, brand=self.brand)
+        match_listings([listing.id for listing in self.listings])
+        hidden = self.listings[0]
+        CarListing.objects.filter(pk=hidden.pk).update(is_hidden=True)
+        self.assertEqual(SavedSearchMatch.objects.count(), 15)
+
+        self.assertEqual(send_match_notifications(), (2, 15))
+        # Digests go through the mail queue.
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(dispatch_pending_emails(), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        digests = {message.to[0]: message for message in mail.outbox}
+        body = digests['buyer@example.com'].body
+        self.assertEqual(body.count('Car 1,'), 2)
+        self.assertNotIn('Car 0,', body)
+        self.assertIn('8 new listings', digests['buyer@example.com'].subject)
+        self.assertIn('4 new listings', digests['other@example.com'].subject)
+        self.assertFalse(
+            SavedSearchMatch.objects.filter(notified_at__isnull=True).exists()
+        )
+        self.assertEqual({first.id, second.id, other.id}, set(
+            SavedSearchMatch.objects.values_list('saved_search_id', flat=True)
+        ))
+
+        self.assertEqual(send_match_notifications(), (0, 0))
+        self.assertEqual(OutgoingEmail.objects.count(), 2)
+
+
+# The view tests above, against the async views that automarket.asgi serves.
+ASGI_URLCONF = 'automarket.asgi_urls'
+
+
+@override_settings(ROOT_URLCONF=ASGI_URLCONF)
+class AsyncCarListingTests(CarListingFixtureMixin, APITestCase):
+    # The write flow of CarListingTests, with the detail requests handled
+    # by AsyncCarListingDetailView.
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            reverse('carlisting:carlisting_create'),
+            {
+                'title': 'Test Car',
+                'description': 'Test Description',
+                'price': 10000.00,
+                'year': 2020,
+                'mileage': 10000,
+                'engine_type': 'Gasoline',
+                'transmission': 'Manual',
+                'body_type': 'Sedan',
+                'color': 'Black',
+                'brand_name': 'Toyota',
+                'location_name': 'Kyiv',
+                'insurance_information': {
+                    'insurance_start_date': '2024-01-01',
+                    'insurance_end_date': '2025-01-01',
+                    'owner_count': 1,
+                    'accident_count': 0,
+                    'accident_details': 'No accidents'
+                },
+                'images': [
+                    {'image_url': 'http://example.com/image1.jpg'},
+                    {'image_url': 'http://example.com/image2.jpg'}
+                ]
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.listing_id = response.data['id']
+        self.detail_url = reverse(
+            'carlisting:carlisting_detail', args=[self.listing_id]
+        )
+        self.assertIs(
+            resolve(self.detail_url).func.view_class, AsyncCarListingDetailView
+        )
+
+    def test_created_car_listing_is_readable(self):
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['title'], 'Test Car')
+        self.assertEqual(len(response.data['images']), 2)
+
+    def test_update_car_listing(self):
+        response = self.client.patch(
+            self.detail_url, {'mileage': 15000}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['mileage'], 15000)
+        self.assertEqual(CarListing.objects.get(id=self.listing_id).mileage, 15000)
+
+    def test_update_by_another_user_is_denied(self):
+        other = User.objects.create_user(username='other', password='x')
+        self.client.force_authenticate(other)
+        response = self.client.patch(
+            self.detail_url, {'mileage': 15000}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(CarListing.objects.get(id=self.listing_id).mileage, 10000)
+
+    def test_delete_car_listing(self):
+        response = self.client.delete(self.detail_url + '?confirm=True')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            self.client.get(self.detail_url).status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+
+    def test_hide_and_show_car_listing(self):
+        etag = self.client.get(self.detail_url)['ETag']
+
+        response = self.client.post(
+            reverse('carlisting:hide_car_listing', args=[self.listing_id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(CarListing.objects.get(id=self.listing_id).is_hidden)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post(
+            reverse('carlisting:show_car_listing', args=[self.listing_id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(CarListing.objects.get(id=self.listing_id).is_hidden)
+
+
+@override_settings(ROOT_URLCONF=ASGI_URLCONF)
+class AsyncCarListingFeedPaginationTests(CarListingFeedPaginationTests):
+    pass
+
+
+@override_settings(ROOT_URLCONF=ASGI_URLCONF)
+class AsyncCarListingCoverImageTests(CarListingCoverImageTests):
+    pass
+
+
+@override_settings(ROOT_URLCONF=ASGI_URLCONF)
+class AsyncFeedCacheTests(FeedCacheTests):
+
+    def test_waiters_reuse_concurrent_rebuild(self):
+        key = 'carlisting:feed:test'
+        cache.add(f'{key}:lock', 1)
+        build = mock.AsyncMock(return_value='rebuilt')
+
+        async def finish_rebuild(_):
+            cache.set(key, 'built by other worker')
+
+        with mock.patch(
+            'carlisting.cache.asyncio.sleep', side_effect=finish_rebuild
+        ):
+            value, hit = async_to_sync(aget_or_build)(key, build)
+
+        self.assertEqual((value, hit), ('built by other worker', True))
+        build.assert_not_awaited()
+
+
+@override_settings(ROOT_URLCONF=ASGI_URLCONF)
+class AsyncConditionalGetTests(ConditionalGetTests):
+
+    def test_detail_is_served_by_async_view(self):
+        self.assertIs(
+            resolve(self.detail_url).func.view_class, AsyncCarListingDetailView
+        )
+        # Validators, the listing joined with its insurance, its images.
+        with self.assertNumQueries(3):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(
+            response.data['images'], [{'image_url': 'http://example.com/1.jpg'}]
+        )
+        self.assertEqual(response.data['insurance_information']['owner_count'], 1)
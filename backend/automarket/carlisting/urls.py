@@ -1,8 +1,16 @@
 from django.urls import path
 from .views import (
+    CarListingBulkActionView,
     CarListingCreateView,
     CarListingDetailView,
+    CarListingFilterView,
+    CarListingImportView,
+    CarListingSearchView,
+    FeedCacheStatsView,
     HideCarListingView,
+    PriceEstimateView,
+    SavedSearchDetailView,
+    SavedSearchListCreateView,
     ShowCarListingView
 )
 
@@ -10,6 +18,30 @@ app_name = 'carlisting'
 
 urlpatterns = [
     path('create/', CarListingCreateView.as_view(), name='carlisting_create'),
+    path('import/', CarListingImportView.as_view(), name='carlisting_import'),
+    path('filter/', CarListingFilterView.as_view(), name='carlisting_filter'),
+    path('bulk/', CarListingBulkActionView.as_view(), name='carlisting_bulk'),
+    path(
+        'price-estimate/',
+        PriceEstimateView.as_view(),
+        name='price_estimate'
+    ),
+    path(
+        'saved-searches/',
+        SavedSearchListCreateView.as_view(),
+        name='saved_search_list'
+    ),
+    path(
+        'saved-searches/<int:pk>/',
+        SavedSearchDetailView.as_view(),
+        name='saved_search_detail'
+    ),
+    path('search/', CarListingSearchView.as_view(), name='carlisting_search'),
+    path(
+        'feed/cache-stats/',
+        FeedCacheStatsView.as_view(),
+        name='feed_cache_stats'
+    ),
     path('<int:pk>/', CarListingDetailView.as_view(), name='carlisting_detail'),
     path(
         '<int:car_listing_id>/hide/',
@@ -1,20 +1,162 @@
+import io
+
+from django.http import Http404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import generics, status
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import PermissionDenied
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .models import CarListing
-from .serializers import CarListingSerializer, CarListingBriefSerializer
+from core.async_views import AsyncAPIView
+from core.pagination import KeysetPagination
+from .cache import (
+    afeed_cache_key,
+    aget_or_build,
+    feed_cache_key,
+    feed_cache_stats,
+    get_or_build,
+    invalidate_feed,
+)
+from .conditional import alisting_validators, content_etag, listing_validators
+from .filters import (
+    CarListingFilterSerializer,
+    facet_counts,
+    filter_car_listings,
+    nearby_locations,
+)
+from .importers import FORMATS, ListingImporter, guess_format, read_rows
+from .lookups import brand_lookup
+from .models import CarListing, PriceStatistic, SavedSearch
+from .pagination import CarListingFeedPagination, DistanceKeysetPagination
+from .search import search_car_listings
+from .statistics import mileage_band
+from .serializers import (
+    CarListingBulkActionSerializer,
+    CarListingDistanceSerializer,
+    CarListingSerializer,
+    CarListingBriefSerializer,
+    PriceEstimateQuerySerializer,
+    PriceStatisticSerializer,
+    SavedSearchSerializer,
+)
 
 
 class CarListingListView(generics.ListAPIView):
     queryset = CarListing.objects.all()
     serializer_class = CarListingBriefSerializer
-    pagination_class = PageNumberPagination
+    pagination_class = CarListingFeedPagination
+
+    def get_queryset(self):
+        return (
+            CarListing.objects.filter(is_hidden=False)
+            .with_cover_image()
+            .order_by('-created_at', '-id')
+        )
+
+    def list(self, request, *args, **kwargs):
+        def build():
+            data = super(CarListingListView, self).list(
+                request, *args, **kwargs
+            ).data
+            return {'data': data, 'etag': content_etag(data)}
+
+        page, hit = get_or_build(feed_cache_key(request), build)
+        return self.page_response(request, page, hit)
+
+    def page_response(self, request, page, hit):
+        response = get_conditional_response(request, etag=page['etag'])
+        if response is None:
+            response = Response(page['data'])
+        response['ETag'] = page['etag']
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+
+
+class AsyncCarListingListView(AsyncAPIView, CarListingListView):
+    """The main feed for ASGI; cache hits never leave the event loop."""
+
+    async def get(self, request, *args, **kwargs):
+        async def build():
+            page = await self.paginator.apaginate_queryset(
+                self.get_queryset(), request, view=self
+            )
+            data = self.get_paginated_response(
+                self.get_serializer(page, many=True).data
+            ).data
+            return {'data': data, 'etag': content_etag(data)}
+
+        page, hit = await aget_or_build(await afeed_cache_key(request), build)
+        return self.page_response(request, page, hit)
+
+
+class FeedCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(feed_cache_stats())
+
+
+class CarListingFilterView(generics.ListAPIView):
+    serializer_class = CarListingBriefSerializer
+
+    def get_params(self):
+        if not hasattr(self, '_params'):
+            params = CarListingFilterSerializer(data=self.request.query_params)
+            params.is_valid(raise_exception=True)
+            self._params = params.validated_data
+        return self._params
+
+    @property
+    def sorts_by_distance(self):
+        return 'lat' in self.get_params()
+
+    @property
+    def pagination_class(self):
+        if self.sorts_by_distance:
+            return DistanceKeysetPagination
+        return KeysetPagination
+
+    def get_nearby_locations(self):
+        return list(
+            nearby_locations(self.get_params())
+            .order_by('distance', 'id').values_list('id', 'distance')
+        )
+
+    def get_serializer_class(self):
+        if self.sorts_by_distance:
+            return CarListingDistanceSerializer
+        return self.serializer_class
+
+    def get_queryset(self):
+        return filter_car_listings(
+            CarListing.objects.filter(is_hidden=False).with_cover_image(),
+            self.get_params()
+        )
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        # Facets describe the whole result set, so only the first page
+        # pays for them; later pages are plain keyset scans.
+        if not request.query_params.get(self.paginator.cursor_query_param):
+            response.data['facets'] = facet_counts(self.get_queryset())
+        return response
+
+
+class CarListingSearchView(generics.ListAPIView):
+    serializer_class = CarListingBriefSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-rank', '-id')
 
     def get_queryset(self):
-        return CarListing.objects.filter(is_hidden=False).order_by('-created_at')
+        text = self.request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'q': 'This query parameter is required.'})
+        return search_car_listings(
+            CarListing.objects.filter(is_hidden=False).with_cover_image(), text
+        )
 
 
 class CarListingCreateView(generics.ListCreateAPIView):
@@ -30,13 +172,65 @@ class CarListingCreateView(generics.ListCreateAPIView):
         serializer.save(user=self.request.user)
 
 
+class CarListingImportView(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+    max_reported_errors = 1000
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {"detail": "Upload a CSV or NDJSON file as 'file'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        file_format = request.data.get('format') or guess_format(upload.name)
+        if file_format not in FORMATS:
+            return Response(
+                {"detail": f"Unsupported format '{file_format}'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        errors = []
+
+        def collect_error(row_number, row_errors):
+            if len(errors) < self.max_reported_errors:
+                errors.append({'row': row_number, 'errors': row_errors})
+
+        importer = ListingImporter(request.user, on_error=collect_error)
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        created, failed = importer.run(read_rows(stream, file_format))
+        return Response(
+            {'created': created, 'failed': failed, 'errors': errors},
+            status=status.HTTP_200_OK
+        )
+
+
 class CarListingDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = CarListing.objects.all()
     serializer_class = CarListingSerializer
     permission_classes = [IsAuthenticated]
 
+    def retrieve(self, request, *args, **kwargs):
+        validators = listing_validators(self.kwargs['pk'])
+        if validators is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag, last_modified = validators
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified.timestamp())
+        )
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        return self.set_validators(response, etag, last_modified)
+
+    def set_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+
     def perform_update(self, serializer):
-        if self.get_object().user != self.request.user:
+        if serializer.instance.user_id != self.request.user.id:
             raise PermissionDenied(
                 "You do not have permission to edit this listing."
             )
@@ -53,25 +247,56 @@ class CarListingDetailView(generics.RetrieveUpdateDestroyAPIView):
                 "You do not have permission to delete this listing."
             )
         instance.delete()
+        invalidate_feed()
+
+
+class AsyncCarListingDetailView(AsyncAPIView, CarListingDetailView):
+    """
+    Listing detail for ASGI. Reads use the async ORM; updates and deletes
+    run the inherited handlers in a worker thread.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        validators = await alisting_validators(self.kwargs['pk'])
+        if validators is None:
+            raise Http404('No CarListing matches the given query.')
+
+        etag, last_modified = validators
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified.timestamp())
+        )
+        if response is None:
+            response = Response(self.get_serializer(await self.aget_object()).data)
+        return self.set_validators(response, etag, last_modified)
+
+    async def aget_object(self):
+        # Loads everything the serializer reads, which cannot query lazily here.
+        queryset = self.get_queryset().select_related(
+            'insurance_info'
+        ).prefetch_related('images')
+        try:
+            instance = await queryset.aget(pk=self.kwargs['pk'])
+        except CarListing.DoesNotExist:
+            raise Http404('No CarListing matches the given query.')
+        self.check_object_permissions(self.request, instance)
+        return instance
 
 
 class HideCarListingView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, car_listing_id):
-        try:
-            car_listing = CarListing.objects.get(
-                id=car_listing_id, user=request.user
-            )
-        except CarListing.DoesNotExist:
+        updated = CarListing.objects.filter(
+            id=car_listing_id, user=request.user
+        ).update(is_hidden=True, updated_at=timezone.now())
+        if not updated:
             return Response(
                 {"detail": "Car listing not found or you do not have "
                            "permission to hide it."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        car_listing.is_hidden = True
-        car_listing.save()
+        invalidate_feed()
         return Response(
             {"detail": "Car listing is now hidden."},
             status=status.HTTP_200_OK
@@ -82,20 +307,74 @@ class ShowCarListingView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, car_listing_id):
-        try:
-            car_listing = CarListing.objects.get(
-                id=car_listing_id, user=request.user
-            )
-        except CarListing.DoesNotExist:
+        updated = CarListing.objects.filter(
+            id=car_listing_id, user=request.user
+        ).update(is_hidden=False, updated_at=timezone.now())
+        if not updated:
             return Response(
                 {"detail": "Car listing not found or you do not have "
                            "permission to show it."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        car_listing.is_hidden = False
-        car_listing.save()
+        invalidate_feed()
         return Response(
             {"detail": "Car listing is now visible."},
             status=status.HTTP_200_OK
         )
+
+
+class CarListingBulkActionView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = CarListingBulkActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = serializer.save(user=request.user)
+        return Response({'updated': updated}, status=status.HTTP_200_OK)
+
+
+class PriceEstimateView(APIView):
+    """Price distribution of comparable unsold listings, precomputed."""
+
+    def get(self, request):
+        query = PriceEstimateQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        statistic = PriceStatistic.objects.select_related('brand').filter(
+            brand_id=brand_lookup.get_id(params['brand']),
+            model=params['model'].lower(),
+            year=params['year'],
+            mileage_band=mileage_band(params['mileage']),
+        ).first()
+        if statistic is None:
+            return Response(
+                {"detail": "No comparable listings found."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(PriceStatisticSerializer(statistic).data)
+
+
+class SavedSearchListCreateView(generics.ListCreateAPIView):
+    serializer_class = SavedSearchSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return SavedSearch.objects.filter(
+            user=self.request.user
+        ).select_related('brand', 'location')
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class SavedSearchDetailView(generics.RetrieveUpdateDestroyAPIView):
+    serializer_class = SavedSearchSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return SavedSearch.objects.filter(
+            user=self.request.user
+        ).select_related('brand', 'location')
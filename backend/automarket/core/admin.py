@@ -1,3 +1,41 @@
 from django.contrib import admin
+from django.utils.html import format_html
 
-# Register your models here.
+from .models import OutgoingEmail, SlowQuery
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        'subject', 'pk', 'status', 'attempts', 'next_attempt_at', 'sent_at'
+    )
+    search_fields = ('subject',)
+    list_filter = ('status',)
+    ordering = ('-created_at',)
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('captured_at', 'duration', 'origin', 'fingerprint', 'failed')
+    list_filter = ('origin', 'failed')
+    search_fields = ('fingerprint', 'normalized_sql', 'origin')
+    ordering = ('-captured_at',)
+    fields = (
+        'captured_at', 'duration', 'origin', 'fingerprint', 'failed', 'query',
+        'query_plan',
+    )
+    readonly_fields = fields
+
+    @admin.display(description='SQL')
+    def query(self, obj):
+        return format_html('<pre>{}</pre>', obj.sql)
+
+    @admin.display(description='Plan')
+    def query_plan(self, obj):
+        return format_html('<pre>{}</pre>', obj.plan or 'Not sampled.')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
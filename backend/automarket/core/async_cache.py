@@ -0,0 +1,91 @@
+"""
+Non-blocking access to the default cache for async views.
+
+Django's cache API has ``aget()`` and friends, but the Redis backend
+implements them by running its blocking client in a thread. With that
+backend configured, these functions talk to the same server through
+``redis.asyncio`` instead, using the backend's key and value encoding, so
+entries are shared with synchronous code. Other backends fall back to the
+cache's own async methods.
+"""
+import asyncio
+import weakref
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.redis import RedisCache, RedisSerializer
+from redis import asyncio as aioredis
+
+_clients = weakref.WeakKeyDictionary()
+_serializer = RedisSerializer()
+
+
+def _redis(backend):
+    if not isinstance(backend, RedisCache):
+        return None
+    # Connections belong to the event loop that opened them.
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = aioredis.Redis.from_url(
+            settings.CACHES['default']['LOCATION']
+        )
+    return client
+
+
+async def aget(key, default=None):
+    backend = caches['default']
+    client = _redis(backend)
+    if client is None:
+        return await backend.aget(key, default)
+    value = await client.get(backend.make_and_validate_key(key))
+    return default if value is None else _serializer.loads(value)
+
+
+async def aset(key, value, timeout=DEFAULT_TIMEOUT):
+    backend = caches['default']
+    client = _redis(backend)
+    if client is None:
+        return await backend.aset(key, value, timeout)
+    key = backend.make_and_validate_key(key)
+    timeout = backend.get_backend_timeout(timeout)
+    if timeout == 0:
+        await client.delete(key)
+    else:
+        await client.set(key, _serializer.dumps(value), ex=timeout)
+
+
+async def aadd(key, value, timeout=DEFAULT_TIMEOUT):
+    backend = caches['default']
+    client = _redis(backend)
+    if client is None:
+        return await backend.aadd(key, value, timeout)
+    key = backend.make_and_validate_key(key)
+    value = _serializer.dumps(value)
+    timeout = backend.get_backend_timeout(timeout)
+    if timeout == 0:
+        if added := bool(await client.set(key, value, nx=True)):
+            await client.delete(key)
+        return added
+    return bool(await client.set(key, value, ex=timeout, nx=True))
+
+
+async def adelete(key):
+    backend = caches['default']
+    client = _redis(backend)
+    if client is None:
+        return await backend.adelete(key)
+    return bool(await client.delete(backend.make_and_validate_key(key)))
+
+
+async def aincr(key, delta=1):
+    """Increment an integer entry; raises ``ValueError`` if it is missing."""
+    backend = caches['default']
+    client = _redis(backend)
+    if client is None:
+        return await backend.aincr(key, delta)
+    key = backend.make_and_validate_key(key)
+    if not await client.exists(key):
+        raise ValueError(f"Key '{key}' not found.")
+    return await client.incr(key, delta)
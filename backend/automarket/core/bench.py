@@ -0,0 +1,193 @@
+"""Helpers shared by the ``bench_*`` management commands."""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import Client
+
+# Users seeded by seed_bench_dataset(); they own its listings.
+DATASET_USER_PREFIX = 'bench-suite-'
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of ``samples`` (``pct`` in 0..100)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def measure(func, repeat, warmup=3):
+    """Call ``func`` ``repeat`` times and return per-call latencies in ms."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def summarize(samples):
+    return {
+        'count': len(samples),
+        'mean_ms': sum(samples) / len(samples) if samples else 0.0,
+        'p50_ms': percentile(samples, 50),
+        'p95_ms': percentile(samples, 95),
+        'p99_ms': percentile(samples, 99),
+    }
+
+
+def format_summary(name, samples):
+    summary = summarize(samples)
+    return (
+        f'{name:<40} n={summary["count"]:<5} '
+        f'p50={summary["p50_ms"]:8.2f}ms '
+        f'p95={summary["p95_ms"]:8.2f}ms '
+        f'p99={summary["p99_ms"]:8.2f}ms'
+    )
+
+
+def bench_client():
+    """A test client whose Host header passes ``ALLOWED_HOSTS``."""
+    host = next(
+        (h for h in settings.ALLOWED_HOSTS if h and '*' not in h),
+        'localhost'
+    )
+    return Client(HTTP_HOST=host.lstrip('.'))
+
+
+def get_bench_user(username='bench'):
+    user, created = get_user_model().objects.get_or_create(
+        username=username,
+        defaults={'email': f'{username}@example.com', 'is_verified': True}
+    )
+    if created:
+        user.set_password(username)
+        user.save(update_fields=['password'])
+    return user
+
+
+def seed_bench_listings(count, stdout=None, **options):
+    """
+    Add ``count`` listings, with insurance and images, sold by the bench
+    user. They are generated by ``core.seeding``; ``options`` go to its
+    ``seed()``. Indexes stay in place and nothing is vacuumed unless asked
+    for, so small top-ups stay cheap. Returns the number of listings added.
+    """
+    from core import seeding
+
+    options.setdefault('defer_indexes', False)
+    options.setdefault('vacuum', False)
+    return seeding.seed(
+        listings=count, seller_ids=[get_bench_user().pk], stdout=stdout,
+        **options
+    )['listings']
+
+
+class QueryCounter:
+    """A ``connection.execute_wrapper`` that counts statements and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+def run_concurrently(send, indexes, concurrency):
+    """
+    Call ``send(client, i)`` for every ``i`` in ``indexes`` from
+    ``concurrency`` threads, each with its own client and connection.
+
+    Returns ``(results, elapsed)`` with one ``(latency_ms, queries,
+    query_ms, status)`` tuple per call. ``status`` is the response status
+    code, or the exception's class name if ``send`` raised.
+    """
+    indexes = iter(indexes)
+    lock = threading.Lock()
+    results = []
+
+    def work():
+        client = bench_client()
+        counter = QueryCounter()
+        try:
+            with connection.execute_wrapper(counter):
+                while True:
+                    with lock:
+                        i = next(indexes, None)
+                    if i is None:
+                        return
+                    queries, query_time = counter.count, counter.duration
+                    started = time.perf_counter()
+                    try:
+                        status = send(client, i).status_code
+                    except Exception as exc:
+                        status = type(exc).__name__
+                    results.append((
+                        (time.perf_counter() - started) * 1000,
+                        counter.count - queries,
+                        (counter.duration - query_time) * 1000,
+                        status,
+                    ))
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=work) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def seed_bench_dataset(listings, users, images_per_listing=3,
+                       favorites_per_user=20, processes=1, seed=0,
+                       stdout=None):
+    """
+    Grow the shared benchmark dataset to ``users`` users and ``listings``
+    listings, each with insurance and ``images_per_listing`` images.
+
+    Rows are generated by ``core.seeding`` in ``processes`` processes and
+    loaded with ``COPY``. New users favorite ``favorites_per_user`` new
+    listings on average. Running it again only adds what is missing.
+    Returns the number of users and listings added.
+    """
+    from carlisting.models import CarListing
+    from core import seeding
+
+    dataset_users = get_user_model().objects.filter(
+        username__startswith=DATASET_USER_PREFIX
+    )
+    missing_users = max(users - dataset_users.count(), 0)
+    missing_listings = max(listings - CarListing.objects.filter(
+        user__username__startswith=DATASET_USER_PREFIX
+    ).count(), 0)
+    if missing_users or missing_listings:
+        seeding.seed(
+            listings=missing_listings,
+            users=missing_users,
+            seller_ids=list(dataset_users.filter(is_verified=True).values_list(
+                'id', flat=True
+            )),
+            processes=processes,
+            stdout=stdout,
+            min_images=images_per_listing,
+            max_images=images_per_listing,
+            favorites_per_user=favorites_per_user,
+            username_prefix=DATASET_USER_PREFIX,
+            password=DATASET_USER_PREFIX,
+            seed=seed,
+        )
+    return {'users': missing_users, 'listings': missing_listings}
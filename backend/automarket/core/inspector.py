@@ -0,0 +1,189 @@
+"""
+Opt-in capture of slow SQL.
+
+With ``SLOW_QUERY_THRESHOLD`` set, ``core.signals`` installs
+``inspect_query()`` on every database connection. Statements that take at
+least that many milliseconds are logged with the view or task that ran
+them and a fingerprint that is the same for every statement of the same
+shape. A ``SLOW_QUERY_EXPLAIN_RATE`` share of the slow plain SELECTs is
+explained; with ``SLOW_QUERY_EXPLAIN_ANALYZE`` they are run again under
+``EXPLAIN (ANALYZE, BUFFERS)``. Captures are kept as ``SlowQuery`` rows,
+browsable in the admin, of which only the latest ``SLOW_QUERY_LOG_SIZE``
+are retained.
+
+A statement under the threshold costs two clock reads and a comparison.
+Captures are queued and saved when the request or task that made them
+ends, outside the statement and so that they survive a rollback.
+"""
+import hashlib
+import logging
+import random
+import re
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpRequest
+from django.utils import timezone
+
+from . import metrics
+from .models import SlowQuery
+
+logger = logging.getLogger(__name__)
+
+# Longer statements are truncated before they are stored.
+MAX_SQL_LENGTH = 10000
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_VALUE_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+# SELECTs that lock rows, write or take locks, which are never explained.
+_SIDE_EFFECTS = re.compile(
+    r'\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE)\b|\bFOR\s+KEY\s+SHARE\b'
+    r'|\bSKIP\s+LOCKED\b|\bNOWAIT\b|\bINTO\b'
+    r'|\b(?:nextval|setval|pg_notify|pg_(?:try_)?advisory\w*)\s*\(',
+    re.IGNORECASE
+)
+
+# Set while the inspector runs SQL of its own.
+_busy = ContextVar('slow_query_inspector_busy', default=False)
+
+# Captures not saved yet; the oldest are dropped if saving cannot keep up.
+_pending = deque(maxlen=1000)
+
+
+def install(connection):
+    if inspect_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(inspect_query)
+
+
+def inspect_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    failed = True
+    try:
+        result = execute(sql, params, many, context)
+        failed = False
+        return result
+    finally:
+        duration = (time.perf_counter() - started) * 1000
+        threshold = settings.SLOW_QUERY_THRESHOLD
+        if threshold and duration >= threshold and not _busy.get():
+            try:
+                capture(sql, params, many, context['connection'], duration, failed)
+            except Exception:
+                logger.exception('Could not capture a slow query.')
+
+
+def capture(sql, params, many, connection, duration, failed=False):
+    normalized = normalize(sql)
+    fingerprint = capture_fingerprint(normalized)
+    origin = describe_origin(metrics.current_stats())
+    logger.warning(
+        'Slow query (%.1f ms) from %s [%s]: %s',
+        duration, origin, fingerprint, normalized
+    )
+
+    plan = ''
+    if (
+        not (failed or many)
+        and is_plain_select(normalized)
+        and random.random() < settings.SLOW_QUERY_EXPLAIN_RATE
+    ):
+        plan = explain(connection, sql, params)
+
+    _pending.append(SlowQuery(
+        captured_at=timezone.now(),
+        duration=duration,
+        origin=origin[:255],
+        fingerprint=fingerprint,
+        normalized_sql=normalized[:MAX_SQL_LENGTH],
+        sql=sql[:MAX_SQL_LENGTH],
+        plan=plan,
+        failed=failed,
+    ))
+
+
+def is_plain_select(normalized):
+    """
+    Whether explaining ``normalized`` is safe: a SELECT without row locks,
+    sequence calls or advisory locks, which EXPLAIN ANALYZE would repeat.
+    """
+    return (
+        normalized.upper().startswith('SELECT ')
+        and not _SIDE_EFFECTS.search(normalized)
+    )
+
+
+def normalize(sql):
+    """
+    ``sql`` with literals and placeholders replaced by ``?``, lists of them
+    collapsed and whitespace squeezed.
+    """
+    sql = _LITERALS.sub('?', sql.replace('%s', '?'))
+    sql = _VALUE_LISTS.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def capture_fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def describe_origin(stats):
+    origin = stats.origin if stats is not None else None
+    if isinstance(origin, HttpRequest):
+        match = origin.resolver_match
+        return f'{origin.method} {match.view_name if match else origin.path}'
+    if origin is not None:
+        return f'task {origin}'
+    return 'unknown'
+
+
+def explain(connection, sql, params):
+    # A raw cursor skips the execute wrappers and leaves the results of the
+    # original statement alone. Inside a transaction a savepoint keeps a
+    # failing EXPLAIN from aborting it.
+    in_transaction = connection.in_atomic_block
+    with connection.connection.cursor() as cursor:
+        if in_transaction:
+            cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            options = (
+                '(ANALYZE, BUFFERS) ' if settings.SLOW_QUERY_EXPLAIN_ANALYZE
+                else ''
+            )
+            cursor.execute(f'EXPLAIN {options}{sql}', params)
+            return '\n'.join(row[0] for row in cursor.fetchall())
+        except Exception as error:
+            if in_transaction:
+                cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            return f'EXPLAIN failed: {error}'
+        finally:
+            if in_transaction:
+                cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+
+
+def save_captures():
+    """
+    Save the pending captures and drop the ones past the log size; called
+    when a request or task ends.
+    """
+    if not _pending:
+        return
+    captures = []
+    while _pending:
+        captures.append(_pending.popleft())
+    token = _busy.set(True)
+    try:
+        SlowQuery.objects.bulk_create(captures)
+        SlowQuery.objects.filter(
+            id__lte=captures[-1].pk - settings.SLOW_QUERY_LOG_SIZE
+        ).delete()
+    except Exception:
+        logger.exception('Could not save %d slow queries.', len(captures))
+    finally:
+        _busy.reset(token)
+
+
+def has_pending_captures():
+    return bool(_pending)
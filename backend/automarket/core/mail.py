@@ -0,0 +1,180 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+# Claimed messages become due again after this long, so a worker that dies
+# mid-batch delays its messages instead of losing them.
+CLAIM_LEASE = timedelta(minutes=5)
+
+RATE_LIMIT_KEY = 'core:mail:rate:{window}'
+
+
+def queue_email(subject, body, to, from_email=None):
+    """Queue one message; it is sent by the next dispatch run."""
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+    )
+
+
+def queue_messages(messages):
+    """Queue ``EmailMessage`` instances with one INSERT."""
+    return OutgoingEmail.objects.bulk_create([
+        OutgoingEmail(
+            subject=message.subject,
+            body=message.body,
+            from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+            to=list(message.to),
+        )
+        for message in messages
+    ])
+
+
+def retry_delay(attempts):
+    """Seconds to wait after the ``attempts``-th failed attempt."""
+    return min(
+        settings.EMAIL_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.EMAIL_RETRY_MAX_DELAY,
+    )
+
+
+class RateLimiter:
+    """
+    Allow at most ``rate`` messages per second across every worker.
+
+    Counts are kept per one-second window in the shared cache; a sender
+    that finds the current window full sleeps until the next one.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+
+    def wait(self):
+        if not self.rate:
+            return
+        while True:
+            now = time.time()
+            key = RATE_LIMIT_KEY.format(window=int(now))
+            cache.add(key, 0, timeout=2)
+            try:
+                if cache.incr(key) <= self.rate:
+                    return
+            except ValueError:
+                # The window expired between add() and incr().
+                continue
+            time.sleep(1 - now % 1)
+
+
+def claim_due_emails(limit):
+    """
+    Lease up to ``limit`` due messages to this worker.
+
+    ``SKIP LOCKED`` keeps concurrent dispatchers from claiming the same
+    rows; the lease pushes ``next_attempt_at`` forward so they are not
+    claimed again while being sent.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutgoingEmail.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:limit]
+        )
+        if emails:
+            OutgoingEmail.objects.filter(
+                id__in=[email.id for email in emails]
+            ).update(next_attempt_at=now + CLAIM_LEASE, attempts=F('attempts') + 1)
+    for email in emails:
+        email.attempts += 1
+    return emails
+
+
+def dispatch_pending_emails(batch_size=None, connection=None):
+    """
+    Send due messages in batches over one reused mail connection.
+
+    Every message is sent on its own so one rejected recipient does not fail
+    the rest; after an error the connection is reopened. Failed messages are
+    retried with exponential backoff until ``EMAIL_MAX_ATTEMPTS``. Runs
+    until no due message is left and returns ``(sent, failed)``, where
+    ``failed`` counts failed attempts.
+    """
+    batch_size = batch_size or settings.EMAIL_DISPATCH_BATCH_SIZE
+    limiter = RateLimiter(settings.EMAIL_RATE_LIMIT)
+    sent = failed = 0
+    emails = claim_due_emails(batch_size)
+    if not emails:
+        return sent, failed
+
+    connection = connection or get_connection()
+    _open(connection)
+    try:
+        while emails:
+            delivered, errors = [], []
+            for email in emails:
+                limiter.wait()
+                message = EmailMessage(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=email.from_email,
+                    to=email.to,
+                    connection=connection,
+                )
+                try:
+                    if connection.send_messages([message]):
+                        delivered.append(email.id)
+                    else:
+                        errors.append((email, 'Message was not accepted.'))
+                except Exception as exc:
+                    errors.append((email, f'{type(exc).__name__}: {exc}'))
+                    connection.close()
+                    _open(connection)
+            _record(delivered, errors)
+            sent += len(delivered)
+            failed += len(errors)
+            if len(emails) < batch_size:
+                break
+            emails = claim_due_emails(batch_size)
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def _open(connection):
+    # An open connection is kept across send_messages() calls; if it cannot
+    # be opened, each send tries again and fails its message.
+    try:
+        connection.open()
+    except Exception:
+        pass
+
+
+def _record(delivered, errors):
+    now = timezone.now()
+    if delivered:
+        OutgoingEmail.objects.filter(id__in=delivered).update(
+            status=OutgoingEmail.STATUS_SENT, sent_at=now, last_error=''
+        )
+    for email, error in errors:
+        email.last_error = error
+        if email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+            email.status = OutgoingEmail.STATUS_FAILED
+        else:
+            email.next_attempt_at = now + timedelta(
+                seconds=retry_delay(email.attempts)
+            )
+    if errors:
+        OutgoingEmail.objects.bulk_update(
+            [email for email, _ in errors],
+            ['status', 'next_attempt_at', 'last_error'],
+        )
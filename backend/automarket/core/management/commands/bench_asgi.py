@@ -0,0 +1,194 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from carlisting.models import CarListing
+from core.bench import format_summary, get_bench_user, seed_bench_listings
+from users.models import Favorite
+
+SERVER_START_TIMEOUT = 30
+
+
+class Command(BaseCommand):
+    """
+    Compare the read endpoints served by gunicorn (sync WSGI views, threaded
+    workers) and by uvicorn (async ASGI views) under concurrent keep-alive
+    load.
+
+    Both servers run this tree with the same number of worker processes
+    and the current environment, so point ``REDIS_HOST`` at a real Redis to
+    exercise the shared cache.
+    """
+
+    help = 'Benchmark WSGI against ASGI throughput on the hot read endpoints.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=64)
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Seconds of load per endpoint and server.'
+        )
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument(
+            '--threads', type=int, default=16,
+            help='Threads per gunicorn worker.'
+        )
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        user = get_bench_user()
+        listings = CarListing.objects.filter(user=user, is_hidden=False)
+        if listings.count() < 100:
+            seed_bench_listings(100)
+        listing_ids = list(
+            listings.order_by('-id').values_list('id', flat=True)[:50]
+        )
+        Favorite.objects.add_many(user, listing_ids)
+
+        token = AccessToken.for_user(user)
+        host = next(
+            (h for h in settings.ALLOWED_HOSTS if h and '*' not in h),
+            'localhost'
+        ).lstrip('.')
+        endpoints = [
+            ('feed', f'{reverse("main")}?cursor=&page_size=20', None),
+            (
+                'detail',
+                reverse('carlisting:carlisting_detail', args=[listing_ids[0]]),
+                token,
+            ),
+            ('favorites', f'{reverse("users:favorites")}?page_size=20', token),
+        ]
+
+        port = options['port']
+        servers = [
+            ('WSGI', [
+                sys.executable, '-m', 'gunicorn', 'automarket.wsgi:application',
+                '--bind', f'127.0.0.1:{port}',
+                '--workers', str(options['workers']),
+                '--worker-class', 'gthread',
+                '--threads', str(options['threads']),
+                '--log-level', 'warning',
+            ]),
+            ('ASGI', [
+                sys.executable, '-m', 'uvicorn', 'automarket.asgi:application',
+                '--host', '127.0.0.1', '--port', str(port),
+                '--workers', str(options['workers']),
+                '--log-level', 'warning', '--no-access-log',
+            ]),
+        ]
+        # Each entry point picks its own URLconf.
+        env = {
+            name: value for name, value in os.environ.items()
+            if name != 'ROOT_URLCONF'
+        }
+
+        for label, command in servers:
+            server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+            try:
+                wait_for_port(port, server)
+                for name, path, auth in endpoints:
+                    request = build_request(host, path, auth)
+                    # Warms worker caches and connection pools.
+                    asyncio.run(run_load(
+                        port, request, options['concurrency'], 1
+                    ))
+                    samples, errors, elapsed = asyncio.run(run_load(
+                        port, request, options['concurrency'],
+                        options['duration']
+                    ))
+                    self.stdout.write(
+                        f'{format_summary(f"{name}, {label}", samples)} '
+                        f'{len(samples) / elapsed:8.0f} req/s '
+                        f'{errors} errors'
+                    )
+            finally:
+                server.terminate()
+                server.wait()
+
+
+def wait_for_port(port, server):
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise CommandError(f'Server exited with status {server.returncode}.')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError(f'Server did not listen on port {port}.')
+
+
+def build_request(host, path, token):
+    lines = [f'GET {path} HTTP/1.1', f'Host: {host}', 'Accept: application/json']
+    if token is not None:
+        lines.append(f'Authorization: Bearer {token}')
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode()
+
+
+async def run_load(port, request, concurrency, duration):
+    """
+    Send ``request`` over ``concurrency`` keep-alive connections for
+    ``duration`` seconds; return latencies in ms, failures and elapsed time.
+    """
+    samples = []
+    errors = 0
+    started = time.perf_counter()
+    deadline = started + duration
+
+    async def client():
+        nonlocal errors
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            sent = time.perf_counter()
+            try:
+                status, close = await fetch(reader, writer, request)
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                status, close = None, True
+            if status == 200:
+                samples.append((time.perf_counter() - sent) * 1000)
+            else:
+                errors += 1
+            if close:
+                writer.close()
+                writer = None
+        if writer is not None:
+            writer.close()
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return samples, errors, time.perf_counter() - started
+
+
+async def fetch(reader, writer, request):
+    """Send one request; return the status and whether the server closes."""
+    writer.write(request)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length, chunked, close = 0, False, False
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding':
+            chunked = 'chunked' in value
+        elif name == 'connection':
+            close = value == 'close'
+    if chunked:
+        while size := int((await reader.readline()).split(b';')[0], 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    else:
+        await reader.readexactly(length)
+    return status, close
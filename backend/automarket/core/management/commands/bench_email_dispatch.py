@@ -0,0 +1,72 @@
+import time
+
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from core.mail import dispatch_pending_emails, queue_email
+from core.models import OutgoingEmail
+from core.smtp_server import LocalSMTPServer
+
+
+class Command(BaseCommand):
+    """
+    Send the same messages to a local SMTP stand-in with one connection per
+    ``send_mail`` call and through the batched dispatcher.
+    """
+
+    help = 'Benchmark queued email dispatch against per-message send_mail.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500)
+        parser.add_argument(
+            '--connect-delay', type=float, default=0.02,
+            help='Seconds the stand-in takes to accept a connection.'
+        )
+        parser.add_argument(
+            '--message-delay', type=float, default=0.001,
+            help='Seconds the stand-in takes to accept a message.'
+        )
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        with LocalSMTPServer(
+            connect_delay=options['connect_delay'],
+            message_delay=options['message_delay'],
+        ) as server, override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST=server.host,
+            EMAIL_PORT=server.port,
+            EMAIL_USE_TLS=False,
+            EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            EMAIL_RATE_LIMIT=0,
+        ):
+            started = time.perf_counter()
+            for i in range(count):
+                send_mail(
+                    f'Benchmark {i}', 'Body', None, [f'bench{i}@example.com']
+                )
+            self.report('send_mail per message', count, started, server)
+
+            server.connections = 0
+            queued = [
+                queue_email(f'Benchmark {i}', 'Body', [f'bench{i}@example.com'])
+                for i in range(count)
+            ]
+            started = time.perf_counter()
+            try:
+                dispatch_pending_emails()
+                self.report('batched dispatch', count, started, server)
+            finally:
+                OutgoingEmail.objects.filter(
+                    id__in=[email.id for email in queued]
+                ).delete()
+
+    def report(self, name, count, started, server):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{name:<40} {count / elapsed:10.0f} messages/s '
+            f'({server.connections} connections)'
+        )
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.bench import format_summary, measure
+from core.models import OutboxMessage
+from core.outbox import enqueue_task, relay_outbox
+from core.tasks import dispatch_emails_task
+
+
+class Command(BaseCommand):
+    """
+    Compare the request-side cost of publishing a task directly with
+    writing it to the outbox, and time the relay.
+
+    Publishes ``dispatch_emails_task``, which only sends mail that is
+    already due, to the configured broker.
+    """
+
+    help = 'Benchmark task dispatch through the transactional outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=500)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        self.stdout.write(format_summary(
+            'delay() in the request',
+            measure(dispatch_emails_task.delay, repeat)
+        ))
+
+        created = []
+
+        def enqueue():
+            with transaction.atomic():
+                created.append(enqueue_task(dispatch_emails_task).id)
+
+        try:
+            self.stdout.write(format_summary(
+                'enqueue_task() and commit', measure(enqueue, repeat)
+            ))
+            started = time.perf_counter()
+            relayed = relay_outbox()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{"relay":<40} {relayed / elapsed:10.0f} tasks/s '
+                f'({relayed} tasks)'
+            )
+        finally:
+            OutboxMessage.objects.filter(id__in=created).delete()
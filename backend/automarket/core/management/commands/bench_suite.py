@@ -0,0 +1,713 @@
+import json
+import os
+import platform
+import random
+import subprocess
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from carlisting.models import CarListing, PriceStatistic, SavedSearch
+from carlisting.statistics import MILEAGE_BAND_WIDTH, refresh_price_statistics
+from core import seeding
+from core.bench import (
+    DATASET_USER_PREFIX,
+    get_bench_user,
+    run_concurrently,
+    seed_bench_dataset,
+    seed_bench_listings,
+    summarize,
+)
+from users.models import EmailVerification, Favorite, User
+from users.tokens import RefreshToken
+
+# Rows written by the write endpoints carry these markers and are removed
+# after the run, so repeated runs measure the same dataset.
+WRITE_PREFIX = 'Bench suite new'
+REGISTERED_PREFIX = 'bench-reg-'
+
+# URLconfs whose every route the suite must exercise.
+COVERED_URLCONFS = ('carlisting.urls', 'users.urls')
+
+CSV_HEADER = (
+    'title,description,price,year,mileage,engine_type,transmission,'
+    'body_type,color,brand_name,location_name,insurance_start_date,'
+    'insurance_end_date,owner_count,accident_count,accident_details,image_urls'
+)
+
+
+class Endpoint:
+    """
+    One route under load.
+
+    ``build(count)`` prepares whatever ``count`` requests consume (fresh
+    listings to delete, unused verification codes) and returns a function
+    mapping a request index to the keyword arguments of the client call.
+    """
+
+    def __init__(self, name, method, route, build, expect=(200,), slow=False):
+        self.name = name
+        self.method = method
+        self.route = route
+        self.build = build
+        self.expect = expect
+        # Password hashing dominates these; they get fewer requests.
+        self.slow = slow
+
+
+class Command(BaseCommand):
+    """
+    Drive every API endpoint at a fixed concurrency against a large seeded
+    dataset and write a JSON report of latency percentiles, throughput and
+    SQL queries per request.
+
+    Requests go through Django's request handler in this process, one
+    thread and database connection per concurrent client, which is what
+    makes exact per-request query counts possible; HTTP server overhead is
+    left to ``bench_asgi``. Pass ``--baseline`` with the report of an
+    earlier commit to print the differences and flag regressions.
+    """
+
+    help = 'Run the end-to-end load benchmark of every endpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--images-per-listing', type=int, default=3)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help='Processes generating the dataset.'
+        )
+        parser.add_argument(
+            '--skip-seed', action='store_true',
+            help='Measure the dataset as it is.'
+        )
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--requests', type=int, default=300,
+            help='Measured requests per endpoint.'
+        )
+        parser.add_argument(
+            '--slow-requests', type=int, default=40,
+            help='Measured requests for the password hashing endpoints.'
+        )
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument(
+            '--only', nargs='+', metavar='ENDPOINT',
+            help='Run only these endpoints.'
+        )
+        parser.add_argument('--output', default='bench-suite.json')
+        parser.add_argument(
+            '--baseline',
+            help='A previous report to compare against.'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=10,
+            help='Percent p95 slowdown or throughput drop reported as a '
+                 'regression.'
+        )
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Exit with an error if any endpoint regressed.'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--users and --concurrency must be positive.')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as report:
+                baseline = json.load(report)
+
+        if not options['skip_seed']:
+            seed_bench_dataset(
+                options['listings'], options['users'],
+                images_per_listing=options['images_per_listing'],
+                favorites_per_user=options['favorites_per_user'],
+                processes=options['processes'], seed=options['seed'],
+                stdout=self.stdout,
+            )
+            refresh_price_statistics()
+
+        self.rng = random.Random(options['seed'])
+        self.run_id = uuid.uuid4().hex[:8]
+        endpoints = self.get_endpoints()
+        self.check_coverage(endpoints)
+        if options['only']:
+            unknown = set(options['only']) - {e.name for e in endpoints}
+            if unknown:
+                raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+            endpoints = [e for e in endpoints if e.name in options['only']]
+
+        results = {}
+        try:
+            for endpoint in endpoints:
+                results[endpoint.name] = self.run_endpoint(endpoint, options)
+        finally:
+            self.clean_up()
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'commit': git_commit(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'postgresql': connection.pg_version,
+                'cpus': os.cpu_count(),
+            },
+            'options': {
+                name: options[name] for name in (
+                    'concurrency', 'requests', 'slow_requests', 'warmup', 'seed'
+                )
+            },
+            'dataset': dataset_size(),
+            'endpoints': results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(f'Wrote {options["output"]}')
+
+        if baseline is not None:
+            regressions = self.compare(baseline, report, options['threshold'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'Regressed: {", ".join(regressions)}')
+
+    def run_endpoint(self, endpoint, options):
+        count = options['slow_requests'] if endpoint.slow else options['requests']
+        warmup = min(options['warmup'], count)
+        request = endpoint.build(warmup + count)
+
+        def send(client, i):
+            return getattr(client, endpoint.method)(**request(i))
+
+        run_concurrently(send, range(warmup), options['concurrency'])
+        samples, elapsed = run_concurrently(
+            send, range(warmup, warmup + count), options['concurrency']
+        )
+
+        latencies = [latency for latency, _, _, _ in samples]
+        queries = [query_count for _, query_count, _, _ in samples]
+        statuses = Counter(str(status) for _, _, _, status in samples)
+        errors = sum(
+            1 for _, _, _, status in samples if status not in endpoint.expect
+        )
+        result = {
+            'method': endpoint.method.upper(),
+            'route': endpoint.route,
+            **summarize(latencies),
+            'requests_per_s': len(samples) / elapsed,
+            'errors': errors,
+            'statuses': dict(statuses),
+            'queries_mean': sum(queries) / len(queries),
+            'queries_max': max(queries),
+            'query_ms_mean': sum(q for _, _, q, _ in samples) / len(samples),
+        }
+        self.stdout.write(
+            f'{endpoint.name:<24} n={result["count"]:<5} '
+            f'p50={result["p50_ms"]:8.2f}ms p95={result["p95_ms"]:8.2f}ms '
+            f'p99={result["p99_ms"]:8.2f}ms {result["requests_per_s"]:7.0f} req/s '
+            f'{result["queries_mean"]:5.1f} queries {errors} errors'
+        )
+        return result
+
+    def compare(self, baseline, report, threshold):
+        self.stdout.write(f'Compared with {baseline.get("commit") or "baseline"}:')
+        regressions = []
+        for name, new in report['endpoints'].items():
+            old = baseline['endpoints'].get(name)
+            if old is None:
+                continue
+            p95_change = change(old['p95_ms'], new['p95_ms'])
+            rps_change = change(old['requests_per_s'], new['requests_per_s'])
+            regressed = (
+                p95_change > threshold
+                or rps_change < -threshold
+                or new['queries_mean'] > old['queries_mean'] + 0.5
+            )
+            if regressed:
+                regressions.append(name)
+            self.stdout.write(
+                f'{name:<24} p95 {old["p95_ms"]:8.2f} -> {new["p95_ms"]:8.2f}ms '
+                f'({p95_change:+6.1f}%) '
+                f'{old["requests_per_s"]:7.0f} -> {new["requests_per_s"]:7.0f} '
+                f'req/s ({rps_change:+6.1f}%) '
+                f'queries {old["queries_mean"]:5.1f} -> {new["queries_mean"]:5.1f}'
+                f'{"  REGRESSED" if regressed else ""}'
+            )
+        return regressions
+
+    def check_coverage(self, endpoints):
+        routes = {'main'}
+        for urlconf in COVERED_URLCONFS:
+            namespace = urlconf.split('.')[0]
+            routes.update(
+                f'{namespace}:{pattern.name}'
+                for pattern in get_resolver(urlconf).url_patterns
+            )
+        missing = routes - {endpoint.route for endpoint in endpoints}
+        if missing:
+            raise CommandError(
+                f'No load scenario for: {", ".join(sorted(missing))}'
+            )
+
+    def clean_up(self):
+        CarListing.objects.filter(title__startswith=WRITE_PREFIX).delete()
+        SavedSearch.objects.filter(name__startswith=WRITE_PREFIX).delete()
+        User.objects.filter(username__startswith=REGISTERED_PREFIX).delete()
+
+    def get_endpoints(self):
+        rng = self.rng
+        user = get_bench_user()
+        admin = get_bench_user('bench-admin')
+        if not admin.is_staff:
+            admin.is_staff = True
+            admin.save(update_fields=['is_staff'])
+        auth = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        admin_auth = {'Authorization': f'Bearer {AccessToken.for_user(admin)}'}
+
+        brands = seeding.get_brands(seeding.DEFAULTS['brands'])
+        brand_names = [brand.name for brand in brands]
+        locations = seeding.get_locations(seeding.DEFAULTS['locations'])
+        listing_ids = self.sample_listing_ids(2000)
+        own_ids = self.own_listing_ids(user, 200)
+        Favorite.objects.add_many(user, listing_ids[:50])
+        # Listings favorited and unfavorited by the single-listing endpoints.
+        favorite_ids = listing_ids[50:]
+        saved_search_ids = list(
+            SavedSearch.objects.filter(user=user)
+            .exclude(name__startswith=WRITE_PREFIX).values_list('id', flat=True)
+        ) or [
+            search.pk for search in SavedSearch.objects.bulk_create([
+                SavedSearch(
+                    user=user, name=f'Bench search {i}', brand_id=brand.pk,
+                    price_max=30000,
+                )
+                for i, brand in enumerate(brands)
+            ])
+        ]
+        statistics = list(
+            PriceStatistic.objects.select_related('brand').filter(
+                brand__in=brands
+            ).exclude(model='').order_by('-count')[:100]
+        )
+        searches = [
+            'red coupe', 'automatic diesel', 'black suv 2015',
+            'manual hatchback', 'white sedan electric',
+        ]
+
+        def get(path, params=None, headers=None):
+            return {'path': path, 'data': params, 'headers': headers or {}}
+
+        def post(path, data=None, headers=None):
+            return {
+                'path': path,
+                'data': data,
+                'content_type': 'application/json',
+                'headers': headers or {},
+            }
+
+        def static(request):
+            return lambda count: lambda i: request
+
+        def listing_payload(i):
+            return {
+                'title': f'{WRITE_PREFIX} {i}',
+                'description': 'Listing created by the load benchmark.',
+                'price': str(rng.randrange(1000, 100000)),
+                'year': rng.randrange(1990, 2025),
+                'mileage': rng.randrange(0, 300000),
+                'engine_type': 'Gasoline',
+                'transmission': 'Automatic',
+                'body_type': 'Sedan',
+                'color': 'Black',
+                'brand_name': rng.choice(brand_names),
+                'location_name': rng.choice(locations).city,
+                'insurance_information': {
+                    'insurance_start_date': '2024-01-01T00:00:00Z',
+                    'insurance_end_date': '2025-01-01T00:00:00Z',
+                    'owner_count': 1,
+                    'accident_count': 0,
+                    'accident_details': 'None',
+                },
+                'images': [
+                    {'image_url': f'https://example.com/bench/new/{i}/{n}.jpg'}
+                    for n in range(3)
+                ],
+            }
+
+        def import_file(i, rows=20):
+            lines = [CSV_HEADER] + [
+                f'{WRITE_PREFIX} import {i}-{n},Imported by the load benchmark.,'
+                f'{rng.randrange(1000, 100000)},{rng.randrange(1990, 2025)},'
+                f'{rng.randrange(0, 300000)},Diesel,Manual,Wagon,Grey,'
+                f'{rng.choice(brand_names)},{rng.choice(locations).city},'
+                f'2024-01-01T00:00:00Z,2025-01-01T00:00:00Z,2,1,Scratched bumper,'
+                f'https://example.com/bench/import/{i}/{n}.jpg'
+                for n in range(rows)
+            ]
+            return SimpleUploadedFile(
+                f'listings-{i}.csv', '\n'.join(lines).encode(),
+                content_type='text/csv'
+            )
+
+        def listing_pool(count):
+            ids = self.new_listing_ids(user, count)
+            return lambda i: {
+                'path': reverse('carlisting:carlisting_detail', args=[ids[i]])
+                + '?confirm=True',
+                'headers': auth,
+            }
+
+        def saved_search_pool(count):
+            ids = [
+                search.pk for search in SavedSearch.objects.bulk_create([
+                    SavedSearch(user=user, name=f'{WRITE_PREFIX} {i}')
+                    for i in range(count)
+                ])
+            ]
+            return lambda i: {
+                'path': reverse('carlisting:saved_search_detail', args=[ids[i]]),
+                'headers': auth,
+            }
+
+        def refresh_pool(count):
+            tokens = [str(RefreshToken.for_user(user)) for _ in range(count)]
+            return lambda i: post(
+                reverse('users:token_refresh'), {'refresh': tokens[i]}
+            )
+
+        def verification_pool(count):
+            users = self.registered_users(count, is_active=False)
+            codes = EmailVerification.objects.bulk_create([
+                EmailVerification(
+                    user=pending, code=uuid.uuid4(),
+                    expiration=timezone.now() + timedelta(hours=48),
+                )
+                for pending in users
+            ])
+            return lambda i: post(reverse(
+                'users:email_verification', kwargs={'code': codes[i].code}
+            ))
+
+        def member_auth(count):
+            return [
+                {'Authorization': f'Bearer {AccessToken.for_user(member)}'}
+                for member in self.registered_users(count, is_active=True)
+            ]
+
+        def saved_search_create_pool(count):
+            # One creator per request, as each user has a saved search limit.
+            headers = member_auth(count)
+            return lambda i: post(
+                reverse('carlisting:saved_search_list'), {
+                    'name': f'{WRITE_PREFIX} {i}',
+                    'brand_name': brand_names[i % len(brand_names)],
+                    'price_max': '30000.00',
+                }, headers[i]
+            )
+
+        def profile_delete_pool(count):
+            headers = member_auth(count)
+            return lambda i: {
+                'path': reverse('users:profile_delete'),
+                'data': {'confirm': True},
+                'content_type': 'application/json',
+                'headers': headers[i],
+            }
+
+        return [
+            Endpoint('feed', 'get', 'main', lambda count: lambda i: get(
+                reverse('main'), {'page': i % 5 + 1, 'page_size': 20}
+            )),
+            Endpoint('feed_keyset', 'get', 'main', static(get(
+                reverse('main'), {'cursor': '', 'page_size': 20}
+            ))),
+            Endpoint(
+                'feed_cache_stats', 'get', 'carlisting:feed_cache_stats',
+                static(get(reverse('carlisting:feed_cache_stats'),
+                           headers=admin_auth)),
+            ),
+            Endpoint(
+                'listing_filter', 'get', 'carlisting:carlisting_filter',
+                lambda count: lambda i: get(
+                    reverse('carlisting:carlisting_filter'), {
+                        'brand': brand_names[i % len(brand_names)],
+                        'price_min': 10000, 'price_max': 30000,
+                        'page_size': 20,
+                    }
+                ),
+            ),
+            Endpoint(
+                'listing_filter_nearby', 'get', 'carlisting:carlisting_filter',
+                lambda count: lambda i: get(
+                    reverse('carlisting:carlisting_filter'), {
+                        'lat': locations[i % len(locations)].latitude,
+                        'lng': locations[i % len(locations)].longitude,
+                        'radius': 25, 'page_size': 20,
+                    }
+                ),
+            ),
+            Endpoint(
+                'listing_search', 'get', 'carlisting:carlisting_search',
+                lambda count: lambda i: get(
+                    reverse('carlisting:carlisting_search'),
+                    {'q': searches[i % len(searches)], 'page_size': 20}
+                ),
+            ),
+            Endpoint(
+                'price_estimate', 'get', 'carlisting:price_estimate',
+                lambda count: lambda i: get(
+                    reverse('carlisting:price_estimate'), {
+                        'brand': statistics[i % len(statistics)].brand.name,
+                        'model': statistics[i % len(statistics)].model,
+                        'year': statistics[i % len(statistics)].year,
+                        'mileage': statistics[i % len(statistics)].mileage_band
+                        * MILEAGE_BAND_WIDTH,
+                    }
+                ),
+            ),
+            Endpoint(
+                'listing_detail', 'get', 'carlisting:carlisting_detail',
+                lambda count: lambda i: get(reverse(
+                    'carlisting:carlisting_detail',
+                    args=[listing_ids[i % len(listing_ids)]]
+                ), headers=auth),
+            ),
+            Endpoint(
+                'saved_search_list', 'get', 'carlisting:saved_search_list',
+                static(get(reverse('carlisting:saved_search_list'), headers=auth)),
+            ),
+            Endpoint(
+                'saved_search_detail', 'get', 'carlisting:saved_search_detail',
+                lambda count: lambda i: get(reverse(
+                    'carlisting:saved_search_detail',
+                    args=[saved_search_ids[i % len(saved_search_ids)]]
+                ), headers=auth),
+            ),
+            Endpoint(
+                'profile', 'get', 'users:profile',
+                static(get(reverse('users:profile'), headers=auth)),
+            ),
+            Endpoint(
+                'favorites', 'get', 'users:favorites',
+                static(get(reverse('users:favorites'), {'page_size': 20}, auth)),
+            ),
+            Endpoint(
+                'listing_create', 'post', 'carlisting:carlisting_create',
+                lambda count: lambda i: post(
+                    reverse('carlisting:carlisting_create'),
+                    listing_payload(i), auth
+                ),
+                expect=(201,),
+            ),
+            Endpoint(
+                'listing_import', 'post', 'carlisting:carlisting_import',
+                lambda count: lambda i: {
+                    'path': reverse('carlisting:carlisting_import'),
+                    'data': {'file': import_file(i)},
+                    'headers': auth,
+                },
+            ),
+            Endpoint(
+                'listing_update', 'patch', 'carlisting:carlisting_detail',
+                lambda count: lambda i: post(reverse(
+                    'carlisting:carlisting_detail',
+                    args=[own_ids[i % len(own_ids)]]
+                ), {'price': str(rng.randrange(1000, 100000))}, auth),
+            ),
+            Endpoint(
+                'listing_hide', 'post', 'carlisting:hide_car_listing',
+                lambda count: lambda i: post(reverse(
+                    'carlisting:hide_car_listing',
+                    args=[own_ids[i % len(own_ids)]]
+                ), headers=auth),
+            ),
+            Endpoint(
+                'listing_show', 'post', 'carlisting:show_car_listing',
+                lambda count: lambda i: post(reverse(
+                    'carlisting:show_car_listing',
+                    args=[own_ids[i % len(own_ids)]]
+                ), headers=auth),
+            ),
+            Endpoint(
+                'listing_bulk', 'post', 'carlisting:carlisting_bulk',
+                lambda count: lambda i: post(
+                    reverse('carlisting:carlisting_bulk'), {
+                        'action': 'hide' if i % 2 else 'show',
+                        'car_listing_ids': own_ids[:50],
+                    }, auth
+                ),
+            ),
+            Endpoint(
+                'saved_search_create', 'post', 'carlisting:saved_search_list',
+                saved_search_create_pool, expect=(201,),
+            ),
+            Endpoint(
+                'saved_search_update', 'patch', 'carlisting:saved_search_detail',
+                lambda count: lambda i: post(reverse(
+                    'carlisting:saved_search_detail',
+                    args=[saved_search_ids[i % len(saved_search_ids)]]
+                ), {'price_max': str(rng.randrange(10000, 50000))}, auth),
+            ),
+            Endpoint(
+                'profile_update', 'post', 'users:profile',
+                lambda count: lambda i: post(
+                    reverse('users:profile'), {'first_name': f'Bench {i}'}, auth
+                ),
+            ),
+            Endpoint(
+                'favorite_add', 'post', 'users:add_to_favorite',
+                lambda count: lambda i: post(reverse(
+                    'users:add_to_favorite',
+                    args=[favorite_ids[i % len(favorite_ids)]]
+                ), headers=auth),
+                expect=(200, 201),
+            ),
+            Endpoint(
+                'favorite_remove', 'post', 'users:remove_from_favorite',
+                lambda count: lambda i: post(reverse(
+                    'users:remove_from_favorite',
+                    args=[favorite_ids[i % len(favorite_ids)]]
+                ), headers=auth),
+                expect=(204, 404),
+            ),
+            Endpoint(
+                'favorites_batch_add', 'post', 'users:add_favorites_batch',
+                lambda count: lambda i: post(
+                    reverse('users:add_favorites_batch'),
+                    {'car_listing_ids': rng.sample(favorite_ids, 20)}, auth
+                ),
+            ),
+            Endpoint(
+                'favorites_batch_remove', 'post', 'users:remove_favorites_batch',
+                lambda count: lambda i: post(
+                    reverse('users:remove_favorites_batch'),
+                    {'car_listing_ids': rng.sample(favorite_ids, 20)}, auth
+                ),
+            ),
+            Endpoint('token_refresh', 'post', 'users:token_refresh', refresh_pool),
+            Endpoint(
+                'email_verification', 'post', 'users:email_verification',
+                verification_pool,
+            ),
+            Endpoint(
+                'login', 'post', 'users:login',
+                static(post(
+                    reverse('users:login'),
+                    {'username': user.username, 'password': user.username}
+                )),
+                slow=True,
+            ),
+            Endpoint(
+                'register', 'post', 'users:register',
+                lambda count: lambda i: post(reverse('users:register'), {
+                    'username': f'{REGISTERED_PREFIX}{self.run_id}-{i}',
+                    'email': f'{REGISTERED_PREFIX}{self.run_id}-{i}@example.com',
+                    'password': 'bench-password',
+                }),
+                expect=(201,),
+                slow=True,
+            ),
+            Endpoint(
+                'listing_delete', 'delete', 'carlisting:carlisting_detail',
+                listing_pool, expect=(204,),
+            ),
+            Endpoint(
+                'saved_search_delete', 'delete', 'carlisting:saved_search_detail',
+                saved_search_pool, expect=(204,),
+            ),
+            Endpoint(
+                'profile_delete', 'delete', 'users:profile_delete',
+                profile_delete_pool, expect=(204,),
+            ),
+        ]
+
+    def sample_listing_ids(self, count):
+        """Random visible listings of the seeded dataset."""
+        listings = CarListing.objects.filter(
+            user__username__startswith=DATASET_USER_PREFIX, is_hidden=False
+        )
+        bounds = listings.order_by('id').values_list('id', flat=True)
+        low, high = bounds.first(), bounds.last()
+        if low is None:
+            raise CommandError('The dataset is empty; run without --skip-seed.')
+        candidates = {
+            self.rng.randint(low, high) for _ in range(count * 2)
+        }
+        ids = sorted(listings.filter(id__in=candidates).values_list('id', flat=True))
+        self.rng.shuffle(ids)
+        return ids[:count]
+
+    def own_listing_ids(self, user, count):
+        listings = CarListing.objects.filter(user=user).exclude(
+            title__startswith=WRITE_PREFIX
+        )
+        missing = count - listings.count()
+        if missing > 0:
+            seed_bench_listings(missing)
+        return list(listings.order_by('id').values_list('id', flat=True)[:count])
+
+    def new_listing_ids(self, user, count):
+        last_id = CarListing.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        seed_bench_listings(count)
+        listings = CarListing.objects.filter(user=user, id__gt=last_id)
+        # Marked for clean_up() in case the run stops before deleting them.
+        listings.update(title=f'{WRITE_PREFIX} listing')
+        return list(listings.order_by('id').values_list('id', flat=True))
+
+    def registered_users(self, count, is_active):
+        prefix = f'{REGISTERED_PREFIX}{self.run_id}-{uuid.uuid4().hex[:6]}-'
+        return User.objects.bulk_create([
+            User(
+                username=f'{prefix}{i}', email=f'{prefix}{i}@example.com',
+                is_active=is_active, password='!',
+            )
+            for i in range(count)
+        ])
+
+
+def change(old, new):
+    return (new - old) / old * 100 if old else 0.0
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset_size():
+    """Row estimates of the main tables, cheap even at tens of millions."""
+    from carlisting.models import CarImage, InsuranceInfo
+
+    models = {
+        'users': User, 'listings': CarListing, 'insurance': InsuranceInfo,
+        'images': CarImage, 'favorites': Favorite,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT relname, reltuples::bigint FROM pg_class WHERE relname = ANY(%s)',
+            [[model._meta.db_table for model in models.values()]]
+        )
+        estimates = dict(cursor.fetchall())
+    return {
+        name: estimates.get(model._meta.db_table)
+        for name, model in models.items()
+    }
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.outbox import OutboxListener, prune_outbox, relay_outbox
+
+PRUNE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    """
+    Publish outbox rows to the broker as their transactions commit.
+
+    The relay sleeps on LISTEN until an insert into the outbox commits,
+    and polls every ``--poll-interval`` seconds in case a notification
+    was missed.
+    """
+
+    help = 'Relay outbox tasks to the Celery broker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=5)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Relay what is pending and exit.'
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            self.stdout.write(f'Relayed {relay_outbox()} tasks')
+            return
+
+        listener = OutboxListener()
+        pruned_at = 0
+        self.stdout.write('Relaying outbox...')
+        while True:
+            try:
+                relay_outbox()
+                if time.monotonic() - pruned_at > PRUNE_INTERVAL:
+                    prune_outbox()
+                    pruned_at = time.monotonic()
+                listener.wait(options['poll_interval'])
+            except Exception as exc:
+                # The broker or database is unavailable; unsent rows stay
+                # in the outbox until the next pass.
+                self.stderr.write(f'Outbox relay failed: {exc}')
+                close_old_connections()
+                time.sleep(options['poll_interval'])
@@ -0,0 +1,58 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import seeding
+
+
+class Command(BaseCommand):
+    """
+    Fill the database with realistic synthetic users, listings, insurance,
+    images and favorites, reproducibly for a given ``--seed``.
+
+    Rows are generated in parallel and loaded with ``COPY`` while the
+    secondary indexes and foreign keys of those tables are dropped, so run
+    it against a database nothing else is using.
+    """
+
+    help = 'Seed synthetic data with COPY, in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=100_000)
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help='Processes generating and loading rows.'
+        )
+        parser.add_argument(
+            '--no-defer-indexes', action='store_false', dest='defer_indexes',
+            help='Keep indexes and foreign keys in place during the load.'
+        )
+        parser.add_argument(
+            '--no-vacuum', action='store_false', dest='vacuum',
+            help='Skip VACUUM (ANALYZE) of the loaded tables.'
+        )
+        for name, default in seeding.DEFAULTS.items():
+            parser.add_argument(
+                f'--{name.replace("_", "-")}', type=type(default),
+                default=default
+            )
+
+    def handle(self, *args, **options):
+        if options['listings'] < 0 or options['users'] < 0:
+            raise CommandError('--listings and --users cannot be negative.')
+        try:
+            totals = seeding.seed(
+                stdout=self.stdout,
+                **{
+                    name: options[name] for name in (
+                        'listings', 'users', 'processes', 'defer_indexes',
+                        'vacuum', *seeding.DEFAULTS,
+                    )
+                }
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(', '.join(
+            f'{count} {table}' for table, count in totals.items()
+        ))
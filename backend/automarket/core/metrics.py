@@ -0,0 +1,294 @@
+"""
+Request, SQL and Celery task metrics in the Prometheus text format.
+
+Observations are aggregated in memory, and a thread in each process adds
+them to a hash in Redis every ``METRICS_FLUSH_INTERVAL`` seconds, so
+requests never wait on Redis and the scrape endpoint of any process
+reports the totals of all web and worker processes, at most one interval
+late. Without Redis (tests, local runs) each process reports only itself.
+
+SQL is measured by a wrapper that ``core.signals`` installs on every
+database connection. It is a single context variable lookup per query
+unless a request or task is being tracked, and the variable follows the
+request into the threads that run the ORM calls of async views.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+import redis
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = 'automarket:metrics'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+TASK_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+
+# Name: type, help and histogram buckets.
+METRICS = {
+    'http_requests_total': (
+        'counter', 'HTTP responses by route, method and status.', None
+    ),
+    'http_request_duration_seconds': (
+        'histogram', 'Time spent handling HTTP requests.', LATENCY_BUCKETS
+    ),
+    'http_response_size_bytes': (
+        'histogram', 'Size of HTTP response bodies.', SIZE_BUCKETS
+    ),
+    'http_request_db_queries': (
+        'histogram', 'SQL queries per HTTP request.', QUERY_BUCKETS
+    ),
+    'http_request_db_duration_seconds': (
+        'histogram', 'SQL time per HTTP request.', LATENCY_BUCKETS
+    ),
+    'celery_task_duration_seconds': (
+        'histogram', 'Time spent running Celery tasks.', TASK_BUCKETS
+    ),
+    'celery_task_queue_wait_seconds': (
+        'histogram', 'Time Celery tasks waited between publishing and running.',
+        TASK_BUCKETS
+    ),
+    'celery_task_db_queries_total': (
+        'counter', 'SQL queries run by Celery tasks.', None
+    ),
+    'celery_task_db_duration_seconds_total': (
+        'counter', 'SQL time of Celery tasks.', None
+    ),
+    'purged_rows_total': (
+        'counter', 'Rows deleted by periodic cleanup tasks.', None
+    ),
+}
+
+_query_stats = ContextVar('query_stats', default=None)
+
+_lock = threading.Lock()
+_pending = defaultdict(float)
+_flusher_started = False
+_store = None
+
+
+class QueryStats:
+    __slots__ = ('count', 'seconds', 'origin')
+
+    def __init__(self, origin):
+        self.count = 0
+        self.seconds = 0.0
+        # The request or the name of the task running the queries.
+        self.origin = origin
+
+
+def track_queries(origin):
+    """
+    Count the SQL of the current context from now on; return the stats and
+    the token that ``stop_tracking()`` takes.
+    """
+    stats = QueryStats(origin)
+    return stats, _query_stats.set(stats)
+
+
+def stop_tracking(token):
+    _query_stats.reset(token)
+
+
+def current_stats():
+    return _query_stats.get()
+
+
+def count_queries(execute, sql, params, many, context):
+    stats = _query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - started
+
+
+def install_query_counter(connection):
+    # The wrapper list outlives reconnects of the same connection object.
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_queries)
+
+
+def inc(name, labels, value=1):
+    """Add ``value`` to the counter ``name``; ``labels`` are sorted pairs."""
+    with _lock:
+        _start_flusher()
+        _pending[(name, '', labels)] += value
+
+
+def observe(name, labels, value):
+    """Record ``value`` in the histogram ``name``."""
+    buckets = METRICS[name][2]
+    le = next(
+        (_format_value(bound) for bound in buckets if value <= bound), '+Inf'
+    )
+    with _lock:
+        _start_flusher()
+        _pending[(name, '_bucket', labels + (('le', le),))] += 1
+        _pending[(name, '_sum', labels)] += value
+        _pending[(name, '_count', labels)] += 1
+
+
+def flush():
+    """Add what this process observed since the last flush to the store."""
+    global _pending
+    with _lock:
+        if not _pending:
+            return
+        deltas, _pending = _pending, defaultdict(float)
+    try:
+        get_store().add(deltas)
+    except RedisError:
+        logger.warning('Could not flush metrics.', exc_info=True)
+        # Kept for the next flush; label values are bounded, so this is too.
+        with _lock:
+            for key, value in deltas.items():
+                _pending[key] += value
+
+
+def _start_flusher():
+    # Called with the lock held.
+    global _flusher_started
+    if _flusher_started:
+        return
+    _flusher_started = True
+    threading.Thread(
+        target=_flush_periodically, name='metrics-flush', daemon=True
+    ).start()
+    atexit.register(flush)
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(settings.METRICS_FLUSH_INTERVAL)
+        flush()
+
+
+def _reset_after_fork():
+    # The child starts empty, without the parent's thread and lock holder.
+    global _lock, _pending, _flusher_started
+    _lock = threading.Lock()
+    _pending = defaultdict(float)
+    _flusher_started = False
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class RedisStore:
+    """Totals of every process, in one Redis hash."""
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url)
+
+    def add(self, deltas):
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in deltas.items():
+            pipeline.hincrbyfloat(METRICS_KEY, json.dumps(key), value)
+        pipeline.execute()
+
+    def read(self):
+        return {
+            _decode(field): float(value)
+            for field, value in self.client.hgetall(METRICS_KEY).items()
+        }
+
+
+class LocalStore:
+    """Totals of this process only."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = defaultdict(float)
+
+    def add(self, deltas):
+        with self.lock:
+            for key, value in deltas.items():
+                self.values[key] += value
+
+    def read(self):
+        with self.lock:
+            return dict(self.values)
+
+
+def get_store():
+    global _store
+    if _store is None:
+        if isinstance(caches['default'], RedisCache):
+            _store = RedisStore(settings.CACHES['default']['LOCATION'])
+        else:
+            _store = LocalStore()
+    return _store
+
+
+def render(values):
+    """Format the totals from a store in the Prometheus text format."""
+    samples = defaultdict(dict)
+    for (name, suffix, labels), value in values.items():
+        samples[name][(suffix, labels)] = value
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = samples.get(name)
+        if not series:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (_, labels), value in sorted(series.items()):
+                lines.append(_sample(name, labels, value))
+            continue
+        # Buckets are stored individually and reported cumulatively.
+        for labels in sorted(labels for suffix, labels in series if suffix == '_count'):
+            cumulative = 0
+            for le in [*map(_format_value, buckets), '+Inf']:
+                bucket = labels + (('le', le),)
+                cumulative += series.get(('_bucket', bucket), 0)
+                lines.append(_sample(f'{name}_bucket', bucket, cumulative))
+            lines.append(_sample(f'{name}_sum', labels, series[('_sum', labels)]))
+            lines.append(
+                _sample(f'{name}_count', labels, series[('_count', labels)])
+            )
+    return '\n'.join(lines) + '\n'
+
+
+def _decode(field):
+    name, suffix, labels = json.loads(field)
+    return name, suffix, tuple(tuple(pair) for pair in labels)
+
+
+def _sample(name, labels, value):
+    if labels:
+        name += '{' + ','.join(
+            f'{key}="{_escape(value)}"' for key, value in labels
+        ) + '}'
+    return f'{name} {_format_value(value)}'
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+    )
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
@@ -0,0 +1,67 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from . import inspector, metrics
+
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class MetricsMiddleware:
+    """
+    Record the latency, response size and SQL of every request, labelled
+    with the URL name of its route, and save the slow queries it captured.
+
+    Put it first, so the time of the other middleware is included.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        stats, token = metrics.track_queries(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.stop_tracking(token)
+        record_request(request, response, time.perf_counter() - started, stats)
+        if inspector.has_pending_captures():
+            inspector.save_captures()
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        stats, token = metrics.track_queries(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.stop_tracking(token)
+        record_request(request, response, time.perf_counter() - started, stats)
+        if inspector.has_pending_captures():
+            await sync_to_async(inspector.save_captures)()
+        return response
+
+
+def record_request(request, response, seconds, stats):
+    match = request.resolver_match
+    labels = (
+        ('method', request.method if request.method in METHODS else 'other'),
+        ('route', match.view_name if match is not None else 'unmatched'),
+    )
+    metrics.inc(
+        'http_requests_total', labels + (('status', str(response.status_code)),)
+    )
+    metrics.observe('http_request_duration_seconds', labels, seconds)
+    metrics.observe('http_request_db_queries', labels, stats.count)
+    metrics.observe('http_request_db_duration_seconds', labels, stats.seconds)
+    # The size of a streamed body is unknown until it has been sent.
+    if not response.streaming:
+        metrics.observe('http_response_size_bytes', labels, len(response.content))
@@ -0,0 +1,48 @@
+# Generated by Django 5.0 on 2026-10-18 21:18
+
+from django.db import migrations, models
+
+# Wakes the outbox relay (LISTEN core_outbox) when a transaction that wrote
+# outbox rows commits; NOTIFY is delivered at commit and deduplicated.
+CREATE_NOTIFY_TRIGGER = '''
+    CREATE FUNCTION core_outboxmessage_notify() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('core_outbox', '');
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER core_outboxmessage_notify
+        AFTER INSERT ON core_outboxmessage
+        FOR EACH STATEMENT EXECUTE FUNCTION core_outboxmessage_notify();
+'''
+
+DROP_NOTIFY_TRIGGER = '''
+    DROP TRIGGER core_outboxmessage_notify ON core_outboxmessage;
+    DROP FUNCTION core_outboxmessage_notify();
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_outgoing_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_name', models.CharField(max_length=255)),
+                ('args', models.JSONField(default=list)),
+                ('kwargs', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('sent_at__isnull', True)), fields=['id'], name='outboxmessage_pending_idx')],
+            },
+        ),
+        migrations.RunSQL(CREATE_NOTIFY_TRIGGER, DROP_NOTIFY_TRIGGER),
+    ]
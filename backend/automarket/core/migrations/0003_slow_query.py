@@ -0,0 +1,31 @@
+# Generated by Django 5.0 on 2026-10-18 22:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_outbox_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('captured_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('duration', models.FloatField(help_text='Milliseconds.')),
+                ('origin', models.CharField(max_length=255)),
+                ('fingerprint', models.CharField(db_index=True, max_length=16)),
+                ('normalized_sql', models.TextField()),
+                ('sql', models.TextField()),
+                ('plan', models.TextField(blank=True)),
+                ('failed', models.BooleanField(default=False)),
+            ],
+            options={
+                'verbose_name_plural': 'slow queries',
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class BaseModel(models.Model):
@@ -6,4 +7,93 @@ class BaseModel(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        abstract = True
\ No newline at end of file
+        abstract = True
+
+
+class OutgoingEmail(models.Model):
+    """A queued email, sent in batches by ``core.mail.dispatch_pending_emails``."""
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=998)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    to = models.JSONField(default=list)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at', 'id'],
+                condition=models.Q(status='pending'),
+                name='outgoingemail_due_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} to {", ".join(self.to)} ({self.status})'
+
+
+class OutboxMessage(models.Model):
+    """
+    A Celery task to publish once the transaction that wrote it commits.
+
+    Rows are written through ``core.outbox.enqueue_task`` and published in
+    order by the outbox relay.
+    """
+
+    task_name = models.CharField(max_length=255)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['id'],
+                condition=models.Q(sent_at__isnull=True),
+                name='outboxmessage_pending_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.task_name} #{self.pk}'
+
+
+class SlowQuery(models.Model):
+    """
+    A statement slower than ``SLOW_QUERY_THRESHOLD``, captured by
+    ``core.inspector``.
+
+    Only the latest ``SLOW_QUERY_LOG_SIZE`` rows are kept.
+    """
+
+    captured_at = models.DateTimeField(default=timezone.now)
+    duration = models.FloatField(help_text='Milliseconds.')
+    origin = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=16, db_index=True)
+    normalized_sql = models.TextField()
+    sql = models.TextField()
+    plan = models.TextField(blank=True)
+    failed = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name_plural = 'slow queries'
+
+    def __str__(self):
+        return f'{self.duration:.0f} ms from {self.origin} [{self.fingerprint}]'
@@ -0,0 +1,112 @@
+import select
+from contextlib import nullcontext
+from datetime import timedelta
+
+from celery import current_app
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+# Channel the insert trigger notifies (see migration 0002_outbox_message).
+OUTBOX_CHANNEL = 'core_outbox'
+
+RELAY_BATCH_SIZE = 500
+
+# Published rows are kept this long for inspection, then pruned.
+OUTBOX_RETENTION = timedelta(days=1)
+
+
+def enqueue_task(task, *args, **kwargs):
+    """
+    Record ``task`` to be published once the current transaction commits.
+
+    The row commits or rolls back with the caller's changes, so a worker
+    never runs a task for data it cannot see yet, and the request never
+    waits on the broker. Arguments must be JSON-serializable. Delivery is
+    at least once.
+    """
+    return OutboxMessage.objects.create(
+        task_name=task.name, args=list(args), kwargs=kwargs
+    )
+
+
+def _producer(app):
+    # Eager tasks (tests, local runs) execute inline and need no broker.
+    if app.conf.task_always_eager:
+        return nullcontext()
+    return app.producer_or_acquire()
+
+
+def relay_outbox(batch_size=RELAY_BATCH_SIZE):
+    """
+    Publish unsent outbox rows in id order and mark them sent.
+
+    Each batch is locked with ``SKIP LOCKED``, so relays may run side by
+    side, and published over one broker connection. When publishing fails
+    part-way, the rows already published are still marked before the error
+    propagates. Returns the number of rows published.
+    """
+    app = current_app
+    relayed = 0
+    while True:
+        error = None
+        with transaction.atomic():
+            rows = list(
+                OutboxMessage.objects.select_for_update(skip_locked=True)
+                .filter(sent_at__isnull=True)
+                .order_by('id')[:batch_size]
+            )
+            published = []
+            with _producer(app) as producer:
+                for row in rows:
+                    try:
+                        app.tasks[row.task_name].apply_async(
+                            row.args, row.kwargs, producer=producer
+                        )
+                    except Exception as exc:
+                        error = exc
+                        break
+                    published.append(row.id)
+            if published:
+                OutboxMessage.objects.filter(id__in=published).update(
+                    sent_at=timezone.now()
+                )
+        relayed += len(published)
+        if error is not None:
+            raise error
+        if len(rows) < batch_size:
+            return relayed
+
+
+def prune_outbox(retention=OUTBOX_RETENTION):
+    deleted, _ = OutboxMessage.objects.filter(
+        sent_at__lt=timezone.now() - retention
+    ).delete()
+    return deleted
+
+
+class OutboxListener:
+    """
+    Wait for outbox inserts through PostgreSQL LISTEN/NOTIFY.
+
+    Uses the default database connection and must be used outside a
+    transaction. Listening restarts if Django reconnects.
+    """
+
+    def __init__(self):
+        self.raw = None
+
+    def wait(self, timeout):
+        """Block until an outbox insert commits or ``timeout`` seconds pass."""
+        connection.ensure_connection()
+        if connection.connection is not self.raw:
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {OUTBOX_CHANNEL}')
+            self.raw = connection.connection
+        if not self.raw.notifies:
+            select.select([self.raw], [], [], timeout)
+            self.raw.poll()
+        notified = bool(self.raw.notifies)
+        self.raw.notifies.clear()
+        return notified
@@ -0,0 +1,148 @@
+import base64
+import datetime
+import decimal
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a unique ordering.
+
+    The cursor is an opaque token holding the ordering values of the last
+    row of the page, so every page is an index range scan no matter how deep
+    it is, and no COUNT(*) is issued. Rows inserted while a client is paging
+    never shift or duplicate the rows it has not seen yet.
+
+    All ordering fields must share one direction and the last one must be
+    unique (usually ``id``).
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor.'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, page_size = self.seek(queryset, request, view)
+        return self.set_page(list(queryset[:page_size + 1]), page_size)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset()`` through the async ORM."""
+        queryset, page_size = self.seek(queryset, request, view)
+        rows = [row async for row in queryset[:page_size + 1]]
+        return self.set_page(rows, page_size)
+
+    def seek(self, queryset, request, view):
+        """Return ``queryset`` ordered and past the cursor, and the page size."""
+        self.request = request
+        self.ordering = getattr(view, 'keyset_ordering', self.ordering)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.get_seek_filter(position))
+        return queryset, self.get_page_size(request)
+
+    def set_page(self, rows, page_size):
+        # ``rows`` holds one row past the page, if there is one.
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        values = [getattr(last, name) for name in self.field_names]
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(values)
+        )
+
+    @property
+    def field_names(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    @property
+    def descending(self):
+        return self.ordering[0].startswith('-')
+
+    def get_seek_filter(self, position):
+        """
+        Build ``(f1, f2, ...) < (v1, v2, ...)`` (or ``>``) as Q objects.
+
+        The leading ``f1 <= v1`` term gives the planner an index range
+        condition; the OR chain then only breaks ties inside it.
+        """
+        op = 'lt' if self.descending else 'gt'
+        names = self.field_names
+        seek = Q()
+        for index, name in enumerate(names):
+            equal = {names[i]: position[i] for i in range(index)}
+            seek |= Q(**equal, **{f'{name}__{op}': position[index]})
+        return Q(**{f'{names[0]}__{op}e': position[0]}) & seek
+
+    @staticmethod
+    def encode_cursor(values):
+        payload = json.dumps(
+            values, default=_cursor_default, separators=(',', ':')
+        )
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            padding = '=' * (-len(encoded) % 4)
+            values = json.loads(base64.urlsafe_b64decode(encoded + padding))
+            if len(values) != len(self.field_names):
+                raise ValueError
+            return [
+                self.to_python(model, name, value)
+                for name, value in zip(self.field_names, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def to_python(model, name, value):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations used for ordering (rank, distance, ...) are numeric.
+            return float(value)
+        return field.to_python(value)
+
+
+def _cursor_default(value):
+    # Unlike DjangoJSONEncoder, keep full microsecond precision: a truncated
+    # timestamp would make the seek skip rows created in the same millisecond.
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} is not cursor serializable')
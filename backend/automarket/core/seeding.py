@@ -0,0 +1,705 @@
+"""
+Fast synthetic data for benchmark and test databases.
+
+Brands and locations come from small built-in catalogs and are created
+through the ORM. Users, listings with their insurance and images, and
+favorites are generated in worker processes and streamed into PostgreSQL
+with ``COPY``, one chunk per transaction. Every chunk draws from its own
+random generator seeded with ``(seed, table, chunk)``, so a given seed
+produces the same rows whatever the number of processes.
+
+Primary keys of users and listings are reserved from their sequences up
+front, which lets workers write foreign keys without a round-trip.
+Secondary indexes and foreign keys of the loaded tables are dropped for the
+duration of the load and rebuilt afterwards, in parallel, which is much
+faster than maintaining them row by row. The database must not be in use
+by anything else meanwhile.
+"""
+import io
+import multiprocessing
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections, transaction
+
+from carlisting.cache import invalidate_feed
+from carlisting.geo import encode_geohash
+from carlisting.lookups import brand_lookup, location_lookup
+from carlisting.models import Brand, CarImage, CarListing, InsuranceInfo, Location
+from users.models import Favorite
+
+# Name, country, founding year, headquarters, price factor and models, in
+# rough order of popularity on the used car market.
+BRANDS = [
+    ('Volkswagen', 'Germany', 1937, 'Wolfsburg', 1.0,
+     ('Golf', 'Passat', 'Tiguan', 'Polo', 'Touareg')),
+    ('Toyota', 'Japan', 1937, 'Toyota City', 1.1,
+     ('Corolla', 'Camry', 'RAV4', 'Yaris', 'Land Cruiser')),
+    ('Renault', 'France', 1899, 'Boulogne Billancourt', 0.8,
+     ('Megane', 'Logan', 'Duster', 'Clio', 'Kangoo')),
+    ('Skoda', 'Czech Republic', 1895, 'Mlada Boleslav', 0.85,
+     ('Octavia', 'Fabia', 'Superb', 'Kodiaq')),
+    ('BMW', 'Germany', 1916, 'Munich', 1.6, ('X5', '320', '520', 'X3')),
+    ('Audi', 'Germany', 1909, 'Ingolstadt', 1.5, ('A4', 'A6', 'Q5', 'Q7')),
+    ('Mercedes-Benz', 'Germany', 1926, 'Stuttgart', 1.7,
+     ('E200', 'C180', 'GLE', 'Sprinter')),
+    ('Hyundai', 'South Korea', 1967, 'Seoul', 0.85,
+     ('Tucson', 'Elantra', 'Accent', 'Santa Fe')),
+    ('Ford', 'United States', 1903, 'Dearborn', 0.9,
+     ('Focus', 'Fiesta', 'Kuga', 'Mondeo')),
+    ('Kia', 'South Korea', 1944, 'Seoul', 0.85,
+     ('Sportage', 'Rio', 'Ceed', 'Sorento')),
+    ('Nissan', 'Japan', 1933, 'Yokohama', 0.9,
+     ('Qashqai', 'Leaf', 'Juke', 'X-Trail')),
+    ('Chevrolet', 'United States', 1911, 'Detroit', 0.85,
+     ('Aveo', 'Lacetti', 'Cruze', 'Volt')),
+    ('Opel', 'Germany', 1862, 'Russelsheim', 0.8,
+     ('Astra', 'Vectra', 'Insignia', 'Zafira')),
+    ('Mazda', 'Japan', 1920, 'Hiroshima', 0.95,
+     ('CX-5', 'Mazda3', 'Mazda6', 'CX-30')),
+    ('Mitsubishi', 'Japan', 1970, 'Tokyo', 0.9,
+     ('Outlander', 'Lancer', 'Pajero', 'ASX')),
+    ('Honda', 'Japan', 1948, 'Tokyo', 1.0, ('Civic', 'Accord', 'CR-V', 'Jazz')),
+    ('Peugeot', 'France', 1810, 'Sochaux', 0.85,
+     ('308', '3008', '208', 'Partner')),
+    ('Daewoo', 'South Korea', 1967, 'Seoul', 0.5,
+     ('Lanos', 'Nexia', 'Matiz', 'Sens')),
+    ('Volvo', 'Sweden', 1927, 'Gothenburg', 1.3, ('XC90', 'XC60', 'S60', 'V40')),
+    ('Lexus', 'Japan', 1989, 'Nagoya', 1.6, ('RX', 'NX', 'ES', 'LX')),
+    ('Dacia', 'Romania', 1966, 'Mioveni', 0.7,
+     ('Logan', 'Sandero', 'Duster', 'Spring')),
+    ('Subaru', 'Japan', 1953, 'Tokyo', 1.0,
+     ('Forester', 'Outback', 'Impreza', 'XV')),
+    ('Citroen', 'France', 1919, 'Saint Ouen', 0.8,
+     ('C4', 'Berlingo', 'C5', 'C3')),
+    ('Fiat', 'Italy', 1899, 'Turin', 0.75, ('Doblo', 'Punto', 'Tipo', '500')),
+    ('Tesla', 'United States', 2003, 'Austin', 1.8,
+     ('Model 3', 'Model Y', 'Model S', 'Model X')),
+    ('Jeep', 'United States', 1941, 'Toledo', 1.2,
+     ('Grand Cherokee', 'Compass', 'Renegade', 'Wrangler')),
+    ('Suzuki', 'Japan', 1909, 'Hamamatsu', 0.8,
+     ('Vitara', 'Swift', 'Jimny', 'SX4')),
+    ('Seat', 'Spain', 1950, 'Martorell', 0.85,
+     ('Leon', 'Ibiza', 'Ateca', 'Toledo')),
+    ('Land Rover', 'United Kingdom', 1948, 'Gaydon', 2.0,
+     ('Range Rover', 'Discovery', 'Defender', 'Evoque')),
+    ('Porsche', 'Germany', 1931, 'Stuttgart', 2.5,
+     ('Cayenne', 'Macan', 'Panamera', '911')),
+]
+
+ELECTRIC_BRANDS = {'Tesla'}
+
+# City, region, postal code, latitude and longitude, largest first.
+CITIES = [
+    ('Kyiv', 'Kyiv', '01001', 50.4501, 30.5234),
+    ('Kharkiv', 'Kharkiv Oblast', '61000', 49.9935, 36.2304),
+    ('Odesa', 'Odesa Oblast', '65000', 46.4825, 30.7233),
+    ('Dnipro', 'Dnipropetrovsk Oblast', '49000', 48.4647, 35.0462),
+    ('Zaporizhzhia', 'Zaporizhzhia Oblast', '69000', 47.8388, 35.1396),
+    ('Lviv', 'Lviv Oblast', '79000', 49.8397, 24.0297),
+    ('Kryvyi Rih', 'Dnipropetrovsk Oblast', '50000', 47.9105, 33.3918),
+    ('Mykolaiv', 'Mykolaiv Oblast', '54000', 46.9750, 31.9946),
+    ('Vinnytsia', 'Vinnytsia Oblast', '21000', 49.2331, 28.4682),
+    ('Poltava', 'Poltava Oblast', '36000', 49.5883, 34.5514),
+    ('Chernihiv', 'Chernihiv Oblast', '14000', 51.4982, 31.2893),
+    ('Cherkasy', 'Cherkasy Oblast', '18000', 49.4444, 32.0598),
+    ('Khmelnytskyi', 'Khmelnytskyi Oblast', '29000', 49.4230, 26.9871),
+    ('Chernivtsi', 'Chernivtsi Oblast', '58000', 48.2921, 25.9358),
+    ('Zhytomyr', 'Zhytomyr Oblast', '10000', 50.2547, 28.6587),
+    ('Sumy', 'Sumy Oblast', '40000', 50.9077, 34.7981),
+    ('Rivne', 'Rivne Oblast', '33000', 50.6199, 26.2516),
+    ('Ivano-Frankivsk', 'Ivano-Frankivsk Oblast', '76000', 48.9226, 24.7111),
+    ('Ternopil', 'Ternopil Oblast', '46000', 49.5535, 25.5948),
+    ('Lutsk', 'Volyn Oblast', '43000', 50.7472, 25.3254),
+    ('Kropyvnytskyi', 'Kirovohrad Oblast', '25000', 48.5079, 32.2623),
+    ('Uzhhorod', 'Zakarpattia Oblast', '88000', 48.6208, 22.2879),
+    ('Kremenchuk', 'Poltava Oblast', '39600', 49.0659, 33.4204),
+    ('Bila Tserkva', 'Kyiv Oblast', '09100', 49.7968, 30.1311),
+    ('Kamianske', 'Dnipropetrovsk Oblast', '51900', 48.5132, 34.6031),
+    ('Kherson', 'Kherson Oblast', '73000', 46.6354, 32.6169),
+    ('Brovary', 'Kyiv Oblast', '07400', 50.5112, 30.7903),
+    ('Mukachevo', 'Zakarpattia Oblast', '89600', 48.4393, 22.7176),
+    ('Kovel', 'Volyn Oblast', '45000', 51.2155, 24.7117),
+    ('Berdychiv', 'Zhytomyr Oblast', '13300', 49.8993, 28.6010),
+]
+
+FIRST_NAMES = [
+    'Oleksandr', 'Andrii', 'Dmytro', 'Serhii', 'Olena', 'Iryna', 'Natalia',
+    'Mykola', 'Yulia', 'Viktor', 'Oksana', 'Taras', 'Kateryna', 'Maksym',
+    'Anna', 'Ivan', 'Svitlana', 'Bohdan', 'Tetiana', 'Yurii',
+]
+LAST_NAMES = [
+    'Kovalenko', 'Bondarenko', 'Tkachenko', 'Shevchenko', 'Kravchenko',
+    'Boiko', 'Melnyk', 'Oliinyk', 'Lysenko', 'Moroz', 'Savchenko', 'Rudenko',
+    'Marchenko', 'Petrenko', 'Klymenko', 'Pavlenko', 'Ponomarenko',
+    'Kovalchuk', 'Tkachuk', 'Polishchuk',
+]
+
+# Categorical columns with their relative frequencies.
+ENGINE_TYPES = (('Gasoline', 'Diesel', 'Hybrid', 'Electric'), (50, 30, 12, 8))
+TRANSMISSIONS = (('Automatic', 'Manual'), (60, 40))
+BODY_TYPES = (
+    ('Sedan', 'SUV', 'Hatchback', 'Wagon', 'Coupe', 'Minivan'),
+    (30, 30, 18, 12, 5, 5),
+)
+COLORS = (
+    ('Black', 'White', 'Grey', 'Silver', 'Blue', 'Red', 'Green'),
+    (22, 20, 18, 15, 12, 9, 4),
+)
+ACCIDENT_DETAILS = (
+    'Scratched rear bumper', 'Replaced front fender', 'Minor side impact',
+    'Repainted hood', 'Cracked windshield replaced',
+)
+
+# A new car of price factor 1, depreciating by this much a year.
+BASE_PRICE = 30000
+YEARLY_DEPRECIATION = 0.87
+MAX_AGE = 35
+
+DEFAULTS = {
+    'brands': len(BRANDS),
+    'locations': len(CITIES),
+    'min_images': 1,
+    'max_images': 8,
+    'favorites_per_user': 10,
+    'brand_skew': 1.0,
+    'location_skew': 1.0,
+    'seller_skew': 0.8,
+    'sold_ratio': 0.1,
+    'hidden_ratio': 0.02,
+    'paid_ratio': 0.05,
+    'unverified_ratio': 0.05,
+    'days': 365,
+    'username_prefix': '',
+    'password': 'seed-password',
+    'seed': 0,
+    'chunk_size': 20000,
+}
+
+USER_COLUMNS = (
+    'id', 'password', 'last_login', 'is_superuser', 'username', 'first_name',
+    'last_name', 'email', 'is_staff', 'is_active', 'date_joined',
+    'phone_number', 'is_verified',
+)
+LISTING_COLUMNS = (
+    'id', 'user_id', 'brand_id', 'location_id', 'title', 'description',
+    'price', 'model', 'year', 'mileage', 'engine_type', 'transmission',
+    'body_type', 'color', 'is_sold', 'paid', 'is_hidden', 'search_vector',
+    'created_at', 'updated_at',
+)
+INSURANCE_COLUMNS = (
+    'car_listing_id', 'insurance_start_date', 'insurance_end_date',
+    'owner_count', 'accident_count', 'accident_details', 'created_at',
+    'updated_at',
+)
+IMAGE_COLUMNS = ('car_listing_id', 'image_url', 'created_at', 'updated_at')
+FAVORITE_COLUMNS = ('user_id', 'car_listing_id', 'created_at')
+
+
+# COPY's text format; generated values never contain tabs, newlines or
+# backslashes, so they need no escaping.
+NULL = '\\N'
+
+DAY = 86400
+YEAR = 365 * DAY
+
+# Memory for each index rebuild after the load.
+MAINTENANCE_WORK_MEM = '512MB'
+
+# The worker's plan, set by _prepare().
+_plan = None
+
+
+def seed(listings=0, users=0, seller_ids=(), processes=1, defer_indexes=True,
+         vacuum=True, stdout=None, **options):
+    """
+    Add ``users`` users and ``listings`` listings with their insurance,
+    images and favorites, generated in ``processes`` processes.
+
+    Listings are sold by the new verified users and by ``seller_ids``; the
+    new users favorite listings created in the same run. ``options``
+    override ``DEFAULTS``: catalog sizes, the Zipf exponents that skew
+    listings towards popular brands, big cities and a few dealers, image
+    and favorite counts, and the share of sold, hidden, paid and unverified
+    rows. Returns the number of rows added per table.
+    """
+    unknown = set(options) - set(DEFAULTS)
+    if unknown:
+        raise TypeError(f'Unknown seed options: {", ".join(sorted(unknown))}')
+    options = {**DEFAULTS, **options}
+    verified_users = users - round(users * options['unverified_ratio'])
+    if listings and not (verified_users or seller_ids):
+        raise ValueError('Listings need sellers: pass users or seller_ids.')
+
+    User = get_user_model()
+    brands = get_brands(options['brands'])
+    plan = {
+        **options,
+        'brand_choices': [
+            (brand.pk, brand.name, factor, models)
+            for brand, (*_, factor, models) in zip(
+                brands, brand_catalog(options['brands'])
+            )
+        ],
+        'location_ids': [
+            location.pk for location in get_locations(options['locations'])
+        ],
+        'user_start': reserve_ids(User, users),
+        'users': users,
+        'verified_users': verified_users,
+        'seller_ids': list(seller_ids),
+        'listing_start': reserve_ids(CarListing, listings),
+        'listings': listings,
+        'password': make_password(options['password']),
+        'now': time.time(),
+    }
+    phases = [('users', users), ('listings', listings)]
+    if listings and options['favorites_per_user']:
+        phases.append(('favorites', verified_users))
+    tables = [
+        User._meta.db_table, CarListing._meta.db_table,
+        InsuranceInfo._meta.db_table, CarImage._meta.db_table,
+        Favorite._meta.db_table,
+    ]
+    totals = dict.fromkeys(
+        ('users', 'listings', 'insurance', 'images', 'favorites'), 0
+    )
+
+    started = time.perf_counter()
+    deferred = drop_deferrable(tables) if defer_indexes else []
+    try:
+        with _pool(processes, plan) as pool_map:
+            for kind, count in phases:
+                chunks = _chunks(kind, count, options['chunk_size'])
+                for rows in pool_map(_copy_chunk, chunks):
+                    for table, added in rows.items():
+                        totals[table] += added
+                _report(
+                    stdout, f'Seeded {totals[kind]} {kind} '
+                            f'({time.perf_counter() - started:.0f}s)'
+                )
+    finally:
+        if deferred:
+            _report(stdout, f'Rebuilding {len(deferred)} indexes and foreign keys')
+            try:
+                restore_deferred(deferred, processes)
+            except Exception:
+                _report(stdout, 'Rebuild failed; the statements were:')
+                _report(stdout, ';\n'.join(deferred))
+                raise
+    _report(stdout, f'Loaded in {time.perf_counter() - started:.0f}s')
+
+    if vacuum:
+        with connection.cursor() as cursor:
+            for table in tables:
+                cursor.execute(
+                    f'VACUUM (ANALYZE) {connection.ops.quote_name(table)}'
+                )
+    # COPY bypasses the signals that keep the feed cache fresh.
+    invalidate_feed()
+    return totals
+
+
+def brand_catalog(count):
+    """The first ``count`` brands: the built-in ones, then synthetic ones."""
+    return BRANDS[:count] + [
+        (f'Marque {number}', 'Nowhere', 2000, 'Nowhere', 1.0,
+         ('One', 'Two', 'Three'))
+        for number in range(len(BRANDS) + 1, count + 1)
+    ]
+
+
+def location_catalog(count):
+    """The first ``count`` locations: the cities, then districts around them."""
+    catalog = list(CITIES[:count])
+    for number in range(len(CITIES), count):
+        city, region, postal_code, latitude, longitude = CITIES[
+            number % len(CITIES)
+        ]
+        rng = random.Random(f'location:{number}')
+        catalog.append((
+            f'{city} District {number // len(CITIES)}', region, postal_code,
+            latitude + rng.uniform(-0.3, 0.3),
+            longitude + rng.uniform(-0.4, 0.4),
+        ))
+    return catalog
+
+
+def get_brands(count):
+    """Get or create the first ``count`` catalog brands, in catalog order."""
+    catalog = brand_catalog(count)
+    names = [name for name, *_ in catalog]
+    existing = set(
+        Brand.objects.filter(name__in=names).values_list('name', flat=True)
+    )
+    missing = []
+    for name, country, established, headquarters, _, _ in catalog:
+        if name in existing:
+            continue
+        slug = name.lower().replace(' ', '-')
+        missing.append(Brand(
+            name=name,
+            origin_country=country,
+            established_year=established,
+            logo_url=f'https://cdn.example.com/brands/{slug}.png',
+            description=f'{name} is a car maker from {country}, '
+                        f'founded in {established}.',
+            website=f'https://www.{slug}.com',
+            headquarters=headquarters,
+        ))
+    if missing:
+        # bulk_create() sends no post_save, which would invalidate these.
+        Brand.objects.bulk_create(missing)
+        brand_lookup.invalidate()
+    # Like the lookup, the oldest row wins duplicate names.
+    by_name = {
+        brand.name: brand
+        for brand in Brand.objects.filter(name__in=names).order_by('-id')
+    }
+    return [by_name[name] for name in names]
+
+
+def get_locations(count):
+    """Get or create the first ``count`` catalog locations, in catalog order."""
+    catalog = location_catalog(count)
+    cities = [city for city, *_ in catalog]
+    existing = set(
+        Location.objects.filter(city__in=cities).values_list('city', flat=True)
+    )
+    missing = [
+        Location(
+            city=city,
+            region=region,
+            country='Ukraine',
+            postal_code=postal_code,
+            time_zone='Europe/Kyiv',
+            description=f'{city}, {region}.',
+            latitude=latitude,
+            longitude=longitude,
+            geohash=encode_geohash(latitude, longitude),
+        )
+        for city, region, postal_code, latitude, longitude in catalog
+        if city not in existing
+    ]
+    if missing:
+        Location.objects.bulk_create(missing)
+        location_lookup.invalidate()
+    by_city = {
+        location.city: location
+        for location in Location.objects.filter(city__in=cities).order_by('-id')
+    }
+    return [by_city[city] for city in cities]
+
+
+def reserve_ids(model, count):
+    """
+    Take ``count`` consecutive primary keys from the model's sequence and
+    return the first.
+    """
+    if not count:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT setval(seq::regclass, nextval(seq::regclass) + %s - 1) '
+            'FROM pg_get_serial_sequence(%s, %s) AS seq',
+            [
+                count, connection.ops.quote_name(model._meta.db_table),
+                model._meta.pk.column,
+            ]
+        )
+        return cursor.fetchone()[0] - count + 1
+
+
+def drop_deferrable(tables):
+    """
+    Drop the foreign keys and the indexes that back no constraint on
+    ``tables``; return the statements that recreate them.
+
+    Primary keys and unique constraints stay, so the load cannot introduce
+    duplicates.
+    """
+    tables = [connection.ops.quote_name(table) for table in tables]
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+            FROM pg_index AS i
+            WHERE i.indrelid = ANY(%s::regclass[])
+            AND NOT EXISTS (
+                SELECT 1 FROM pg_constraint AS c
+                WHERE c.conindid = i.indexrelid AND c.conrelid = i.indrelid
+            )
+        ''', [tables])
+        indexes = cursor.fetchall()
+        cursor.execute('''
+            SELECT conrelid::regclass::text, quote_ident(conname),
+                pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE contype = 'f' AND conrelid = ANY(%s::regclass[])
+        ''', [tables])
+        foreign_keys = cursor.fetchall()
+
+        for table, name, _ in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT {name}')
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {name}')
+    return [definition for _, definition in indexes] + [
+        f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}'
+        for table, name, definition in foreign_keys
+    ]
+
+
+def restore_deferred(statements, processes=1):
+    """
+    Run the statements from ``drop_deferrable()``: the index builds in
+    parallel, then the foreign keys, each validated with a single scan.
+    """
+    indexes = [s for s in statements if not s.startswith('ALTER TABLE')]
+    with _pool(processes) as pool_map:
+        list(pool_map(_execute, indexes))
+    for statement in statements:
+        if statement.startswith('ALTER TABLE'):
+            _execute(statement)
+
+
+def search_vector(title, description):
+    """
+    The ``tsvector`` that ``carlisting.search.search_vector_for()`` builds,
+    in its text form, for the words, numbers and hyphenated names generated
+    here.
+    """
+    positions = {}
+    position = 0
+    for text, weight in ((title, 'A'), (description, 'B')):
+        for token in _tokens(text):
+            position += 1
+            positions.setdefault(token, []).append(f'{position}{weight}')
+    return ' '.join(
+        f"'{token}':{','.join(found)}" for token, found in positions.items()
+    )
+
+
+def _tokens(text):
+    # The default parser emits a hyphenated word whole, then its parts,
+    # except that a number after the hyphen is read as a negative one.
+    for word in text.lower().split():
+        word = word.strip('.,')
+        head, _, number = word.rpartition('-')
+        if head and number.isdigit():
+            yield head
+            yield f'-{number}'
+        elif '-' in word:
+            yield word
+            yield from (part for part in word.split('-') if part)
+        elif word:
+            yield word
+
+
+@contextmanager
+def _pool(processes, plan=None):
+    """Yield a ``map()`` over ``processes`` forked workers, or this process."""
+    if processes <= 1:
+        _prepare(plan)
+        yield map
+        return
+    # Children must open their own connections.
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    with context.Pool(processes, initializer=_prepare, initargs=(plan,)) as pool:
+        yield pool.imap_unordered
+
+
+def _prepare(plan):
+    global _plan
+    if plan is None:
+        return
+    sellers = list(range(
+        plan['user_start'], plan['user_start'] + plan['verified_users']
+    )) + plan['seller_ids']
+    _plan = {
+        **plan,
+        'brand_weights': _zipf(len(plan['brand_choices']), plan['brand_skew']),
+        'location_weights': _zipf(
+            len(plan['location_ids']), plan['location_skew']
+        ),
+        'sellers': sellers,
+        'seller_weights': _zipf(len(sellers), plan['seller_skew']),
+    }
+
+
+def _zipf(count, skew):
+    """Cumulative weights giving rank ``n`` a share proportional to n^-skew."""
+    return list(accumulate(rank ** -skew for rank in range(1, count + 1)))
+
+
+def _chunks(kind, count, chunk_size):
+    return [
+        (kind, number, offset, min(chunk_size, count - offset))
+        for number, offset in enumerate(range(0, count, chunk_size))
+    ]
+
+
+def _copy_chunk(chunk):
+    kind, number, offset, count = chunk
+    rng = random.Random(f'{_plan["seed"]}:{kind}:{number}')
+    tables = _GENERATORS[kind](rng, offset, count)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for _, table, columns, lines in tables:
+            cursor.copy_expert(
+                f'COPY {connection.ops.quote_name(table)} '
+                f'({", ".join(columns)}) FROM STDIN',
+                io.StringIO(''.join(lines)),
+            )
+    return {name: len(lines) for name, _, _, lines in tables}
+
+
+def _execute(statement):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SET maintenance_work_mem = '{MAINTENANCE_WORK_MEM}'")
+        cursor.execute(statement)
+
+
+def _user_rows(rng, offset, count):
+    plan = _plan
+    now = plan['now']
+    lines = []
+    for user_id in range(
+        plan['user_start'] + offset, plan['user_start'] + offset + count
+    ):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        username = f'{plan["username_prefix"]}{first}.{last}{user_id}'.lower()
+        joined = now - rng.random() * 3 * YEAR
+        # The last ids are registrations that were never confirmed.
+        verified = user_id < plan['user_start'] + plan['verified_users']
+        last_login = (
+            _timestamp(joined + rng.random() * (now - joined)) if verified
+            else NULL
+        )
+        lines.append(_line(
+            user_id, plan['password'], last_login, 'f', username, first, last,
+            f'{username}@example.com', 'f', _flag(verified), _timestamp(joined),
+            f'+380{rng.randrange(10 ** 9):09d}', _flag(verified),
+        ))
+    return [('users', get_user_model()._meta.db_table, USER_COLUMNS, lines)]
+
+
+def _listing_rows(rng, offset, count):
+    plan = _plan
+    now = plan['now']
+    current_year = datetime.fromtimestamp(now, dt_timezone.utc).year
+    start = plan['listing_start'] + offset
+    brands = rng.choices(
+        plan['brand_choices'], cum_weights=plan['brand_weights'], k=count
+    )
+    location_ids = rng.choices(
+        plan['location_ids'], cum_weights=plan['location_weights'], k=count
+    )
+    seller_ids = rng.choices(
+        plan['sellers'], cum_weights=plan['seller_weights'], k=count
+    )
+    engine_types = rng.choices(*ENGINE_TYPES, k=count)
+    transmissions = rng.choices(*TRANSMISSIONS, k=count)
+    body_types = rng.choices(*BODY_TYPES, k=count)
+    colors = rng.choices(*COLORS, k=count)
+
+    listings, insurance, images = [], [], []
+    for i in range(count):
+        listing_id = start + i
+        brand_id, brand_name, price_factor, models = brands[i]
+        engine_type = (
+            'Electric' if brand_name in ELECTRIC_BRANDS else engine_types[i]
+        )
+        model = rng.choice(models)
+        age = min(int(rng.expovariate(1 / 7)), MAX_AGE)
+        year = current_year - age
+        mileage = max(int((age + rng.random()) * rng.gauss(15000, 5000)), 0)
+        price = max(500, round(
+            BASE_PRICE * price_factor * YEARLY_DEPRECIATION ** age
+            * rng.lognormvariate(0, 0.2), -2
+        ))
+        title = f'{brand_name} {model} {year}'
+        description = (
+            f'{colors[i]} {body_types[i].lower()}, {engine_type.lower()} engine, '
+            f'{transmissions[i].lower()} transmission, {mileage} km.'
+        )
+        created = now - rng.random() * plan['days'] * DAY
+        created_at = _timestamp(created)
+        listings.append(_line(
+            listing_id, seller_ids[i], brand_id, location_ids[i], title,
+            description, f'{price:.2f}', model, year, mileage, engine_type,
+            transmissions[i], body_types[i], colors[i],
+            _flag(rng.random() < plan['sold_ratio']),
+            _flag(rng.random() < plan['paid_ratio']),
+            _flag(rng.random() < plan['hidden_ratio']),
+            search_vector(title, description), created_at, created_at,
+        ))
+
+        accidents = 0 if rng.random() < 0.75 else 1 + int(rng.expovariate(1))
+        insured = created - rng.random() * YEAR
+        insurance.append(_line(
+            listing_id, _timestamp(insured), _timestamp(insured + YEAR),
+            1 + min(int(rng.expovariate(1)), 5), accidents,
+            rng.choice(ACCIDENT_DETAILS) if accidents else 'None',
+            created_at, created_at,
+        ))
+
+        for number in range(rng.randint(plan['min_images'], plan['max_images'])):
+            images.append(_line(
+                listing_id,
+                f'https://cdn.example.com/listings/{listing_id}/{number}.jpg',
+                created_at, created_at,
+            ))
+    return [
+        ('listings', CarListing._meta.db_table, LISTING_COLUMNS, listings),
+        ('insurance', InsuranceInfo._meta.db_table, INSURANCE_COLUMNS, insurance),
+        ('images', CarImage._meta.db_table, IMAGE_COLUMNS, images),
+    ]
+
+
+def _favorite_rows(rng, offset, count):
+    plan = _plan
+    now = plan['now']
+    listing_ids = range(
+        plan['listing_start'], plan['listing_start'] + plan['listings']
+    )
+    lines = []
+    for user_id in range(
+        plan['user_start'] + offset, plan['user_start'] + offset + count
+    ):
+        favorites = min(
+            int(rng.expovariate(1 / plan['favorites_per_user'])),
+            len(listing_ids)
+        )
+        for listing_id in rng.sample(listing_ids, favorites):
+            lines.append(_line(
+                user_id, listing_id, _timestamp(now - rng.random() * 30 * DAY)
+            ))
+    return [('favorites', Favorite._meta.db_table, FAVORITE_COLUMNS, lines)]
+
+
+_GENERATORS = {
+    'users': _user_rows,
+    'listings': _listing_rows,
+    'favorites': _favorite_rows,
+}
+
+
+def _line(*values):
+    return '\t'.join(map(str, values)) + '\n'
+
+
+def _flag(value):
+    return 't' if value else 'f'
+
+
+def _timestamp(epoch):
+    return datetime.fromtimestamp(epoch, dt_timezone.utc).isoformat(' ')
+
+
+def _report(stdout, message):
+    if stdout is not None:
+        stdout.write(message)
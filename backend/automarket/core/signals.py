@@ -0,0 +1,69 @@
+import time
+from datetime import datetime
+
+from celery.signals import (
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+    worker_process_shutdown,
+)
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import inspector, metrics
+
+# Tasks running in this process: start time, query stats and their token.
+_running = {}
+
+
+@receiver(connection_created)
+def install_query_wrappers(sender, connection, **kwargs):
+    metrics.install_query_counter(connection)
+    if settings.SLOW_QUERY_THRESHOLD:
+        inspector.install(connection)
+
+
+@before_task_publish.connect
+def stamp_publish_time(headers=None, **kwargs):
+    # Workers copy custom headers onto task.request.
+    headers['published_at'] = time.time()
+
+
+@task_prerun.connect
+def start_task_metrics(task_id=None, task=None, **kwargs):
+    published_at = getattr(task.request, 'published_at', None)
+    if published_at is not None:
+        # A task scheduled for later only starts waiting at its ETA.
+        eta = task.request.eta
+        if isinstance(eta, str):
+            published_at = max(published_at, datetime.fromisoformat(eta).timestamp())
+        metrics.observe(
+            'celery_task_queue_wait_seconds', (('task', task.name),),
+            max(time.time() - published_at, 0)
+        )
+    _running[task_id] = (time.perf_counter(), *metrics.track_queries(task.name))
+
+
+@task_postrun.connect
+def finish_task_metrics(task_id=None, task=None, state=None, **kwargs):
+    running = _running.pop(task_id, None)
+    if running is None:
+        return
+    started, stats, token = running
+    metrics.stop_tracking(token)
+    labels = (('task', task.name),)
+    metrics.observe(
+        'celery_task_duration_seconds', (('state', state or 'UNKNOWN'),) + labels,
+        time.perf_counter() - started
+    )
+    metrics.inc('celery_task_db_queries_total', labels, stats.count)
+    metrics.inc('celery_task_db_duration_seconds_total', labels, stats.seconds)
+    if inspector.has_pending_captures():
+        inspector.save_captures()
+
+
+@worker_process_shutdown.connect
+def flush_metrics(**kwargs):
+    # Pool processes exit without running atexit handlers.
+    metrics.flush()
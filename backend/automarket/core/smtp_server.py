@@ -0,0 +1,86 @@
+"""A minimal in-process SMTP server standing in for a mail relay."""
+import socketserver
+import threading
+import time
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server.stand_in
+        with server.lock:
+            server.connections += 1
+        time.sleep(server.connect_delay)
+        self.reply('220 localhost SMTP stand-in')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 localhost')
+            elif command.startswith('DATA'):
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in iter(self.rfile.readline, b''):
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(data_line)
+                time.sleep(server.message_delay)
+                with server.lock:
+                    rejected = server.reject_count > 0
+                    if rejected:
+                        server.reject_count -= 1
+                    else:
+                        server.messages.append(b''.join(data))
+                if rejected:
+                    self.reply('451 Temporary failure, try again later')
+                else:
+                    self.reply('250 OK')
+            elif command.startswith('QUIT'):
+                self.reply('221 Bye')
+                return
+            else:
+                # MAIL, RCPT, RSET and NOOP are all accepted.
+                self.reply('250 OK')
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class LocalSMTPServer:
+    """
+    Accept SMTP on a free localhost port and keep what it receives.
+
+    ``connect_delay`` and ``message_delay`` (seconds) emulate the handshake
+    and per-message latency of a remote relay; the next ``reject_count``
+    messages are answered with a temporary failure. Use as a context
+    manager, then point ``EMAIL_HOST``/``EMAIL_PORT`` at ``host``/``port``.
+    """
+
+    def __init__(self, connect_delay=0, message_delay=0, reject_count=0):
+        self.connect_delay = connect_delay
+        self.message_delay = message_delay
+        self.reject_count = reject_count
+        self.connections = 0
+        self.messages = []
+        self.lock = threading.Lock()
+        self.host = '127.0.0.1'
+        self.port = None
+        self._server = None
+
+    def __enter__(self):
+        self._server = _ThreadingServer((self.host, 0), _SMTPHandler)
+        self._server.stand_in = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
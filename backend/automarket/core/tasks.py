@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .mail import dispatch_pending_emails
+
+
+@shared_task
+def dispatch_emails_task():
+    sent, failed = dispatch_pending_emails()
+    return {'sent': sent, 'failed': failed}
@@ -1,3 +1,555 @@
-from django.test import TestCase
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.mail import (
+    CLAIM_LEASE,
+    RateLimiter,
+    claim_due_emails,
+    dispatch_pending_emails,
+    queue_email,
+    retry_delay,
+)
+from core.models import OutboxMessage, OutgoingEmail, SlowQuery
+from carlisting.models import CarImage, CarListing, InsuranceInfo
+from core import inspector, metrics, seeding, signals
+from core.outbox import OutboxListener, enqueue_task, relay_outbox
+from core.smtp_server import LocalSMTPServer
+from core.tasks import dispatch_emails_task
+from users.models import Favorite
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    EMAIL_DISPATCH_BATCH_SIZE=3,
+    EMAIL_RATE_LIMIT=0,
+    EMAIL_MAX_ATTEMPTS=3,
+    EMAIL_RETRY_DELAY=60,
+    EMAIL_RETRY_MAX_DELAY=600,
+)
+class EmailDispatchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def queue(self, count):
+        return [
+            queue_email(f'Subject {i}', 'Body', [f'user{i}@example.com'])
+            for i in range(count)
+        ]
+
+    def test_dispatch_sends_in_batches(self):
+        self.queue(7)
+        with mock.patch(
+            'core.mail.claim_due_emails', wraps=claim_due_emails
+        ) as claim:
+            self.assertEqual(dispatch_pending_emails(), (7, 0))
+        # Batches of 3, 3 and 1; the short batch ends the run.
+        self.assertEqual(claim.call_count, 3)
+        self.assertEqual(
+            sorted(message.subject for message in mail.outbox),
+            [f'Subject {i}' for i in range(7)]
+        )
+        self.assertFalse(
+            OutgoingEmail.objects.exclude(status=OutgoingEmail.STATUS_SENT)
+            .exists()
+        )
+        self.assertEqual(dispatch_pending_emails(), (0, 0))
+        self.assertEqual(len(mail.outbox), 7)
+
+    def test_claimed_emails_are_leased(self):
+        email, = self.queue(1)
+        claimed = claim_due_emails(10)
+        self.assertEqual([item.id for item in claimed], [email.id])
+        self.assertEqual(claim_due_emails(10), [])
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(
+            email.next_attempt_at, timezone.now() + CLAIM_LEASE / 2
+        )
+
+    def test_retry_delay_backs_off(self):
+        self.assertEqual(
+            [retry_delay(attempt) for attempt in range(1, 6)],
+            [60, 120, 240, 480, 600]
+        )
+
+    def test_rate_limiter_waits_for_next_window(self):
+        limiter = RateLimiter(2)
+        with mock.patch('core.mail.time') as clock:
+            clock.time.side_effect = [100.25, 100.5, 100.75, 101.0]
+            for _ in range(3):
+                limiter.wait()
+        clock.sleep.assert_called_once_with(0.25)
+
+    def test_dispatch_against_smtp_server(self):
+        self.queue(5)
+        with LocalSMTPServer() as server, override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST=server.host,
+            EMAIL_PORT=server.port,
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+        ):
+            self.assertEqual(dispatch_pending_emails(), (5, 0))
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(len(server.messages), 5)
+
+    def test_failed_messages_are_retried_with_backoff(self):
+        first, second, third = self.queue(3)
+        with LocalSMTPServer(reject_count=1) as server, override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST=server.host,
+            EMAIL_PORT=server.port,
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+        ):
+            self.assertEqual(dispatch_pending_emails(), (2, 1))
+            # The connection is reopened after the rejected message.
+            self.assertEqual(server.connections, 2)
+
+            first.refresh_from_db()
+            self.assertEqual(first.status, OutgoingEmail.STATUS_PENDING)
+            self.assertEqual(first.attempts, 1)
+            self.assertIn('451', first.last_error)
+            self.assertGreater(
+                first.next_attempt_at, timezone.now() + timedelta(seconds=50)
+            )
+            self.assertEqual(dispatch_pending_emails(), (0, 0))
+
+            OutgoingEmail.objects.filter(pk=first.pk).update(
+                next_attempt_at=timezone.now()
+            )
+            self.assertEqual(dispatch_pending_emails(), (1, 0))
+        self.assertEqual(len(server.messages), 3)
+        first.refresh_from_db()
+        self.assertEqual(
+            (first.status, first.attempts, first.last_error),
+            (OutgoingEmail.STATUS_SENT, 2, '')
+        )
+
+    def test_gives_up_after_max_attempts(self):
+        email, = self.queue(1)
+        connection = mock.Mock()
+        connection.send_messages.side_effect = OSError('Connection refused')
+        for attempt in range(3):
+            OutgoingEmail.objects.filter(pk=email.pk).update(
+                next_attempt_at=timezone.now()
+            )
+            self.assertEqual(
+                dispatch_pending_emails(connection=connection), (0, 1)
+            )
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.STATUS_FAILED)
+        self.assertEqual(email.attempts, 3)
+        self.assertIn('Connection refused', email.last_error)
+        self.assertEqual(dispatch_pending_emails(), (0, 0))
+
+
+class OutboxTests(TestCase):
+
+    def test_enqueued_tasks_roll_back_with_the_transaction(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            enqueue_task(dispatch_emails_task)
+            raise RuntimeError
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_relay_publishes_in_order(self):
+        enqueue_task(dispatch_emails_task, batch='first')
+        enqueue_task(dispatch_emails_task)
+        with mock.patch.object(dispatch_emails_task, 'apply_async') as publish:
+            self.assertEqual(relay_outbox(), 2)
+            self.assertEqual(relay_outbox(), 0)
+        self.assertEqual(
+            [call.args[:2] for call in publish.call_args_list],
+            [([], {'batch': 'first'}), ([], {})]
+        )
+        self.assertFalse(
+            OutboxMessage.objects.filter(sent_at__isnull=True).exists()
+        )
+
+    def test_relay_marks_rows_published_before_a_failure(self):
+        first = enqueue_task(dispatch_emails_task)
+        second = enqueue_task(dispatch_emails_task)
+        with mock.patch.object(
+            dispatch_emails_task, 'apply_async',
+            side_effect=[None, OSError('Broker unavailable')]
+        ):
+            with self.assertRaises(OSError):
+                relay_outbox()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertIsNotNone(first.sent_at)
+        self.assertIsNone(second.sent_at)
+
+        with mock.patch.object(dispatch_emails_task, 'apply_async'):
+            self.assertEqual(relay_outbox(), 1)
+
+
+class OutboxListenerTests(TransactionTestCase):
+
+    def test_commit_wakes_listener(self):
+        listener = OutboxListener()
+        self.assertFalse(listener.wait(0))
+
+        with transaction.atomic():
+            enqueue_task(dispatch_emails_task)
+            enqueue_task(dispatch_emails_task)
+        self.assertTrue(listener.wait(1))
+        self.assertFalse(listener.wait(0.05))
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            enqueue_task(dispatch_emails_task)
+            raise RuntimeError
+        self.assertFalse(listener.wait(0.05))
+
+
+class SeedingTests(TestCase):
+
+    def seed(self, **options):
+        return seeding.seed(
+            listings=300, users=40, vacuum=False, chunk_size=64,
+            brands=35, locations=40, **options
+        )
+
+    def index_count(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM pg_indexes')
+            return cursor.fetchone()[0]
+
+    def test_seed_loads_consistent_rows(self):
+        indexes = self.index_count()
+        totals = self.seed(username_prefix='seeded-')
+
+        self.assertEqual(self.index_count(), indexes)
+        users = get_user_model().objects.filter(username__startswith='seeded-')
+        listings = CarListing.objects.filter(user__in=users)
+        self.assertEqual(users.count(), 40)
+        self.assertEqual(users.filter(is_verified=False).count(), 2)
+        self.assertEqual(listings.count(), 300)
+        self.assertFalse(listings.filter(user__is_verified=False).exists())
+        self.assertEqual(
+            InsuranceInfo.objects.filter(car_listing__in=listings).count(), 300
+        )
+        self.assertEqual(
+            CarImage.objects.filter(car_listing__in=listings).count(),
+            totals['images']
+        )
+        self.assertEqual(
+            Favorite.objects.filter(user__in=users, car_listing__in=listings)
+            .count(), totals['favorites']
+        )
+        self.assertEqual(
+            set(listings.values_list('brand__name', flat=True)) - {
+                name for name, *_ in seeding.brand_catalog(35)
+            }, set()
+        )
+        # New rows get ids after the reserved ranges.
+        last_id = listings.order_by('-pk').values_list('pk', flat=True)[0]
+        listing = CarListing.objects.create(
+            user=users.first(), title='After', description='', price=1,
+            model='M', year=2020, mileage=0, engine_type='Diesel',
+            transmission='Manual', body_type='Sedan', color='Red',
+        )
+        self.assertGreater(listing.pk, last_id)
+
+    def test_search_vectors_match_postgres(self):
+        self.seed()
+        with connection.cursor() as cursor:
+            cursor.execute('''
+                SELECT count(*) FROM carlisting_carlisting
+                WHERE search_vector IS DISTINCT FROM
+                    setweight(to_tsvector('simple', title), 'A')
+                    || setweight(to_tsvector('simple', description), 'B')
+            ''')
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+            for name, *_, models in seeding.brand_catalog(35):
+                for model in models:
+                    title = f'{name} {model} 2020'
+                    description = 'Grey wagon, diesel engine, 123 km.'
+                    cursor.execute(
+                        "SELECT %s::tsvector = "
+                        "setweight(to_tsvector('simple', %s), 'A') "
+                        "|| setweight(to_tsvector('simple', %s), 'B')",
+                        [seeding.search_vector(title, description), title,
+                         description]
+                    )
+                    self.assertTrue(cursor.fetchone()[0], title)
+
+    def test_same_seed_generates_same_listings(self):
+        def generated():
+            return list(
+                CarListing.objects.order_by('-pk')[:300].values_list(
+                    'title', 'description', 'price', 'brand', 'location',
+                    'is_sold', 'is_hidden',
+                )
+            )
+
+        self.seed(seed=7)
+        first = generated()
+        self.seed(seed=7)
+        self.assertEqual(generated(), first)
+        self.seed(seed=8)
+        self.assertNotEqual(generated(), first)
+
+    def test_unknown_options_are_rejected(self):
+        with self.assertRaises(TypeError):
+            seeding.seed(listings=1, users=1, brand_count=3)
+        with self.assertRaises(ValueError):
+            seeding.seed(listings=1)
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(metrics, '_store', metrics.LocalStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with metrics._lock:
+            metrics._pending.clear()
+
+    def scrape(self, **headers):
+        response = self.client.get(reverse('metrics'), headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return response.content.decode()
+
+    def value(self, body, sample):
+        for line in body.splitlines():
+            name, _, value = line.rpartition(' ')
+            if name == sample:
+                return float(value)
+        self.fail(f'{sample} not in {body}')
+
+    def test_requests_are_recorded_per_route(self):
+        self.client.get(reverse('main'))
+        self.client.get(reverse('main'))
+        self.client.get('/missing/')
+        body = self.scrape()
+
+        route = '{method="GET",route="main"}'
+        self.assertEqual(self.value(
+            body, 'http_requests_total{method="GET",route="main",status="200"}'
+        ), 2)
+        self.assertEqual(self.value(
+            body, 'http_requests_total{method="GET",route="unmatched",'
+                  'status="404"}'
+        ), 1)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertEqual(
+            self.value(body, f'http_request_duration_seconds_count{route}'), 2
+        )
+        self.assertEqual(self.value(
+            body, 'http_request_duration_seconds_bucket'
+                  '{method="GET",route="main",le="+Inf"}'
+        ), 2)
+        self.assertGreater(
+            self.value(body, f'http_request_db_queries_sum{route}'), 0
+        )
+        self.assertGreater(
+            self.value(body, f'http_request_db_duration_seconds_sum{route}'), 0
+        )
+        self.assertGreater(
+            self.value(body, f'http_response_size_bytes_sum{route}'), 0
+        )
+
+    @override_settings(ROOT_URLCONF='automarket.asgi_urls')
+    async def test_async_requests_are_recorded(self):
+        await self.async_client.get(reverse('main'))
+        response = await self.async_client.get(reverse('metrics'))
+        body = response.content.decode()
+
+        route = '{method="GET",route="main"}'
+        self.assertEqual(
+            self.value(body, f'http_request_duration_seconds_count{route}'), 1
+        )
+        # The async view's queries run in another thread.
+        self.assertGreater(
+            self.value(body, f'http_request_db_queries_sum{route}'), 0
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        labels = (('route', 'test'),)
+        for value in (0, 3, 3, 500):
+            metrics.observe('http_request_db_queries', labels, value)
+        metrics.flush()
+        body = metrics.render(metrics.get_store().read())
+
+        bucket = 'http_request_db_queries_bucket{{route="test",le="{}"}}'
+        self.assertEqual(self.value(body, bucket.format(0)), 1)
+        self.assertEqual(self.value(body, bucket.format(2)), 1)
+        self.assertEqual(self.value(body, bucket.format(5)), 3)
+        self.assertEqual(self.value(body, bucket.format(100)), 3)
+        self.assertEqual(self.value(body, bucket.format('+Inf')), 4)
+        self.assertEqual(
+            self.value(body, 'http_request_db_queries_sum{route="test"}'), 506
+        )
+
+    def test_flushes_add_to_the_shared_totals(self):
+        labels = (('task', 'test'),)
+        metrics.inc('celery_task_db_queries_total', labels, 2)
+        metrics.flush()
+        # As another process would.
+        metrics.inc('celery_task_db_queries_total', labels, 3)
+        metrics.flush()
+        metrics.flush()
+        self.assertEqual(
+            metrics.get_store().read(),
+            {('celery_task_db_queries_total', '', labels): 5}
+        )
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_scrape_requires_token(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 401)
+        self.scrape(authorization='Bearer scrape-secret')
+
+    def test_task_duration_and_queries(self):
+        dispatch_emails_task.apply()
+        body = self.scrape()
+
+        task = 'task="core.tasks.dispatch_emails_task"'
+        self.assertEqual(self.value(
+            body, f'celery_task_duration_seconds_count{{state="SUCCESS",{task}}}'
+        ), 1)
+        self.assertGreater(
+            self.value(body, f'celery_task_db_queries_total{{{task}}}'), 0
+        )
+
+    def test_queue_wait_starts_at_publish_or_eta(self):
+        headers = {}
+        signals.stamp_publish_time(headers=headers)
+        published_at = headers['published_at'] - 30
+        eta = datetime.fromtimestamp(published_at + 25, dt_timezone.utc)
+        for task_id, eta in (('queued', None), ('scheduled', eta.isoformat())):
+            task = mock.Mock()
+            task.name = 'test'
+            task.request = mock.Mock(published_at=published_at, eta=eta)
+            signals.start_task_metrics(task_id=task_id, task=task)
+            signals.finish_task_metrics(task_id=task_id, task=task, state='SUCCESS')
+        body = self.scrape()
+
+        wait = 'celery_task_queue_wait_seconds_bucket{{task="test",le="{}"}}'
+        self.assertEqual(self.value(body, wait.format(10)), 1)
+        self.assertEqual(self.value(body, wait.format(30)), 1)
+        self.assertEqual(self.value(body, wait.format(60)), 2)
+
+
+@override_settings(SLOW_QUERY_EXPLAIN_RATE=1)
+class SlowQueryInspectorTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        inspector._pending.clear()
+        inspector.install(connection)
+        self.addCleanup(connection.execute_wrappers.remove, inspector.inspect_query)
+
+    @contextmanager
+    def all_queries_slow(self):
+        with self.settings(SLOW_QUERY_THRESHOLD=1e-6), self.assertLogs(
+            'core.inspector', 'WARNING'
+        ) as logs:
+            yield logs
+
+    def test_captures_origin_fingerprint_and_plan(self):
+        with self.all_queries_slow() as logs:
+            self.client.get(reverse('main'))
+
+        capture = SlowQuery.objects.get(origin='GET main')
+        self.assertIn(capture.fingerprint, logs.output[0])
+        self.assertIn('cost=', capture.plan)
+        # Not run a second time unless asked for.
+        self.assertNotIn('Execution Time', capture.plan)
+        self.assertEqual(
+            capture.fingerprint,
+            inspector.capture_fingerprint(capture.normalized_sql)
+        )
+
+    @override_settings(SLOW_QUERY_EXPLAIN_ANALYZE=True)
+    def test_explain_analyze_is_opt_in(self):
+        with self.all_queries_slow():
+            OutboxMessage.objects.exists()
+            inspector.save_captures()
+
+        plan = SlowQuery.objects.get().plan
+        self.assertIn('Buffers', plan)
+        self.assertIn('Execution Time', plan)
+
+    def test_captures_are_saved_when_the_request_ends(self):
+        with self.all_queries_slow():
+            OutboxMessage.objects.exists()
+        self.assertFalse(SlowQuery.objects.exists())
+        self.assertTrue(inspector.has_pending_captures())
+
+    def test_selects_with_side_effects_are_not_explained(self):
+        with self.all_queries_slow(), connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence('core_slowquery', 'id'))"
+            )
+            cursor.execute('SELECT pg_advisory_xact_lock(1)')
+            list(OutboxMessage.objects.select_for_update(skip_locked=True))
+            inspector.save_captures()
+
+        self.assertEqual(
+            list(SlowQuery.objects.values_list('plan', flat=True)), ['', '', '']
+        )
+        self.assertTrue(inspector.is_plain_select('SELECT * FROM t WHERE id = ?'))
+
+    def test_writes_are_not_explained(self):
+        with self.all_queries_slow():
+            OutboxMessage.objects.create(task_name='test')
+            inspector.save_captures()
+
+        insert = SlowQuery.objects.get(normalized_sql__startswith='INSERT')
+        self.assertEqual(insert.plan, '')
+        self.assertEqual(insert.origin, 'unknown')
+
+    def test_task_queries_name_the_task(self):
+        with self.all_queries_slow():
+            dispatch_emails_task.apply()
+
+        self.assertTrue(SlowQuery.objects.filter(
+            origin='task core.tasks.dispatch_emails_task'
+        ).exists())
+
+    @override_settings(SLOW_QUERY_LOG_SIZE=3)
+    def test_keeps_only_the_latest_captures(self):
+        with self.all_queries_slow():
+            for _ in range(5):
+                OutboxMessage.objects.exists()
+            inspector.save_captures()
+            OutboxMessage.objects.count()
+            inspector.save_captures()
+
+        self.assertEqual(
+            [sql.split()[1] for sql in SlowQuery.objects.order_by('id')
+             .values_list('normalized_sql', flat=True)],
+            ['?', '?', 'COUNT(*)']
+        )
+
+    @override_settings(SLOW_QUERY_THRESHOLD=10000)
+    def test_fast_queries_are_ignored(self):
+        with self.assertNoLogs('core.inspector'):
+            self.client.get(reverse('main'))
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_normalize(self):
+        self.assertEqual(
+            inspector.normalize(
+                "SELECT *\n  FROM t WHERE id IN (%s, %s, %s) AND name = 'o''k' "
+                'AND t.v2 > 1.5 LIMIT 21'
+            ),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? AND t.v2 > ? LIMIT ?'
+        )
@@ -1,3 +1,27 @@
-from django.shortcuts import render
+import hmac
 
-# Create your views here.
+from django.conf import settings
+from django.http import HttpResponse
+from django.views import View
+
+from . import metrics
+
+
+class MetricsView(View):
+    """
+    The metrics of all processes, for Prometheus to scrape.
+
+    With ``METRICS_TOKEN`` set, scrapers must send it as a bearer token.
+    """
+
+    def get(self, request):
+        token = settings.METRICS_TOKEN
+        if token and not hmac.compare_digest(
+            request.headers.get('Authorization', ''), f'Bearer {token}'
+        ):
+            return HttpResponse(status=401)
+        metrics.flush()
+        return HttpResponse(
+            metrics.render(metrics.get_store().read()),
+            content_type=metrics.CONTENT_TYPE
+        )
@@ -0,0 +1,118 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from core import async_cache
+from core.cache import LocalCache
+from .models import User
+
+USER_CACHE_KEY = 'users:auth:{}'
+
+# The password hash never leaves the database; it stays deferred on cached
+# users and is loaded if something asks for it.
+CACHED_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname != 'password'
+)
+
+_local = LocalCache(
+    max_size=settings.AUTH_USER_CACHE_SIZE,
+    ttl=settings.AUTH_USER_CACHE_LOCAL_TTL,
+)
+
+
+def get_cached_user(user_id):
+    """
+    Return the user with ``user_id``, or ``None``, through two cache tiers.
+
+    Field values are kept in a process-local LRU for
+    ``AUTH_USER_CACHE_LOCAL_TTL`` seconds and in the shared cache for
+    ``AUTH_USER_CACHE_TTL``; each call builds a fresh instance from them,
+    so requests never share one.
+    """
+    key = USER_CACHE_KEY.format(user_id)
+    values = _local.get(key)
+    if values is None:
+        values = cache.get(key)
+        if values is None:
+            values = (
+                User.objects.filter(pk=user_id)
+                .values_list(*CACHED_FIELDS).first()
+            )
+            if values is None:
+                return None
+            cache.set(key, values, settings.AUTH_USER_CACHE_TTL)
+        _local.set(key, values)
+    return User.from_db('default', CACHED_FIELDS, values)
+
+
+async def aget_cached_user(user_id):
+    """Async counterpart of ``get_cached_user()``, for async views."""
+    key = USER_CACHE_KEY.format(user_id)
+    values = _local.get(key)
+    if values is None:
+        values = await async_cache.aget(key)
+        if values is None:
+            values = await (
+                User.objects.filter(pk=user_id)
+                .values_list(*CACHED_FIELDS).afirst()
+            )
+            if values is None:
+                return None
+            await async_cache.aset(key, values, settings.AUTH_USER_CACHE_TTL)
+        _local.set(key, values)
+    return User.from_db('default', CACHED_FIELDS, values)
+
+
+def invalidate_cached_user(user_id):
+    """
+    Drop a user from this worker's cache and the shared cache.
+
+    The shared entry is dropped again after commit, in case a concurrent
+    request re-cached the old row in between. Other workers may serve
+    their local copy for up to ``AUTH_USER_CACHE_LOCAL_TTL`` seconds.
+    """
+    key = USER_CACHE_KEY.format(user_id)
+    _local.delete(key)
+    cache.delete(key)
+    transaction.on_commit(lambda: (_local.delete(key), cache.delete(key)))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` resolving the token's user through the user cache."""
+
+    def get_user(self, validated_token):
+        return self.check_user(get_cached_user(self.get_user_id(validated_token)))
+
+    async def aauthenticate(self, request):
+        """``authenticate()`` for async views (see core.async_views)."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        user = await aget_cached_user(self.get_user_id(validated_token))
+        return self.check_user(user), validated_token
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _('Token contained no recognizable user identification')
+            )
+
+    def check_user(self, user):
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
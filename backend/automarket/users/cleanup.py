@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import EmailVerification, User
+
+
+def purge_expired_verifications(chunk_size=None):
+    """
+    Delete expired verification codes, ``chunk_size`` rows per statement.
+
+    Returns the number of rows deleted.
+    """
+    chunk_size = chunk_size or settings.REGISTRATION_CLEANUP_CHUNK_SIZE
+    now = timezone.now()
+    purged = 0
+    while True:
+        ids = list(
+            EmailVerification.objects.filter(expiration__lt=now)
+            .order_by('expiration').values_list('id', flat=True)[:chunk_size]
+        )
+        if ids:
+            purged += EmailVerification.objects.filter(id__in=ids).delete()[0]
+        if len(ids) < chunk_size:
+            return purged
+
+
+def purge_unverified_users(chunk_size=None):
+    """
+    Delete accounts that never confirmed their email.
+
+    A user qualifies once ``UNVERIFIED_USER_RETENTION`` has passed since
+    registration, they never logged in, and they have no unexpired
+    verification code. Accounts deactivated after verifying are kept.
+    Each chunk is deleted in its own transaction. Returns the number of
+    users deleted.
+    """
+    chunk_size = chunk_size or settings.REGISTRATION_CLEANUP_CHUNK_SIZE
+    now = timezone.now()
+    candidates = User.objects.filter(
+        is_verified=False,
+        is_active=False,
+        last_login__isnull=True,
+        date_joined__lt=now - timedelta(days=settings.UNVERIFIED_USER_RETENTION),
+    ).exclude(Exists(
+        EmailVerification.objects.filter(
+            user=OuterRef('pk'), expiration__gte=now
+        )
+    ))
+    purged = 0
+    while True:
+        ids = list(
+            candidates.order_by('date_joined')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if ids:
+            with transaction.atomic():
+                User.objects.filter(id__in=ids).delete()
+            purged += len(ids)
+        if len(ids) < chunk_size:
+            return purged
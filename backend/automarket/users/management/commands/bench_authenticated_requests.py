@@ -0,0 +1,58 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from carlisting.models import CarListing
+from carlisting.views import HideCarListingView
+from core.bench import bench_client, format_summary, get_bench_user, measure
+from users.authentication import CachedJWTAuthentication, USER_CACHE_KEY
+from users.views import FavoriteListView
+
+
+class Command(BaseCommand):
+    """
+    Compare authenticated request latency with the token's user loaded
+    from the database on every request and resolved through the user cache.
+    """
+
+    help = 'Benchmark JWT-authenticated requests with and without the user cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=500)
+
+    def handle(self, *args, **options):
+        user = get_bench_user()
+        client = bench_client()
+        client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {AccessToken.for_user(user)}'
+        cases = [('favorites', FavoriteListView, 'get', reverse('users:favorites'))]
+        listing = CarListing.objects.filter(user=user).order_by('id').first()
+        if listing is not None:
+            cases.append((
+                'hide', HideCarListingView, 'post',
+                reverse('carlisting:hide_car_listing', args=[listing.id])
+            ))
+
+        for name, view, method, url in cases:
+            for label, authentication in (
+                ('JWTAuthentication', JWTAuthentication),
+                ('CachedJWTAuthentication', CachedJWTAuthentication),
+            ):
+                cache.delete(USER_CACHE_KEY.format(user.pk))
+                with mock.patch.object(
+                    view, 'authentication_classes', [authentication]
+                ):
+                    samples = measure(
+                        lambda: getattr(client, method)(url), options['repeat']
+                    )
+                mean = sum(samples) / len(samples)
+                self.stdout.write(
+                    f'{format_summary(f"{name}, {label}", samples)} '
+                    f'{1000 / mean:7.0f} req/s'
+                )
+
+        if listing is not None:
+            CarListing.objects.filter(pk=listing.pk).update(is_hidden=False)
@@ -0,0 +1,112 @@
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.urls import reverse
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.views import TokenRefreshView
+
+from core.bench import bench_client, format_summary, get_bench_user
+from users.tokens import RefreshToken, purge_expired_tokens
+
+HISTORY_PREFIX = 'bench-history-'
+
+
+class Command(BaseCommand):
+    """
+    Time token refresh with rotation against a large token history, with
+    the stock database blacklist and the cache-fronted one, then purge the
+    history in chunks.
+
+    The history rows are expired, as they are in production before the
+    purge catches up, and every other one is blacklisted.
+    """
+
+    help = 'Benchmark refresh token rotation and the expired token purge.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history', type=int, default=2_000_000)
+        parser.add_argument('--repeat', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user = get_bench_user()
+        client = bench_client()
+        url = reverse('users:token_refresh')
+        last_id = OutstandingToken.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+
+        started = time.perf_counter()
+        self.seed_history(user, options['history'])
+        self.stdout.write(
+            f'Seeded {options["history"]} expired tokens '
+            f'in {time.perf_counter() - started:.1f}s'
+        )
+
+        try:
+            for label, serializer in (
+                ('database blacklist',
+                 'rest_framework_simplejwt.serializers.TokenRefreshSerializer'),
+                ('cache-fronted blacklist',
+                 'users.serializers.RotatingTokenRefreshSerializer'),
+            ):
+                token = str(RefreshToken.for_user(user))
+                samples = []
+                with mock.patch.object(
+                    TokenRefreshView, '_serializer_class', serializer
+                ):
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        response = client.post(url, {'refresh': token})
+                        samples.append((time.perf_counter() - started) * 1000)
+                        token = response.json()['refresh']
+                mean = sum(samples) / len(samples)
+                self.stdout.write(
+                    f'{format_summary(f"refresh, {label}", samples)} '
+                    f'{1000 / mean:7.0f} req/s'
+                )
+
+            deletes = []
+
+            def time_deletes(execute, sql, params, many, context):
+                started = time.perf_counter()
+                try:
+                    return execute(sql, params, many, context)
+                finally:
+                    if sql.startswith('DELETE'):
+                        deletes.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            with connection.execute_wrapper(time_deletes):
+                purged = purge_expired_tokens()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{"purge":<40} {purged / elapsed:10.0f} rows/s '
+                f'({purged} rows, slowest delete '
+                f'{max(deletes, default=0) * 1000:.0f}ms)'
+            )
+        finally:
+            OutstandingToken.objects.filter(id__gt=last_id).delete()
+
+    def seed_history(self, user, count):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO token_blacklist_outstandingtoken '
+                '(user_id, jti, token, created_at, expires_at) '
+                "SELECT %s, %s || g, '', now() - interval '2 days', "
+                "now() - interval '1 day' FROM generate_series(1, %s) g",
+                [user.pk, HISTORY_PREFIX, count]
+            )
+            cursor.execute(
+                'INSERT INTO token_blacklist_blacklistedtoken '
+                '(token_id, blacklisted_at) '
+                "SELECT id, now() - interval '2 days' "
+                'FROM token_blacklist_outstandingtoken '
+                'WHERE jti LIKE %s AND id %% 2 = 0',
+                [HISTORY_PREFIX + '%']
+            )
+            cursor.execute(
+                'ANALYZE token_blacklist_outstandingtoken, '
+                'token_blacklist_blacklistedtoken'
+            )
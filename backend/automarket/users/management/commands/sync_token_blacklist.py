@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from users.tokens import sync_token_blacklist
+
+
+class Command(BaseCommand):
+    """
+    Load unexpired rows from the ``token_blacklist`` tables into the cache.
+
+    Optional after the cache has been flushed: the database stays the
+    source of truth, this only warms the cache in front of it.
+    """
+
+    help = 'Copy the database token blacklist into the cache.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(
+            f'{sync_token_blacklist()} blacklisted tokens cached.'
+        ))
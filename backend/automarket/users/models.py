@@ -1,11 +1,11 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import connection, models
 from django.urls import reverse
-from django.core.mail import send_mail
 from django.utils.timezone import now
 from django.conf import settings
 
-from carlisting.models import CarListing
+from carlisting.models import CarListing, cover_image_prefetch
+from core.mail import queue_email
 
 
 class User(AbstractUser):
@@ -18,13 +18,22 @@ class User(AbstractUser):
     class Meta:
         app_label = 'users'
         db_table = 'user'
+        indexes = [
+            # Only registrations that were never confirmed, scanned by
+            # users.cleanup.purge_unverified_users.
+            models.Index(
+                fields=['date_joined'],
+                condition=models.Q(is_verified=False, is_active=False),
+                name='user_unverified_joined_idx',
+            ),
+        ]
 
 
 class EmailVerification(models.Model):
     code = models.UUIDField(unique=True)
     user = models.ForeignKey(to=User, on_delete=models.CASCADE)
     created = models.DateTimeField(auto_now_add=True)
-    expiration = models.DateTimeField()
+    expiration = models.DateTimeField(db_index=True)
 
     def __str__(self):
         return f'EmailVerification for {self.user.email}'
@@ -39,18 +48,102 @@ class EmailVerification(models.Model):
             f'To confirm your account for {self.user.email}, '
             f'follow the link: {verification_link}'
         )
-        send_mail(
+        queue_email(
             subject,
             message,
-            settings.EMAIL_HOST_USER,
             [self.user.email],
-            fail_silently=False,
+            from_email=settings.EMAIL_HOST_USER,
         )
 
     def is_expired(self):
         return now() >= self.expiration
 
 
+# Per-listing outcomes reported by FavoriteQuerySet.add_many/remove_many.
+FAVORITE_ADDED = 'added'
+FAVORITE_EXISTS = 'exists'
+FAVORITE_REMOVED = 'removed'
+FAVORITE_NOT_FOUND = 'not_found'
+
+
+class FavoriteQuerySet(models.QuerySet):
+    def with_listing(self):
+        """Join the listing and prefetch its cover image."""
+        return self.select_related('car_listing').prefetch_related(
+            cover_image_prefetch('car_listing__images')
+        )
+
+    def add_many(self, user, car_listing_ids):
+        """
+        Favorite every listing in ``car_listing_ids`` in one statement.
+
+        Rows are written with ``INSERT ... ON CONFLICT DO NOTHING`` on the
+        (user, car_listing) key, so concurrent adds of the same listing
+        cannot fail. Returns ``{car_listing_id: status}`` where the status is
+        ``added``, ``exists`` or ``not_found`` (no such listing).
+        """
+        ids = list(dict.fromkeys(car_listing_ids))
+        if not ids:
+            return {}
+        sql = f'''
+            WITH requested AS (
+                SELECT DISTINCT unnest(%s::bigint[]) AS id
+            ), inserted AS (
+                INSERT INTO {Favorite._meta.db_table}
+                    (user_id, car_listing_id, created_at)
+                SELECT %s, listing.id, now()
+                FROM {CarListing._meta.db_table} AS listing
+                JOIN requested ON requested.id = listing.id
+                ON CONFLICT (user_id, car_listing_id) DO NOTHING
+                RETURNING car_listing_id
+            )
+            SELECT
+                requested.id,
+                CASE
+                    WHEN inserted.car_listing_id IS NOT NULL THEN %s
+                    WHEN listing.id IS NULL THEN %s
+                    ELSE %s
+                END
+            FROM requested
+            LEFT JOIN inserted ON inserted.car_listing_id = requested.id
+            LEFT JOIN {CarListing._meta.db_table} AS listing
+                ON listing.id = requested.id
+        '''
+        params = [
+            ids, user.pk, FAVORITE_ADDED, FAVORITE_NOT_FOUND, FAVORITE_EXISTS
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            results = dict(cursor.fetchall())
+        return {car_listing_id: results[car_listing_id] for car_listing_id in ids}
+
+    def remove_many(self, user, car_listing_ids):
+        """
+        Unfavorite every listing in ``car_listing_ids`` with a single DELETE.
+
+        Returns ``{car_listing_id: status}`` where the status is ``removed``
+        or ``not_found`` (the listing was not in the user's favorites).
+        """
+        ids = list(dict.fromkeys(car_listing_ids))
+        if not ids:
+            return {}
+        sql = (
+            f'DELETE FROM {Favorite._meta.db_table} '
+            f'WHERE user_id = %s AND car_listing_id = ANY(%s::bigint[]) '
+            f'RETURNING car_listing_id'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user.pk, ids])
+            removed = {row[0] for row in cursor.fetchall()}
+        return {
+            car_listing_id: (
+                FAVORITE_REMOVED if car_listing_id in removed
+                else FAVORITE_NOT_FOUND
+            )
+            for car_listing_id in ids
+        }
+
+
 class Favorite(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -64,8 +157,16 @@ class Favorite(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = FavoriteQuerySet.as_manager()
+
     class Meta:
         unique_together = ('user', 'car_listing')
+        indexes = [
+            models.Index(
+                fields=['user', '-created_at', '-id'],
+                name='favorite_user_recent_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user.username} - {self.car_listing.title}'
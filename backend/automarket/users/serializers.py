@@ -1,15 +1,32 @@
+from django.db import transaction
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from carlisting.serializers import CarListingBriefSerializer
+from core.outbox import enqueue_task
 from .models import User, EmailVerification, Favorite
 from .tasks import send_verification_email_task
+from .tokens import RefreshToken
+
+
+# How many favorites the profile embeds; the rest are paged separately.
+PROFILE_FAVORITES_LIMIT = 10
+# Upper bound on the listing ids accepted by one batch favorites request.
+FAVORITE_BATCH_LIMIT = 500
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
     car_listing_title = serializers.ReadOnlyField(source='car_listing.title')
+    listing = CarListingBriefSerializer(source='car_listing', read_only=True)
 
     class Meta:
         model = Favorite
-        fields = ['id', 'car_listing', 'car_listing_title', 'created_at']
+        fields = ['id', 'car_listing', 'car_listing_title', 'listing', 'created_at']
 
 
 class RegistrationSerializer(serializers.ModelSerializer):
@@ -26,6 +43,7 @@ class RegistrationSerializer(serializers.ModelSerializer):
             'phone_number'
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         user = User(
             email=validated_data['email'],
@@ -53,29 +71,36 @@ class RegistrationSerializer(serializers.ModelSerializer):
             expiration=timezone.now() + timezone.timedelta(hours=48)
         )
 
-        send_verification_email_task.delay(
-            user.id, verification.code, user.email
+        # Published by the outbox relay once the user and verification
+        # rows are committed.
+        enqueue_task(
+            send_verification_email_task,
+            user.id, str(verification.code), user.email
         )
 
 
 class EmailVerificationSerializer(serializers.Serializer):
     code = serializers.UUIDField()
 
-    def validate_code(self, value):
-        try:
-            verification = EmailVerification.objects.get(code=value)
-        except EmailVerification.DoesNotExist:
-            raise serializers.ValidationError("Invalid verification code.")
-
+    def validate(self, attrs):
+        # Looked up once, with its user, and handed to save().
+        verification = EmailVerification.objects.select_related('user').filter(
+            code=attrs['code']
+        ).first()
+        if verification is None:
+            raise serializers.ValidationError(
+                {'code': ['Invalid verification code.']}
+            )
         if verification.is_expired():
-            raise serializers.ValidationError("Verification code has expired.")
-
-        return value
+            raise serializers.ValidationError(
+                {'code': ['Verification code has expired.']}
+            )
+        attrs['verification'] = verification
+        return attrs
 
+    @transaction.atomic
     def save(self, **kwargs):
-        verification = EmailVerification.objects.get(
-            code=self.validated_data['code']
-        )
+        verification = self.validated_data['verification']
         user = verification.user
         user.is_verified = True
         user.is_active = True
@@ -84,6 +109,8 @@ class EmailVerificationSerializer(serializers.Serializer):
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RefreshToken
+
     def validate(self, attrs):
         data = super().validate(attrs)
         if not self.user.is_verified:
@@ -92,17 +119,55 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            # Blacklisting is an atomic add, so when one token is replayed
+            # concurrently only the first request gets a new pair.
+            if api_settings.BLACKLIST_AFTER_ROTATION and not refresh.blacklist():
+                raise TokenError(_('Token is blacklisted'))
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+
+        return data
+
+
+class FavoriteBatchSerializer(serializers.Serializer):
+    car_listing_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=FAVORITE_BATCH_LIMIT,
+    )
+
+
 class ProfileSerializer(serializers.ModelSerializer):
-    favorites = FavoriteSerializer(many=True, read_only=True)
+    favorites = serializers.SerializerMethodField()
+    favorites_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = [
             'username', 'email', 'first_name', 'last_name',
-            'phone_number', 'is_verified', 'favorites'
+            'phone_number', 'is_verified', 'favorites_count', 'favorites'
         ]
         read_only_fields = ['email', 'is_verified']
 
+    def get_favorites(self, user):
+        favorites = Favorite.objects.filter(user=user).with_listing().order_by(
+            '-created_at', '-id'
+        )[:PROFILE_FAVORITES_LIMIT]
+        return FavoriteSerializer(favorites, many=True).data
+
+    def get_favorites_count(self, user):
+        return user.favorites.count()
+
     def update(self, instance, validated_data):
         instance.username = validated_data.get('username', instance.username)
         instance.first_name = validated_data.get('first_name', instance.first_name)
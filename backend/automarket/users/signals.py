@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import invalidate_cached_user
+from .models import User
+from .tokens import cache_blacklisted_token
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    # Covers deactivation and verification changes, which go through save().
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def cache_blacklisted_token_row(sender, instance, created, **kwargs):
+    # Tokens blacklisted through the admin or the stock blacklist view.
+    if created:
+        cache_blacklisted_token(instance.token.jti, instance.token.expires_at)
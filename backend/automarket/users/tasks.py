@@ -1,5 +1,14 @@
+import logging
+
 from celery import shared_task
+
+from core import metrics
+from core.mail import dispatch_pending_emails
+from .cleanup import purge_expired_verifications, purge_unverified_users
 from .models import EmailVerification
+from .tokens import purge_expired_tokens
+
+logger = logging.getLogger(__name__)
 
 
 @shared_task
@@ -9,4 +18,28 @@ def send_verification_email_task(user_id, code, email):
         verification.send_verification_email()
     except EmailVerification.DoesNotExist:
         return False
+    # Sends this message together with everything else that is due, over
+    # one connection; during a burst of registrations most runs find the
+    # queue already drained.
+    dispatch_pending_emails()
     return True
+
+
+@shared_task
+def purge_expired_tokens_task():
+    return purge_expired_tokens()
+
+
+@shared_task
+def purge_abandoned_registrations_task():
+    purged = {
+        'verifications': purge_expired_verifications(),
+        'users': purge_unverified_users(),
+    }
+    logger.info(
+        'Purged %(verifications)d expired verifications and '
+        '%(users)d unverified users', purged
+    )
+    for kind, count in purged.items():
+        metrics.inc('purged_rows_total', (('kind', kind),), count)
+    return purged
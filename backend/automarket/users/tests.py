@@ -1,9 +1,36 @@
+import uuid
+from datetime import timedelta
+from unittest import mock
+
 from django.core import mail
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from redis.exceptions import RedisError
 from rest_framework import status
 from rest_framework.test import APITestCase
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import AccessToken
+from users.authentication import USER_CACHE_KEY, get_cached_user
 from users.models import User, EmailVerification, Favorite
-from carlisting.models import CarListing, Brand, Location
+from users.cleanup import purge_expired_verifications, purge_unverified_users
+from users.tasks import purge_abandoned_registrations_task
+from users.tokens import (
+    BLACKLIST_CACHE_KEY,
+    RefreshToken,
+    purge_expired_tokens,
+    sync_token_blacklist,
+)
+from carlisting.models import CarListing, CarImage, Brand, Location
+from core import metrics
+from core.outbox import relay_outbox
+from users.serializers import FAVORITE_BATCH_LIMIT, PROFILE_FAVORITES_LIMIT
 from celery import current_app
 from django.test import override_settings
 
@@ -55,6 +82,9 @@ class UserTests(APITestCase):
         mail.outbox = []
 
         self.client.post(reverse('users:register'), self.user_data, format='json')
+        # The verification task is published through the outbox.
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(relay_outbox(), 1)
 
         self.assertEqual(len(mail.outbox), 1)
         self.assertIn(self.user_data['email'], mail.outbox[0].to)
@@ -168,3 +198,482 @@ class UserTests(APITestCase):
 
         with self.assertRaises(User.DoesNotExist):
             User.objects.get(username=self.user_data['username'])
+
+
+class FavoriteFixtureMixin:
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='TestPassword123'
+        )
+        self.client.force_authenticate(self.user)
+        seller = User.objects.create_user(
+            username='seller', email='seller@example.com', password='TestPassword123'
+        )
+        brand = Brand.objects.create(
+            name='Toyota', origin_country='Japan', established_year=1937
+        )
+        location = Location.objects.create(
+            city='Kyiv', region='Kyiv Oblast', country='Ukraine',
+            postal_code='01001', time_zone='Europe/Kyiv',
+        )
+        self.listings = []
+        for number in range(PROFILE_FAVORITES_LIMIT + 3):
+            listing = CarListing.objects.create(
+                user=seller,
+                title=f'Car {number}',
+                description='Description',
+                price=10000 + number,
+                year=2020,
+                mileage=10000,
+                engine_type='Gasoline',
+                transmission='Manual',
+                body_type='Sedan',
+                color='Black',
+                brand=brand,
+                location=location,
+            )
+            for image in range(2):
+                CarImage.objects.create(
+                    car_listing=listing,
+                    image_url=f'https://example.com/{number}/{image}.jpg',
+                )
+            self.listings.append(listing)
+        self.favorite_listings(self.listings)
+        self.url = reverse('users:favorites')
+
+    def favorite_listings(self, listings):
+        for listing in listings:
+            Favorite.objects.create(user=self.user, car_listing=listing)
+
+
+class FavoriteListTests(FavoriteFixtureMixin, APITestCase):
+
+    def test_favorites_are_paged_newest_first(self):
+        response = self.client.get(self.url, {'page_size': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['car_listing'] for item in response.data['results']],
+            [listing.id for listing in reversed(self.listings[-5:])],
+        )
+        self.assertIsNotNone(response.data['next'])
+
+        seen = []
+        url = self.url + '?page_size=5'
+        while url:
+            page = self.client.get(url).data
+            seen.extend(item['car_listing'] for item in page['results'])
+            url = page['next']
+        self.assertCountEqual(seen, [listing.id for listing in self.listings])
+
+    def test_favorites_embed_brief_listing(self):
+        response = self.client.get(self.url, {'page_size': 1})
+        listing = response.data['results'][0]['listing']
+        newest = self.listings[-1]
+        self.assertEqual(listing['title'], newest.title)
+        number = len(self.listings) - 1
+        self.assertEqual(
+            listing['first_image_url'], f'https://example.com/{number}/0.jpg'
+        )
+
+    def test_favorites_query_count_is_constant(self):
+        # The page joined with its listings, then their cover images.
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {'page_size': 3})
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {'page_size': 12})
+
+    def test_favorites_only_lists_own(self):
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='TestPassword123'
+        )
+        self.client.force_authenticate(other)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['results'], [])
+
+    def test_profile_embeds_count_and_first_page(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('users:profile'))
+        self.assertEqual(response.data['favorites_count'], len(self.listings))
+        self.assertEqual(len(response.data['favorites']), PROFILE_FAVORITES_LIMIT)
+        self.assertEqual(
+            response.data['favorites'][0]['car_listing'], self.listings[-1].id
+        )
+
+
+class FavoriteBatchTests(FavoriteFixtureMixin, APITestCase):
+
+    def favorite_listings(self, listings):
+        Favorite.objects.create(user=self.user, car_listing=listings[0])
+
+    def statuses(self, response):
+        return {
+            item['car_listing']: item['status']
+            for item in response.data['results']
+        }
+
+    def test_batch_add_reports_each_id(self):
+        first, second = self.listings[0].id, self.listings[1].id
+        missing = max(listing.id for listing in self.listings) + 1000
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                reverse('users:add_favorites_batch'),
+                {'car_listing_ids': [second, first, missing, second]},
+                format='json',
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['car_listing'] for item in response.data['results']],
+            [second, first, missing],
+        )
+        self.assertEqual(self.statuses(response), {
+            first: 'exists', second: 'added', missing: 'not_found',
+        })
+        self.assertEqual(
+            set(self.user.favorites.values_list('car_listing_id', flat=True)),
+            {first, second},
+        )
+
+    def test_batch_remove_reports_each_id(self):
+        first, second = self.listings[0].id, self.listings[1].id
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                reverse('users:remove_favorites_batch'),
+                {'car_listing_ids': [first, second]},
+                format='json',
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.statuses(response), {
+            first: 'removed', second: 'not_found',
+        })
+        self.assertFalse(self.user.favorites.exists())
+
+    def test_remove_reports_why_nothing_was_removed(self):
+        Favorite.objects.filter(car_listing=self.listings[0]).delete()
+        for listing_id, detail in (
+            (self.listings[0].id, 'Not in favorites.'),
+            (0, 'Car listing not found.'),
+        ):
+            response = self.client.post(
+                reverse('users:remove_from_favorite', args=[listing_id])
+            )
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+            self.assertEqual(response.data['detail'], detail)
+
+    def test_batch_leaves_other_users_favorites(self):
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='TestPassword123'
+        )
+        Favorite.objects.create(user=other, car_listing=self.listings[1])
+        self.client.post(
+            reverse('users:remove_favorites_batch'),
+            {'car_listing_ids': [self.listings[1].id]},
+            format='json',
+        )
+        self.assertTrue(other.favorites.filter(car_listing=self.listings[1]).exists())
+
+    def test_batch_rejects_invalid_payload(self):
+        for payload in (
+            {},
+            {'car_listing_ids': []},
+            {'car_listing_ids': ['abc']},
+            {'car_listing_ids': list(range(1, FAVORITE_BATCH_LIMIT + 2))},
+        ):
+            response = self.client.post(
+                reverse('users:add_favorites_batch'), payload, format='json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_single_add_missing_listing(self):
+        response = self.client.post(reverse('users:add_to_favorite', args=[999999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com',
+            password='TestPassword123', is_verified=True
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}'
+        )
+        self.url = reverse('users:favorites')
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        return response, [
+            query['sql'] for query in queries if 'FROM "user"' in query['sql']
+        ]
+
+    def test_user_is_loaded_once(self):
+        response, queries = self.user_queries()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+
+        response, queries = self.user_queries()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(queries, [])
+
+    def test_password_hash_is_not_cached(self):
+        self.client.get(self.url)
+        self.assertNotIn(
+            self.user.password, cache.get(USER_CACHE_KEY.format(self.user.pk))
+        )
+        cached = get_cached_user(self.user.pk)
+        self.assertEqual(cached.username, 'buyer')
+        self.assertIn('password', cached.get_deferred_fields())
+        self.assertTrue(cached.check_password('TestPassword123'))
+
+    def test_deactivation_invalidates_cache(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        response, queries = self.user_queries()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(len(queries), 1)
+
+    def test_deleted_user_is_rejected(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_saving_cached_user_keeps_password(self):
+        self.client.get(self.url)
+        cached = get_cached_user(self.user.pk)
+        cached.first_name = 'Renamed'
+        cached.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Renamed')
+        self.assertTrue(self.user.check_password('TestPassword123'))
+
+
+class TokenBlacklistTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com',
+            password='TestPassword123', is_verified=True
+        )
+        self.url = reverse('users:token_refresh')
+
+    def refresh(self, token):
+        return self.client.post(self.url, {'refresh': str(token)})
+
+    def test_rotated_token_is_rejected(self):
+        token = RefreshToken.for_user(self.user)
+        with mock.patch('users.tokens.cache.add', wraps=cache.add) as add:
+            response = self.refresh(token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('refresh', response.data)
+        # The entry lives exactly as long as the rotated token would have.
+        timeout = add.call_args.args[2]
+        self.assertAlmostEqual(
+            timeout, api_settings.REFRESH_TOKEN_LIFETIME.total_seconds(), delta=5
+        )
+        self.assertTrue(
+            BlacklistedToken.objects.filter(token__jti=token['jti']).exists()
+        )
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED
+            )
+        rotated = response.data['refresh']
+        self.assertEqual(self.refresh(rotated).status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.refresh(rotated).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+    def test_rotated_token_is_rejected_after_cache_loss(self):
+        token = RefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(token).status_code, status.HTTP_200_OK)
+        cache.clear()
+        self.assertEqual(
+            self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+        # The database hit is cached again.
+        self.assertTrue(cache.get(BLACKLIST_CACHE_KEY.format(token['jti'])))
+
+    def test_database_is_checked_while_cache_is_down(self):
+        token = RefreshToken.for_user(self.user)
+        with mock.patch('users.tokens.cache.get', side_effect=RedisError):
+            with self.assertLogs('users.tokens', 'WARNING'):
+                response = self.refresh(token)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+            with self.assertLogs('users.tokens', 'WARNING'):
+                response = self.refresh(token)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_concurrent_reuse_gets_one_pair(self):
+        token = RefreshToken.for_user(self.user)
+        # Both requests pass the check before either blacklists the token.
+        with mock.patch.object(RefreshToken, 'check_blacklist'):
+            first = self.refresh(token)
+            second = self.refresh(token)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_database_blacklist_is_honoured(self):
+        token = RefreshToken.for_user(self.user)
+        BlacklistedToken.objects.create(
+            token=OutstandingToken.objects.get(jti=token['jti'])
+        )
+        self.assertEqual(
+            self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+        cache.clear()
+        self.assertEqual(sync_token_blacklist(), 1)
+        self.assertEqual(
+            self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+    def test_purge_deletes_expired_tokens_in_chunks(self):
+        now = timezone.now()
+        tokens = OutstandingToken.objects.bulk_create([
+            OutstandingToken(
+                user=self.user, jti=f'jti-{i}', token='token',
+                expires_at=now + timedelta(days=-1 if i < 5 else 1)
+            )
+            for i in range(7)
+        ])
+        BlacklistedToken.objects.bulk_create([
+            BlacklistedToken(token=token) for token in tokens[::2]
+        ])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(purge_expired_tokens(chunk_size=2), 5)
+        deletes = [
+            query for query in queries
+            if query['sql'].startswith('DELETE FROM "token_blacklist_outstandingtoken"')
+        ]
+        self.assertEqual(len(deletes), 3)
+        self.assertEqual(
+            sorted(OutstandingToken.objects.values_list('jti', flat=True)),
+            ['jti-5', 'jti-6']
+        )
+        self.assertEqual(
+            list(BlacklistedToken.objects.values_list('token__jti', flat=True)),
+            ['jti-6']
+        )
+
+
+@override_settings(UNVERIFIED_USER_RETENTION=7)
+class RegistrationCleanupTests(APITestCase):
+
+    def create_user(self, username, joined_days_ago, **fields):
+        fields = {'is_active': False, **fields}
+        user = User.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            password='TestPassword123', **fields
+        )
+        User.objects.filter(pk=user.pk).update(
+            date_joined=timezone.now() - timedelta(days=joined_days_ago)
+        )
+        return user
+
+    def create_verification(self, user, expires_in_hours):
+        return EmailVerification.objects.create(
+            user=user, code=uuid.uuid4(),
+            expiration=timezone.now() + timedelta(hours=expires_in_hours)
+        )
+
+    def test_expired_verifications_are_purged_in_chunks(self):
+        user = self.create_user('pending', 1)
+        for _ in range(5):
+            self.create_verification(user, -1)
+        pending = self.create_verification(user, 24)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(purge_expired_verifications(chunk_size=2), 5)
+        deletes = [
+            query for query in queries if query['sql'].startswith('DELETE')
+        ]
+        self.assertEqual(len(deletes), 3)
+        self.assertEqual(
+            list(EmailVerification.objects.values_list('id', flat=True)),
+            [pending.id]
+        )
+
+    def test_only_abandoned_registrations_are_purged(self):
+        abandoned = [self.create_user(f'abandoned{i}', 10) for i in range(3)]
+        kept = [
+            self.create_user('recent', 1),
+            self.create_user('deactivated', 10, is_verified=True),
+            self.create_user('active', 10, is_active=True),
+            self.create_user('logged_in', 10, last_login=timezone.now()),
+        ]
+        self.create_verification(self.create_user('reissued', 10), 24)
+
+        self.assertEqual(purge_unverified_users(chunk_size=2), 3)
+        self.assertFalse(
+            User.objects.filter(pk__in=[user.pk for user in abandoned]).exists()
+        )
+        self.assertEqual(
+            User.objects.filter(pk__in=[user.pk for user in kept]).count(), 4
+        )
+        self.assertTrue(User.objects.filter(username='reissued').exists())
+
+    def test_task_reports_purged_rows(self):
+        self.create_verification(self.create_user('abandoned', 10), -100)
+        self.create_user('recent', 1)
+        with mock.patch.object(metrics, '_store', metrics.LocalStore()) as store:
+            self.assertEqual(
+                purge_abandoned_registrations_task.delay().get(),
+                {'verifications': 1, 'users': 1}
+            )
+            metrics.flush()
+            purged = {
+                labels: value for (name, _, labels), value in store.read().items()
+                if name == 'purged_rows_total'
+            }
+        self.assertEqual(purged, {
+            (('kind', 'verifications'),): 1, (('kind', 'users'),): 1,
+        })
+
+    def test_verification_is_fetched_once(self):
+        user = self.create_user('pending', 0)
+        verification = self.create_verification(user, 24)
+        url = reverse('users:email_verification', args=[verification.code])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lookups = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "users_emailverification"' in query['sql']
+        ]
+        self.assertEqual(len(lookups), 1)
+        self.assertIn('INNER JOIN "user"', lookups[0])
+        user.refresh_from_db()
+        self.assertTrue(user.is_verified and user.is_active)
+        self.assertFalse(EmailVerification.objects.exists())
+
+    def test_expired_code_is_rejected(self):
+        verification = self.create_verification(self.create_user('late', 3), -1)
+        response = self.client.post(
+            reverse('users:email_verification', args=[verification.code])
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['code'], ['Verification code has expired.'])
+
+
+# The view tests above, against the async views that automarket.asgi serves.
+@override_settings(ROOT_URLCONF='automarket.asgi_urls')
+class AsyncFavoriteListTests(FavoriteListTests):
+    pass
+
+
+@override_settings(ROOT_URLCONF='automarket.asgi_urls')
+class AsyncCachedJWTAuthenticationTests(CachedJWTAuthenticationTests):
+    pass
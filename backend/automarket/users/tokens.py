@@ -0,0 +1,122 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from redis.exceptions import RedisError
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+BLACKLIST_CACHE_KEY = 'users:token-blacklist:{}'
+
+logger = logging.getLogger(__name__)
+
+
+def cache_blacklisted_token(jti, expires_at):
+    """
+    Mark ``jti`` as blacklisted in the shared cache until ``expires_at``.
+
+    Returns ``False`` if it was already marked, has already expired or the
+    cache is unavailable; the database entry is what counts.
+    """
+    timeout = (expires_at - timezone.now()).total_seconds()
+    if timeout <= 0:
+        return False
+    try:
+        return cache.add(BLACKLIST_CACHE_KEY.format(jti), True, timeout)
+    except RedisError:
+        logger.warning('Could not cache blacklisted token %s.', jti, exc_info=True)
+        return False
+
+
+class RefreshToken(BaseRefreshToken):
+    """
+    Refresh token whose blacklist is read through the shared cache.
+
+    The ``token_blacklist`` tables stay the source of truth. Every row
+    blacklisted there, by rotation, the admin or the stock view, is mirrored
+    into the cache by a signal, with an entry that expires with the token,
+    so replays are usually turned away without a query. A cache miss, or
+    an unavailable cache, falls back to the database, so an evicted or
+    flushed entry is never a way in.
+
+    This does not make refresh faster: a token that was never rotated is
+    not in the cache, so every legitimate refresh still runs the stock
+    blacklist query (after a cache lookup) and rotation still writes the
+    ``token_blacklist`` rows. Those tables stay bounded through
+    ``purge_expired_tokens``, not through the cache.
+    """
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        try:
+            cached = cache.get(BLACKLIST_CACHE_KEY.format(jti))
+        except RedisError:
+            logger.warning('Token blacklist cache is unavailable.', exc_info=True)
+            cached = False
+        if cached:
+            raise TokenError(_('Token is blacklisted'))
+        if BlacklistedToken.objects.filter(token__jti=jti).exists():
+            cache_blacklisted_token(jti, datetime_from_epoch(self.payload['exp']))
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        """
+        Blacklist this token; returns ``False`` if it already was.
+
+        The ``BlacklistedToken`` row is unique per token, so of concurrent
+        calls for the same token only one returns ``True``.
+        """
+        return super().blacklist()[1]
+
+
+def sync_token_blacklist(chunk_size=None):
+    """
+    Copy unexpired database blacklist entries into the cache, so a flushed
+    cache does not send every replayed token to the database.
+    """
+    chunk_size = chunk_size or settings.TOKEN_PURGE_CHUNK_SIZE
+    rows = (
+        BlacklistedToken.objects
+        .filter(token__expires_at__gt=timezone.now())
+        .values_list('token__jti', 'token__expires_at')
+        .order_by()
+    )
+    synced = 0
+    for jti, expires_at in rows.iterator(chunk_size=chunk_size):
+        cache_blacklisted_token(jti, expires_at)
+        synced += 1
+    return synced
+
+
+def purge_expired_tokens(chunk_size=None):
+    """
+    Delete expired outstanding tokens and their blacklist rows.
+
+    Works in chunks of ``chunk_size`` rows, each in its own short
+    transaction, so neither table is locked for long and concurrent logins
+    are not held up. Returns the number of outstanding tokens deleted.
+    """
+    chunk_size = chunk_size or settings.TOKEN_PURGE_CHUNK_SIZE
+    now = timezone.now()
+    purged = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lt=now)
+            .order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if ids:
+            with transaction.atomic():
+                BlacklistedToken.objects.filter(token_id__in=ids).delete()
+                OutstandingToken.objects.filter(id__in=ids).delete()
+            purged += len(ids)
+        if len(ids) < chunk_size:
+            return purged
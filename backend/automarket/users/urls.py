@@ -7,8 +7,11 @@ from .views import (
     CustomTokenObtainPairView,
     ProfileView,
     ProfileDeleteView,
+    FavoriteListView,
     AddToFavoriteView,
-    RemoveFromFavoriteView
+    RemoveFromFavoriteView,
+    AddFavoritesBatchView,
+    RemoveFavoritesBatchView,
 )
 
 app_name = "users"
@@ -24,6 +27,17 @@ urlpatterns = [
     ),
     path('profile/', ProfileView.as_view(), name='profile'),
     path('profile/delete/', ProfileDeleteView.as_view(), name='profile_delete'),
+    path('favorites/', FavoriteListView.as_view(), name='favorites'),
+    path(
+        'favorites/batch/add/',
+        AddFavoritesBatchView.as_view(),
+        name='add_favorites_batch'
+    ),
+    path(
+        'favorites/batch/remove/',
+        RemoveFavoritesBatchView.as_view(),
+        name='remove_favorites_batch'
+    ),
     path(
         'favorites/add/<int:car_listing_id>/',
         AddToFavoriteView.as_view(),
@@ -1,17 +1,26 @@
-from rest_framework import status, permissions
+from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
 
 from carlisting.models import CarListing
-from .models import Favorite
+from core.async_views import AsyncAPIView
+from core.pagination import KeysetPagination
+from .models import (
+    Favorite,
+    FAVORITE_ADDED,
+    FAVORITE_NOT_FOUND,
+    FAVORITE_REMOVED,
+)
 from .serializers import (
     RegistrationSerializer,
     EmailVerificationSerializer,
     CustomTokenObtainPairSerializer,
     ProfileSerializer,
     ProfileDeleteSerializer,
+    FavoriteSerializer,
+    FavoriteBatchSerializer,
 )
 
 
@@ -77,23 +86,38 @@ class ProfileDeleteView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class FavoriteListView(generics.ListAPIView):
+    serializer_class = FavoriteSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return Favorite.objects.filter(user=self.request.user).with_listing()
+
+
+class AsyncFavoriteListView(AsyncAPIView, FavoriteListView):
+    """The favorites list for ASGI, read through the async ORM."""
+
+    async def get(self, request, *args, **kwargs):
+        page = await self.paginator.apaginate_queryset(
+            self.get_queryset(), request, view=self
+        )
+        return self.get_paginated_response(
+            self.get_serializer(page, many=True).data
+        )
+
+
 class AddToFavoriteView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, car_listing_id):
-        try:
-            car_listing = CarListing.objects.get(id=car_listing_id)
-        except CarListing.DoesNotExist:
+        result = Favorite.objects.add_many(request.user, [car_listing_id])
+        if result[car_listing_id] == FAVORITE_NOT_FOUND:
             return Response(
                 {"detail": "Car listing not found."},
                 status=status.HTTP_404_NOT_FOUND
             )
-
-        _, created = Favorite.objects.get_or_create(
-            user=request.user,
-            car_listing=car_listing
-        )
-        if created:
+        if result[car_listing_id] == FAVORITE_ADDED:
             return Response(
                 {"detail": "Added to favorites."},
                 status=status.HTTP_201_CREATED
@@ -108,22 +132,46 @@ class RemoveFromFavoriteView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, car_listing_id):
-        try:
-            car_listing = CarListing.objects.get(id=car_listing_id)
-        except CarListing.DoesNotExist:
-            return Response(
-                {"detail": "Car listing not found."},
-                status=status.HTTP_404_NOT_FOUND
-            )
-
-        favorite = Favorite.objects.filter(user=request.user, car_listing=car_listing)
-        if favorite.exists():
-            favorite.delete()
+        result = Favorite.objects.remove_many(request.user, [car_listing_id])
+        if result[car_listing_id] == FAVORITE_REMOVED:
             return Response(
                 {"detail": "Removed from favorites."},
                 status=status.HTTP_204_NO_CONTENT
             )
+        if not CarListing.objects.filter(id=car_listing_id).exists():
+            return Response(
+                {"detail": "Car listing not found."},
+                status=status.HTTP_404_NOT_FOUND
+            )
         return Response(
             {"detail": "Not in favorites."},
             status=status.HTTP_404_NOT_FOUND
         )
+
+
+class FavoriteBatchView(APIView):
+    """Apply a favorites change to many listings in one statement."""
+
+    permission_classes = [IsAuthenticated]
+    action = None
+
+    def post(self, request):
+        serializer = FavoriteBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        apply = getattr(Favorite.objects, f'{self.action}_many')
+        results = apply(request.user, serializer.validated_data['car_listing_ids'])
+        return Response(
+            {'results': [
+                {'car_listing': car_listing_id, 'status': result}
+                for car_listing_id, result in results.items()
+            ]},
+            status=status.HTTP_200_OK
+        )
+
+
+class AddFavoritesBatchView(FavoriteBatchView):
+    action = 'add'
+
+
+class RemoveFavoritesBatchView(FavoriteBatchView):
+    action = 'remove'